@@ -1,112 +1,321 @@
-# app.py
-from flask import Flask, request, jsonify
-import sqlite3
-import json
-import uuid
-from core_logic import (
-    calculate_interest_score,
-    extract_preferences_from_conversation,
-    query_database_for_products,
-    generate_bot_response
-)
-
-app = Flask(__name__)
-DB_PATH = 'data/foodiebot.db'
-
-def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def get_conversation_history(session_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT role, content FROM conversation_history WHERE session_id = ? ORDER BY timestamp ASC",
-        (session_id,)
-    )
-    history = cursor.fetchall()
-    conn.close()
-    return "\n".join([f"{row['role']}: {row['content']}" for row in history])
-
-def log_message(session_id, role, content, score, recommendation=None):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """INSERT INTO conversation_history 
-           (session_id, role, content, interest_score, recommendation_made) 
-           VALUES (?, ?, ?, ?, ?)""",
-        (session_id, role, content, score, recommendation)
-    )
-    conn.commit()
-    conn.close()
-
-
-@app.route('/chat', methods=['POST'])
-def chat():
-    data = request.json
-    user_message = data.get('message')
-    session_id = data.get('session_id')
-    current_score = int(data.get('interest_score', 0))
-
-    if not session_id:
-        session_id = str(uuid.uuid4())
-
-    # 1. Log user message & update score
-    log_message(session_id, 'user', user_message, current_score)
-    new_score = calculate_interest_score(user_message, current_score)
-
-    # 2. Build conversation context
-    history = get_conversation_history(session_id)
-    
-    # 3. Conversational Intelligence [cite: 43]
-    preferences = extract_preferences_from_conversation(history)
-    
-    # 4. Database Query [cite: 79]
-    products = query_database_for_products(preferences)
-    
-    # 5. Recommendation & Response Generation
-    bot_response_text = generate_bot_response(history, products)
-    
-    # 6. Log bot response
-    recommended_product = products[0] if products else None
-    log_message(session_id, 'bot', bot_response_text, new_score, recommended_product['product_id'] if recommended_product else None)
-
-    return jsonify({
-        'session_id': session_id,
-        'bot_response': bot_response_text,
-        'interest_score': new_score,
-        'recommended_product': recommended_product
-    })
-
-@app.route('/analytics', methods=['GET'])
-def analytics():
-    session_id = request.args.get('session_id')
-    if not session_id:
-        return jsonify({"error": "session_id is required"}), 400
-        
-    conn = get_db_connection()
-    # Interest score progression [cite: 109]
-    scores = conn.execute(
-        "SELECT id, interest_score FROM conversation_history WHERE session_id = ? ORDER BY timestamp ASC",
-        (session_id,)
-    ).fetchall()
-    
-    # Most recommended products [cite: 115]
-    recs = conn.execute(
-        """SELECT p.name, COUNT(h.recommendation_made) as count 
-           FROM conversation_history h
-           JOIN products p ON h.recommendation_made = p.product_id
-           GROUP BY p.name ORDER BY count DESC LIMIT 5"""
-    ).fetchall()
-
-    conn.close()
-
-    return jsonify({
-        'interest_progression': [dict(row) for row in scores],
-        'top_recommendations': [dict(row) for row in recs]
-    })
-
-
-if __name__ == '__main__':
+# app.py
+from flask import Flask, Response, g, request, jsonify
+import click
+import json
+import os
+import queue
+import sys
+import time
+import uuid
+from concurrent.futures import TimeoutError
+from config import (LLM_MAX_WORKERS, LLM_QUEUE_DEPTH, LLM_TIMEOUT_SECONDS,
+                    PROFILE_REQUESTS, PROFILE_INTERVAL_MS, PROFILE_DIR)
+import db
+import metrics
+from database_setup import missing_tables
+from metrics import LLM_FAILURES, REQUEST_SECONDS, SamplingProfiler, span
+from task_pool import BoundedExecutor, PoolSaturated, completed_future
+from db import save_session_preferences, get_top_recommendations
+from conversation_logger import log_message, get_interest_progression
+from preference_rules import record_path
+from history_compaction import start_background_compaction
+from session_store import get_session_store
+from core_logic import (
+    calculate_interest_score,
+    extract_preferences_from_conversation,
+    update_preferences,
+    quick_update_preferences,
+    query_database_for_products,
+    generate_bot_response,
+    stream_bot_response,
+    warm_up
+)
+
+app = Flask(__name__)
+
+# LLM round trips run here so a slow model call can't hold more than its slot
+llm_pool = BoundedExecutor(LLM_MAX_WORKERS, LLM_QUEUE_DEPTH, thread_name_prefix='llm')
+
+
+BUSY_ERROR = {"error": "FoodieBot is busy, please retry shortly"}
+TIMEOUT_ERROR = {"error": "FoodieBot took too long to respond"}
+
+
+# --- Request timing & profiling --- #
+@app.before_request
+def _start_request_timing():
+    g.request_start = time.perf_counter()
+    g.profiler = None
+    if PROFILE_REQUESTS and (request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1'):
+        g.profiler = SamplingProfiler(interval=PROFILE_INTERVAL_MS / 1000).start()
+
+@app.after_request
+def _finish_request_timing(response):
+    # Runs once the body has been sent, so streamed responses are timed to their last event
+    start, profiler, endpoint = g.request_start, g.profiler, request.endpoint or 'unknown'
+
+    def done():
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+        if profiler is not None:
+            profiler.stop().write(os.path.join(PROFILE_DIR, f"{endpoint}-{int(time.time())}-{uuid.uuid4().hex[:8]}.folded"))
+
+    response.call_on_close(done)
+    return response
+
+# --- Schema check & background jobs --- #
+_schema_checked = False
+
+def schema_error():
+    """Why the configured database can't be served, or None if its schema is current."""
+    with db.connection() as conn:
+        missing = missing_tables(conn)
+    if missing:
+        return (f"Database schema is out of date (missing {', '.join(missing)}); "
+                f"run `python database_setup.py --migrate`")
+    return None
+
+@app.before_request
+def _check_schema():
+    # Once per process, before anything touches the newer tables
+    global _schema_checked
+    if _schema_checked:
+        return None
+    error = schema_error()
+    if error:
+        app.logger.error(error)
+        return jsonify({"error": error}), 503
+    _schema_checked = True
+    return None
+
+@app.before_request
+def _start_background_jobs():
+    # Started from the first request rather than at import, so each forked worker gets its own
+    start_background_compaction()
+
+def begin_turn(data):
+    """Starts a chat turn: kicks off preference extraction and logs/scores the user message.
+
+    Raises PoolSaturated when the LLM pool has no room for the turn.
+    """
+    user_message = data.get('message')
+    session_id = data.get('session_id') or str(uuid.uuid4())
+    reset_preferences = bool(data.get('reset_preferences'))
+    sessions = get_session_store()
+
+    # 1. Build conversation context, including the message being answered. The
+    # session's score, recent turns and preferences are kept server-side; any
+    # interest_score sent by the client is ignored.
+    with span('load_session'):
+        session = sessions.get(session_id)
+    current_score = session.score
+    history = "\n".join(filter(None, [session.history(), f"user: {user_message}"]))
+
+    # 2. Conversational Intelligence [cite: 43], on the LLM pool. Preferences are
+    # carried forward from the stored state and updated from the new message only;
+    # they are re-extracted from the session's recent turns (the last
+    # SESSION_RECENT_TURNS, not the whole transcript) when the client asks for a
+    # reset, or for a session logged before preference state existed. Messages the
+    # rule-based extractor fully understands skip the LLM round trip altogether.
+    stored_preferences = None if reset_preferences else session.preferences
+    previous_preferences = stored_preferences or {}
+    if stored_preferences is None and (reset_preferences or session.turns):
+        preference_path = 'transcript'
+        preferences_future = llm_pool.submit(extract_preferences_from_conversation, history)
+    else:
+        quick_preferences = quick_update_preferences(previous_preferences, user_message)
+        if quick_preferences is not None:
+            preference_path = 'rules'
+            preferences_future = completed_future(quick_preferences)
+        else:
+            preference_path = 'llm'
+            preferences_future = llm_pool.submit(update_preferences, previous_preferences, user_message)
+    record_path(preference_path)
+
+    # 3. Log user message & update score while the LLM call is in flight
+    with span('log_user'):
+        log_message(session_id, 'user', user_message, current_score)
+        sessions.record_turn(session, 'user', user_message)
+    with span('score'):
+        new_score = calculate_interest_score(user_message, current_score)
+
+    return {
+        'session_id': session_id,
+        'session': session,
+        'message': user_message,
+        'history': history,
+        'new_score': new_score,
+        'previous_preferences': previous_preferences,
+        'preference_path': preference_path,
+        'preferences_future': preferences_future
+    }
+
+def find_products(turn):
+    """Waits for the turn's preferences, stores them and queries matching products."""
+    try:
+        with span('preferences_wait'):
+            preferences = turn['preferences_future'].result(timeout=LLM_TIMEOUT_SECONDS)
+    except TimeoutError:
+        LLM_FAILURES.inc(operation='preferences', reason='timeout')
+        preferences = turn['previous_preferences'] # Keep what we knew before this turn
+    with span('save_preferences'):
+        save_session_preferences(turn['session_id'], preferences)
+        get_session_store().set_preferences(turn['session'], preferences)
+
+    # 4. Database Query [cite: 79]
+    turn['products'] = query_database_for_products(preferences, turn['message'], turn['session'].recommendations)
+    turn['recommended_product'] = turn['products'][0] if turn['products'] else None
+    return turn['products']
+
+def finish_turn(turn, bot_response_text):
+    # 6. Log bot response
+    recommended_product = turn['recommended_product']
+    recommendation = recommended_product['product_id'] if recommended_product else None
+    with span('log_bot'):
+        log_message(turn['session_id'], 'bot', bot_response_text, turn['new_score'], recommendation)
+        get_session_store().record_turn(turn['session'], 'bot', bot_response_text, turn['new_score'], recommendation)
+
+
+@app.route('/chat', methods=['POST'])
+def chat():
+    try:
+        turn = begin_turn(request.json)
+    except PoolSaturated:
+        return jsonify(BUSY_ERROR), 429
+    products = find_products(turn)
+
+    # 5. Recommendation & Response Generation
+    try:
+        bot_response_text = llm_pool.run(generate_bot_response, turn['history'], products, timeout=LLM_TIMEOUT_SECONDS)
+    except PoolSaturated:
+        return jsonify(BUSY_ERROR), 429
+    except TimeoutError:
+        LLM_FAILURES.inc(operation='response', reason='timeout')
+        return jsonify(TIMEOUT_ERROR), 504
+    finish_turn(turn, bot_response_text)
+
+    return jsonify({
+        'session_id': turn['session_id'],
+        'bot_response': bot_response_text,
+        'interest_score': turn['new_score'],
+        'recommended_product': turn['recommended_product']
+    })
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Streaming variant of /chat, as Server-Sent Events.
+
+    Emits `session` immediately, `product` as soon as the product query returns,
+    one `token` per chunk of LLM text as it is generated, and finally `done` with
+    the full response and interest score (or `error`).
+    """
+    try:
+        turn = begin_turn(request.json)
+    except PoolSaturated:
+        return jsonify(BUSY_ERROR), 429
+
+    def events():
+        yield _sse('session', {'session_id': turn['session_id']})
+        products = find_products(turn)
+        yield _sse('product', {'recommended_product': turn['recommended_product']})
+
+        # 5. Stream the response from the LLM pool, so streams count against its capacity too
+        chunks = queue.Queue()
+
+        def pump():
+            try:
+                with span('response_llm'):
+                    for chunk in stream_bot_response(turn['history'], products):
+                        chunks.put(('token', chunk))
+                chunks.put(('end', None))
+            except Exception as e:
+                chunks.put(('error', str(e)))
+
+        try:
+            llm_pool.submit(pump)
+        except PoolSaturated:
+            yield _sse('error', BUSY_ERROR)
+            return
+
+        deadline = time.monotonic() + LLM_TIMEOUT_SECONDS
+        parts = []
+        while True:
+            try:
+                kind, payload = chunks.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                LLM_FAILURES.inc(operation='response', reason='timeout')
+                yield _sse('error', TIMEOUT_ERROR)
+                return
+            if kind == 'error':
+                yield _sse('error', {"error": payload})
+                return
+            if kind == 'end':
+                break
+            parts.append(payload)
+            yield _sse('token', {'text': payload})
+
+        bot_response_text = "".join(parts).strip()
+        finish_turn(turn, bot_response_text)
+        yield _sse('done', {'bot_response': bot_response_text, 'interest_score': turn['new_score']})
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/analytics', methods=['GET'])
+def analytics():
+    session_id = request.args.get('session_id')
+    if not session_id:
+        return jsonify({"error": "session_id is required"}), 400
+        
+    # Interest score progression [cite: 109]
+    scores = get_interest_progression(session_id)
+
+    # Most recommended products [cite: 115]
+    recs = get_top_recommendations()
+
+    return jsonify({
+        'interest_progression': scores,
+        'top_recommendations': recs
+    })
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Request and per-stage latency histograms and pipeline counters, for Prometheus to scrape."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/warm-up', methods=['POST'])
+def warm_up_endpoint():
+    """Builds the DB pool, search indexes and LLM client of this worker now rather than
+    on its first chat turns. `?components=db,search_index` limits it to some of them."""
+    components = [c for c in request.args.get('components', '').split(',') if c]
+    try:
+        results = warm_up(components)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    failed = any('error' in result for result in results.values())
+    return jsonify(results), 503 if failed else 200
+
+@app.cli.command('warm-up')
+@click.argument('components', nargs=-1)
+def warm_up_command(components):
+    """Builds (and times) the given components, or all of them: flask --app app warm-up [db llm ...]"""
+    try:
+        results = warm_up(components)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    for name, result in results.items():
+        click.echo(f"{name:>17}: " + (f"{result['seconds'] * 1000:.1f}ms" if 'seconds' in result
+                                      else f"FAILED ({result['error']})"))
+    if any('error' in result for result in results.values()):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    error = schema_error()
+    if error:
+        sys.exit(error)
     app.run(port=5001, debug=True)
\ No newline at end of file
@@ -0,0 +1,104 @@
+# benchmarks/analytics_bench.py
+"""/analytics query latency on large conversation_history tables, before and after migration.
+
+Builds a history table of N rows with the original schema (no session index,
+no rollup), times the two /analytics queries, runs database_setup.migrate_database
+(session/timestamp index + recommendation_counts backfill), and times them again.
+
+Usage: python -m benchmarks.analytics_bench [--rows 10000,1000000,10000000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import database_setup
+import db
+
+LEGACY_TOP_RECOMMENDATIONS = """SELECT p.name, COUNT(h.recommendation_made) as count
+    FROM conversation_history h
+    JOIN products p ON h.recommendation_made = p.product_id
+    GROUP BY p.name ORDER BY count DESC LIMIT 5"""
+
+TURNS_PER_SESSION = 20
+
+
+def build_history_db(db_path, rows, seed=0):
+    """Original schema populated with `rows` history rows spread over sessions of 20 turns."""
+    database_setup.create_database(db_path)
+    database_setup.populate_products(db_path)
+    conn = sqlite3.connect(db_path)
+    # Start from the pre-migration shape so the migration itself is exercised
+    conn.execute("DROP INDEX idx_history_session_ts")
+    conn.execute("DROP TABLE recommendation_counts")
+    product_ids = [r[0] for r in conn.execute("SELECT product_id FROM products")]
+    rng = random.Random(seed)
+
+    def history_rows():
+        for i in range(rows):
+            session = i // TURNS_PER_SESSION
+            is_bot = i % 2 == 1
+            yield (
+                f"session-{session:08d}",
+                'bot' if is_bot else 'user',
+                "Try the Sunset Dragon Burger!" if is_bot else "something spicy please",
+                rng.randint(0, 100),
+                rng.choice(product_ids) if is_bot else None,
+                f"2026-01-01 00:{(i // 60) % 60:02d}:{i % 60:02d}.{i:09d}",
+            )
+
+    conn.executemany(db.INSERT_MESSAGE_AT, history_rows())
+    conn.commit()
+    conn.close()
+    return rows // TURNS_PER_SESSION
+
+
+def _median_ms(conn, sql, params_fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql, params_fn()).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main(sizes, repeat):
+    results = []
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            db_path = os.path.join(tmp, f"history_{rows}.db")
+            sessions = build_history_db(db_path, rows)
+            session_param = lambda: (f"session-{rng.randrange(sessions):08d}",)
+
+            conn = sqlite3.connect(db_path)
+            before_progression = _median_ms(conn, db.SELECT_PROGRESSION, session_param, repeat)
+            before_top = _median_ms(conn, LEGACY_TOP_RECOMMENDATIONS, tuple, max(1, repeat // 5))
+            conn.close()
+
+            start = time.perf_counter()
+            database_setup.migrate_database(db_path)
+            migrate_s = time.perf_counter() - start
+
+            conn = sqlite3.connect(db_path)
+            after_progression = _median_ms(conn, db.SELECT_PROGRESSION, session_param, repeat)
+            after_top = _median_ms(conn, db.SELECT_TOP_RECOMMENDATIONS, tuple, repeat)
+            conn.close()
+            os.remove(db_path)
+            results.append((rows, before_progression, after_progression, before_top, after_top, migrate_s))
+
+    print(f"{'rows':>10} {'progression before/after (ms)':>30} {'top recs before/after (ms)':>28} {'migration':>10}")
+    for rows, bp, ap, bt, at, m in results:
+        print(f"{rows:>10} {bp:>14.3f} / {ap:<13.3f} {bt:>12.3f} / {at:<13.3f} {m:>9.1f}s")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='10000,1000000,10000000')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    main([int(r) for r in args.rows.split(',')], args.repeat)
@@ -0,0 +1,103 @@
+# benchmarks/catalog_load_bench.py
+"""Load time and peak RSS of the streaming catalog upsert versus the original json.load + per-row INSERT.
+
+Each loader runs in its own subprocess so peak RSS is measured independently.
+
+Usage: python -m benchmarks.catalog_load_bench [--products 1000000]
+"""
+import argparse
+import json
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import database_setup
+from benchmarks.synthetic import PRODUCT_COLUMNS, load_vocabulary, synthetic_products
+
+
+def legacy_populate(db_path, json_path):
+    """The original populate_products: whole file in memory, one INSERT per product."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    with open(json_path, 'r') as f:
+        products = json.load(f)
+    for product in products:
+        for key in ['ingredients', 'dietary_tags', 'mood_tags', 'allergens']:
+            if isinstance(product.get(key), list):
+                product[key] = json.dumps(product[key])
+        cursor.execute("""
+        INSERT INTO products (
+            product_id, name, category, description, ingredients, price,
+            calories, prep_time, dietary_tags, mood_tags, allergens,
+            popularity_score, chef_special, limited_time, spice_level, image_prompt
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, tuple(product.values()))
+    conn.commit()
+    conn.close()
+
+
+def write_catalog(path, count):
+    """Writes `count` synthetic products as a JSON array, one product at a time."""
+    vocab = load_vocabulary()
+    with open(path, 'w') as f:
+        f.write("[\n")
+        for i, row in enumerate(synthetic_products(count, vocab)):
+            product = dict(zip(PRODUCT_COLUMNS, row))
+            for key in database_setup.LIST_COLUMNS:
+                product[key] = json.loads(product[key])
+            f.write((",\n" if i else "") + json.dumps(product))
+        f.write("\n]\n")
+
+
+def child(loader, db_path, json_path):
+    """Runs one loader and prints its timing and peak RSS as JSON."""
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if loader == 'legacy':
+        legacy_populate(db_path, json_path)
+    else:
+        database_setup.populate_products(db_path, json_path)
+    elapsed = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'seconds': elapsed, 'base_rss_mb': base_rss / 1024, 'peak_rss_mb': peak_rss / 1024}))
+
+
+def _run_child(loader, db_path, json_path):
+    out = subprocess.run([sys.executable, '-m', 'benchmarks.catalog_load_bench', '--child', loader,
+                          db_path, json_path], check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(count):
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, 'products.json')
+        write_catalog(json_path, count)
+        size_mb = os.path.getsize(json_path) / 1e6
+
+        runs = []
+        for name, loader in (('legacy', 'legacy'), ('streaming', 'streaming'), ('streaming refresh', 'streaming')):
+            db_path = os.path.join(tmp, f"{loader}.db")
+            if name != 'streaming refresh':
+                database_setup.create_database(db_path, reset=True)
+            runs.append((name, _run_child(loader, db_path, json_path)))
+
+    print(f"{count} products, {size_mb:.0f} MB of JSON")
+    print(f"{'loader':>18} {'seconds':>9} {'products/s':>11} {'base RSS':>10} {'peak RSS':>10}")
+    for name, r in runs:
+        print(f"{name:>18} {r['seconds']:>9.1f} {count / r['seconds']:>11,.0f} "
+              f"{r['base_rss_mb']:>8.0f}MB {r['peak_rss_mb']:>8.0f}MB")
+    return runs
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child(*sys.argv[2:5])
+        sys.exit(0)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=1000000)
+    args = parser.parse_args()
+    main(args.products)
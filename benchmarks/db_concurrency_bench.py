@@ -0,0 +1,121 @@
+# benchmarks/db_concurrency_bench.py
+"""Write throughput and error rate of the SQLite store under concurrent sessions.
+
+Each session thread performs chat-like turns (read history, log the user turn,
+upsert preferences, log the bot turn). The legacy mode opens and closes a
+connection per call in the default rollback journal, as app.py used to; the
+pooled mode goes through db.ConnectionPool with WAL.
+
+Usage: python -m benchmarks.db_concurrency_bench [--sessions 1,4,16,64] [--turns 25]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import database_setup
+import db
+from benchmarks import direct_store
+
+
+class LegacyStore:
+    """The pre-pool data access: a fresh connection for every call."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def get_conversation_history(self, session_id):
+        conn = self._connect()
+        rows = conn.execute(db.SELECT_HISTORY, (session_id,)).fetchall()
+        conn.close()
+        return rows
+
+    def log_message(self, session_id, role, content, score, recommendation=None):
+        conn = self._connect()
+        conn.execute(db.INSERT_MESSAGE, (session_id, role, content, score, recommendation))
+        conn.commit()
+        conn.close()
+
+    def save_session_preferences(self, session_id, preferences):
+        conn = self._connect()
+        conn.execute(db.UPSERT_PREFERENCES, (session_id, json.dumps(preferences)))
+        conn.commit()
+        conn.close()
+
+
+class PooledStore:
+    get_conversation_history = staticmethod(direct_store.get_conversation_history)
+    log_message = staticmethod(direct_store.log_message)
+    save_session_preferences = staticmethod(db.save_session_preferences)
+
+
+def run_level(store, sessions, turns):
+    writes, errors = [0], [0]
+    lock = threading.Lock()
+
+    def session_worker(n):
+        session_id = f"bench-{sessions}-{n}"
+        for turn in range(turns):
+            steps = (
+                lambda: store.get_conversation_history(session_id),
+                lambda: store.log_message(session_id, 'user', f"message {turn}", turn),
+                lambda: store.save_session_preferences(session_id, {'mood': ['spicy'], 'turn': turn}),
+                lambda: store.log_message(session_id, 'bot', "Try the burger!", turn, 'FF001'),
+            )
+            for i, step in enumerate(steps):
+                try:
+                    step()
+                    if i:
+                        with lock:
+                            writes[0] += 1
+                except sqlite3.OperationalError:
+                    with lock:
+                        errors[0] += 1
+
+    threads = [threading.Thread(target=session_worker, args=(n,)) for n in range(sessions)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    attempts = sessions * turns * 4
+    return writes[0] / wall, errors[0] / attempts
+
+
+def main(levels, turns):
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ('legacy', 'pooled'):
+            db_path = os.path.join(tmp, f"{mode}.db")
+            database_setup.create_database(db_path)
+            if mode == 'legacy':
+                store = LegacyStore(db_path)
+            else:
+                db.configure(db_path)
+                store = PooledStore()
+            for sessions in levels:
+                writes_per_s, error_rate = run_level(store, sessions, turns)
+                rows.append((mode, sessions, writes_per_s, error_rate))
+        db.get_pool().close()
+
+    print(f"{'mode':>8} {'sessions':>9} {'writes/s':>10} {'error rate':>11}")
+    for mode, sessions, writes_per_s, error_rate in rows:
+        print(f"{mode:>8} {sessions:>9} {writes_per_s:>10.0f} {error_rate:>11.2%}")
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', default='1,4,16,64')
+    parser.add_argument('--turns', type=int, default=25)
+    args = parser.parse_args()
+    main([int(s) for s in args.sessions.split(',')], args.turns)
@@ -0,0 +1,32 @@
+# benchmarks/direct_store.py
+"""Conversation storage as app.py used it before the session store: one commit
+per logged turn, and the full history read back on every turn. Kept as the
+baselines the benchmarks compare against."""
+import db
+from conversation_logger import get_logger
+
+
+def get_conversation_history(session_id):
+    return db.format_history(db.get_history_rows(session_id))
+
+
+def get_logged_history(session_id):
+    """Stored history plus this session's turns still queued in the write-behind logger, in order."""
+    # Queue first, then table: a turn committed in between shows up in both
+    # (and is de-duplicated by its timestamp) rather than in neither
+    queued = get_logger().pending(session_id)
+    rows = db.get_history_rows(session_id)
+    stored = {row['timestamp'] for row in rows}
+    pending = [
+        {'role': role, 'content': content}
+        for _, role, content, _, _, timestamp in queued
+        if timestamp not in stored
+    ]
+    return db.format_history(list(rows) + pending)
+
+
+def log_message(session_id, role, content, score, recommendation=None):
+    with db.connection() as conn:
+        conn.execute(db.INSERT_MESSAGE, (session_id, role, content, score, recommendation))
+        if recommendation:
+            conn.execute(db.INCREMENT_RECOMMENDATION, (recommendation, 1))
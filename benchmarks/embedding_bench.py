@@ -0,0 +1,89 @@
+# benchmarks/embedding_bench.py
+"""Build cost and query latency of semantic product retrieval on a synthetic catalog.
+
+Also counts how many vague queries (no word in common with the catalog tags)
+the exact tag index answers versus the embedding index.
+
+Usage: python -m benchmarks.embedding_bench [--products 100000] [--queries 500]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import db
+import embeddings
+from benchmarks.synthetic import build_catalog_db, load_vocabulary
+from search_index import ProductSearchIndex
+
+VAGUE_QUERIES = [
+    "something cozy", "I want something fiery", "a cold drink", "a sweet treat", "something light",
+    "something crunchy", "I'm starving, something hearty", "a decadent cheat meal", "something exotic",
+    "brunch", "food for a party", "something lean", "nostalgic homestyle food", "a bold new flavor",
+]
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return {
+        'p50_ms': samples[len(samples) // 2] * 1000,
+        'p99_ms': samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+        'mean_ms': statistics.fmean(samples) * 1000,
+    }
+
+
+def main(count, query_count):
+    vocab = load_vocabulary()
+    rng = random.Random(3)
+    queries = []
+    for _ in range(query_count):
+        text = rng.choice(VAGUE_QUERIES)
+        budget = float(rng.randint(6, 20)) if rng.random() < 0.5 else None
+        dietary = [rng.choice(vocab['dietary_tags'])] if rng.random() < 0.2 else []
+        queries.append((text, budget, dietary))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'catalog.db')
+        build_catalog_db(db_path, count, vocab)
+
+        start = time.perf_counter()
+        embeddings.build_embeddings(db_path)
+        build_s = time.perf_counter() - start
+        matrix_mb = os.path.getsize(embeddings.embedding_paths(db_path)[0]) / 1e6
+
+        conn = db.connect(db_path)
+        start = time.perf_counter()
+        index = embeddings.EmbeddingIndex.load(db_path, conn)
+        load_s = time.perf_counter() - start
+        tags = ProductSearchIndex.from_connection(conn)
+        conn.close()
+
+        samples, answered = [], 0
+        for text, budget, dietary in queries:
+            start = time.perf_counter()
+            hits = index.search(text, budget=budget, dietary=dietary)
+            samples.append(time.perf_counter() - start)
+            answered += bool(hits)
+        # The tag index sees the query words as mood terms, as the LLM would extract them
+        tag_answered = sum(
+            bool(tags.search(budget=budget, mood=[w for w in text.split() if w not in embeddings.STOP_WORDS],
+                             dietary=dietary))
+            for text, budget, dietary in queries)
+        latency = _percentiles(samples)
+
+    print(f"{count} products: build {build_s:.1f}s, matrix {matrix_mb:.0f} MB, load {load_s * 1000:.0f}ms")
+    print(f"semantic top-5: p50 {latency['p50_ms']:.3f}ms  p99 {latency['p99_ms']:.3f}ms  "
+          f"mean {latency['mean_ms']:.3f}ms")
+    print(f"vague queries answered: tag index {tag_answered}/{len(queries)}, "
+          f"embeddings {answered}/{len(queries)}")
+    return latency
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args()
+    main(args.products, args.queries)
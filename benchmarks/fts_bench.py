@@ -0,0 +1,95 @@
+# benchmarks/fts_bench.py
+"""Latency and relevance of FTS5 craving search versus the legacy LIKE-chain SQL.
+
+Queries are cravings (a word from product names/descriptions or from an
+ingredient) with an optional budget and dietary restriction. A result counts as
+relevant when its name, description or ingredients contain the craving and it
+satisfies the budget and dietary filters.
+
+Usage: python -m benchmarks.fts_bench [--sizes 10000,100000] [--queries 200]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+
+import db
+from benchmarks.search_bench import _time_queries, legacy_sql_query
+from benchmarks.synthetic import build_catalog_db, load_vocabulary
+from search_index import fts_search, tokenize
+
+
+def craving_queries(count, vocab, seed=2):
+    rng = random.Random(seed)
+    ingredient_words = sorted({w for i in vocab['ingredients'] for w in i.lower().split()})
+    queries = []
+    for _ in range(count):
+        source = vocab['words'] if rng.random() < 0.5 else ingredient_words
+        prefs = {'cravings': [rng.choice(source).lower().strip('.,!')]}
+        if rng.random() < 0.5:
+            prefs['budget'] = float(rng.randint(6, 20))
+        if rng.random() < 0.2:
+            prefs['dietary'] = [rng.choice(vocab['dietary_tags']).lower()]
+        queries.append(prefs)
+    return queries
+
+
+def is_relevant(product, prefs):
+    text = " ".join(str(product[c]) for c in ('name', 'description', 'ingredients'))
+    if not set(tokenize(prefs['cravings'][0])) & set(tokenize(text)):
+        return False
+    if prefs.get('budget') is not None and product['price'] > prefs['budget']:
+        return False
+    tags = set(t for tag in json.loads(product['dietary_tags'] or '[]') for t in tokenize(tag))
+    return all(set(tokenize(d)) <= tags for d in prefs.get('dietary', []))
+
+
+def relevance(search, queries):
+    returned = relevant = empty = 0
+    for prefs in queries:
+        results = search(prefs)
+        returned += len(results)
+        relevant += sum(is_relevant(p, prefs) for p in results)
+        empty += not results
+    return {
+        'precision': relevant / returned if returned else 0.0,
+        'avg_results': returned / len(queries),
+        'empty_rate': empty / len(queries),
+    }
+
+
+def run(sizes, query_count):
+    vocab = load_vocabulary()
+    queries = craving_queries(query_count, vocab)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            db_path = os.path.join(tmp, f"catalog_{size}.db")
+            build_catalog_db(db_path, size, vocab)
+            conn = db.connect(db_path)
+
+            def like(prefs):
+                return legacy_sql_query(db_path, prefs)
+
+            def fts(prefs):
+                return fts_search(conn, prefs['cravings'], dietary=prefs.get('dietary', []),
+                                  budget=prefs.get('budget'))
+
+            for name, search in (('LIKE', like), ('FTS5', fts)):
+                rows.append((size, name, _time_queries(search, queries), relevance(search, queries)))
+            conn.close()
+
+    print(f"{'products':>10} {'path':>5} {'p50':>9} {'p99':>9} {'precision@5':>12} {'results':>8} {'empty':>6}")
+    for size, name, timing, rel in rows:
+        print(f"{size:>10} {name:>5} {timing['p50_ms']:>7.2f}ms {timing['p99_ms']:>7.2f}ms "
+              f"{rel['precision']:>12.2f} {rel['avg_results']:>8.2f} {rel['empty_rate']:>6.0%}")
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000')
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+    run([int(s) for s in args.sizes.split(',')], args.queries)
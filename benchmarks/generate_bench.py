@@ -0,0 +1,64 @@
+# benchmarks/generate_bench.py
+"""Catalog generation throughput by worker count against the stub LLM, plus a resume check.
+
+The original generator made one call at a time with a fixed 2s sleep after each,
+i.e. at best one product per (latency + 2s).
+
+Usage: python -m benchmarks.generate_bench [--products 1000] [--latency-ms 200] [--workers 4,16,64]
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import generate_data
+from generate_data import ProductGenerator
+from llm_client import LLMClient, StubBackend
+
+
+def _run(client, per_category, checkpoint_path, workers):
+    generator = ProductGenerator(client, workers=workers, rate=0, checkpoint_path=checkpoint_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        products, failed = generator.run(per_category)
+    return products, failed, time.perf_counter() - start
+
+
+def main(products, latency_ms, worker_counts):
+    per_category = max(1, products // len(generate_data.PRODUCT_CATEGORIES))
+    total = per_category * len(generate_data.PRODUCT_CATEGORIES)
+    client = LLMClient(StubBackend(latency_ms=latency_ms), cache_size=0)
+    legacy_rate = 1 / (latency_ms / 1000 + 2)
+
+    print(f"{total} products, {latency_ms:.0f}ms per LLM call")
+    print(f"{'workers':>8} {'seconds':>9} {'products/s':>11}")
+    print(f"{'legacy':>8} {total / legacy_rate:>9.0f} {legacy_rate:>11.2f}  (estimated)")
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in worker_counts:
+            checkpoint = os.path.join(tmp, f"products_{workers}.jsonl")
+            done, failed, elapsed = _run(client, per_category, checkpoint, workers)
+            assert len(done) == total and not failed
+            print(f"{workers:>8} {elapsed:>9.2f} {total / elapsed:>11.1f}")
+
+        # Resume: truncate a finished checkpoint to half (with a torn last line)
+        # and check that only the missing products are generated again
+        with open(checkpoint) as f:
+            lines = f.readlines()
+        with open(checkpoint, 'w') as f:
+            f.writelines(lines[:total // 2])
+            f.write(lines[total // 2][:20])
+        calls_before = client.stats()['backend_calls']
+        done, failed, elapsed = _run(client, per_category, checkpoint, worker_counts[-1])
+        regenerated = client.stats()['backend_calls'] - calls_before
+        print(f"resume from half: {len(done)}/{total} products, {regenerated} regenerated in {elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--latency-ms', type=float, default=200)
+    parser.add_argument('--workers', default='4,16,64')
+    args = parser.parse_args()
+    main(args.products, args.latency_ms, [int(w) for w in args.workers.split(',')])
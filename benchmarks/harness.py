@@ -0,0 +1,53 @@
+# benchmarks/harness.py
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+import database_setup
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+@contextmanager
+def scratch_app(llm_client):
+    """Points the app at a freshly populated scratch database and the given LLM client.
+
+    Yields the imported `app` module; everything is torn down on exit.
+    """
+    import app as app_module
+    import conversation_logger
+    import core_logic
+    import db
+    import session_store
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'foodiebot.db')
+        database_setup.create_database(db_path)
+        # Before populating: its reload hooks rebuild already-loaded indexes through the pool
+        db.configure(db_path)
+        database_setup.populate_products(db_path)
+        session_store.get_session_store().clear()
+        core_logic.llm = llm_client
+        try:
+            yield app_module
+        finally:
+            # Write queued turns while the scratch database still exists
+            conversation_logger.get_logger().flush()
+            db.get_pool().close()
+
+
+@contextmanager
+def serve(app_module):
+    """Serves the Flask app on a threaded local server and yields its base URL."""
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True, request_handler=_QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
@@ -0,0 +1,133 @@
+# benchmarks/history_bench.py
+"""Database size and history query latency over a simulated month of chat traffic.
+
+Writes --days of synthetic sessions (scripted user messages from the
+products.json vocabulary, wordy bot replies, one recommendation per reply)
+into a scratch database with timestamps spread over each day, twice: once
+with no compaction, as before, and once with HistoryCompactor run at the end
+of every simulated day (idle threshold one day). At the end of each week it
+reports, for both:
+- live database size, archive size, and live conversation_history rows;
+- median latency of the /analytics reads (interest progression of a session
+  from today and of one from the first week, top recommendations);
+- median latency of recovering a recent session's state from SQLite.
+
+Usage: python -m benchmarks.history_bench [--days 30] [--sessions-per-day 1000] [--products 2000]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import db
+import history_compaction
+import session_store
+from benchmarks.synthetic import build_catalog_db, load_vocabulary, synthetic_sessions
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+SAMPLES = 200
+
+
+def _bot_reply(rng, vocab):
+    return f"You might enjoy this one: {' '.join(rng.sample(vocab['words'], 40))}."
+
+
+def day_rows(day, sessions_per_day, products, vocab, seed):
+    """conversation_history rows for one simulated day, and the ids of its sessions."""
+    rng = random.Random(seed * 1000 + day)
+    rows, session_ids = [], []
+    for n, messages in enumerate(synthetic_sessions(sessions_per_day, 8, vocab, seed=seed * 1000 + day)):
+        session_id = f"day{day:02d}-{n:05d}"
+        session_ids.append(session_id)
+        at = START + timedelta(days=day, seconds=rng.randrange(86400 - 600))
+        score = 0
+        for message in messages[:rng.randint(2, 8)]:
+            rows.append((session_id, 'user', message, score, None, at.strftime('%Y-%m-%d %H:%M:%S.%f')))
+            score = min(100, score + rng.randint(0, 15))
+            at += timedelta(seconds=rng.randint(5, 60))
+            rows.append((session_id, 'bot', _bot_reply(rng, vocab), score, rng.choice(products),
+                         at.strftime('%Y-%m-%d %H:%M:%S.%f')))
+            at += timedelta(seconds=rng.randint(5, 60))
+    rows.sort(key=lambda row: row[5])
+    return rows, session_ids
+
+
+def _median_ms(fn, args):
+    samples = []
+    for arg in args:
+        start = time.perf_counter()
+        fn(*arg)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def _size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def measure(db_path, archive_path, recent, first_week):
+    with db.connection() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        live_rows = conn.execute("SELECT COUNT(*) FROM conversation_history").fetchone()[0]
+    return {
+        'live_mb': _size(db_path) / 2 ** 20,
+        'archive_mb': _size(archive_path) / 2 ** 20,
+        'live_rows': live_rows,
+        'progression_recent_ms': _median_ms(db.get_interest_progression, [(s,) for s in recent]),
+        'progression_old_ms': _median_ms(db.get_interest_progression, [(s,) for s in first_week]),
+        'top_recommendations_ms': _median_ms(db.get_top_recommendations, [()] * 20),
+        'recover_ms': _median_ms(session_store.recover_session, [(s,) for s in recent]),
+    }
+
+
+def simulate(tmp, name, compact, args, vocab):
+    db_path = os.path.join(tmp, f"{name}.db")
+    archive_path = os.path.join(tmp, f"{name}_archive.db")
+    build_catalog_db(db_path, args.products, vocab)
+    db.configure(db_path)
+    products = [f"SP{i:07d}" for i in range(args.products)]
+    compactor = history_compaction.HistoryCompactor(db_path, archive_path, idle_seconds=86400)
+    rng = random.Random(args.seed)
+    first_week, results, compact_seconds = [], [], []
+    for day in range(args.days):
+        rows, session_ids = day_rows(day, args.sessions_per_day, products, vocab, args.seed)
+        for i in range(0, len(rows), 5000):
+            db.insert_messages(rows[i:i + 5000])
+        if day < 7:
+            first_week += session_ids
+        if compact:
+            compact_seconds.append(compactor.compact(now=START + timedelta(days=day + 1))['seconds'])
+        if (day + 1) % 7 == 0 or day + 1 == args.days:
+            recent = rng.sample(session_ids, min(SAMPLES, len(session_ids)))
+            old = rng.sample(first_week, min(SAMPLES, len(first_week)))
+            results.append(dict(measure(db_path, archive_path, recent, old), day=day + 1))
+    db.get_pool().close()
+    return results, compact_seconds
+
+
+def main(args):
+    vocab = load_vocabulary()
+    print(f"{args.days} days x {args.sessions_per_day} sessions/day (2-8 turns each), {args.products} products")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, compact in (('no compaction', False), ('daily compaction', True)):
+            results, compact_seconds = simulate(tmp, name.replace(' ', '_'), compact, args, vocab)
+            print(f"\n{name}" + (f" (median {statistics.median(compact_seconds) * 1000:.0f}ms per run, "
+                                  f"max {max(compact_seconds) * 1000:.0f}ms)" if compact_seconds else ""))
+            print(f"{'day':>4} {'live DB':>9} {'archive':>9} {'live rows':>10} {'progression':>12} "
+                  f"{'(week 1)':>9} {'top recs':>9} {'recover':>9}")
+            for r in results:
+                print(f"{r['day']:>4} {r['live_mb']:>7.1f}MB {r['archive_mb']:>7.1f}MB {r['live_rows']:>10} "
+                      f"{r['progression_recent_ms']:>10.3f}ms {r['progression_old_ms']:>7.3f}ms "
+                      f"{r['top_recommendations_ms']:>7.3f}ms {r['recover_ms']:>7.3f}ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--sessions-per-day', type=int, default=1000)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=5)
+    main(parser.parse_args())
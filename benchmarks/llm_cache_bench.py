@@ -0,0 +1,77 @@
+# benchmarks/llm_cache_bench.py
+"""Backend calls and latency for templated LLM traffic with and without the client cache.
+
+Replays prompts drawn from a skewed (Zipf-like) distribution over a fixed set of
+templated conversations through LLMClient on a pool of threads, using the stub
+backend with simulated latency.
+
+Usage: python -m benchmarks.llm_cache_bench [--requests 2000] [--templates 100] [--threads 16]
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_client import LLMClient, StubBackend
+
+TEMPLATE = """
+    Analyze the following user conversation history and extract their food preferences into a JSON object.
+
+    CONVERSATION:
+    user: I want something {mood} under ${budget}
+    user: maybe a {craving}?
+
+    JSON:
+    """
+MOODS = ['spicy', 'comfort', 'sweet', 'fresh', 'hearty']
+CRAVINGS = ['burger', 'pizza', 'taco', 'salad', 'shake']
+
+
+def make_prompts(requests, templates, seed=0):
+    rng = random.Random(seed)
+    distinct = [TEMPLATE.format(mood=rng.choice(MOODS), budget=rng.randint(6, 20), craving=rng.choice(CRAVINGS))
+                for _ in range(templates)]
+    weights = [1 / (rank + 1) for rank in range(templates)]
+    # Same text with different indentation still shares a cache entry once normalized
+    return [p if rng.random() < 0.5 else p.replace("    ", "  ")
+            for p in rng.choices(distinct, weights=weights, k=requests)]
+
+
+def run(prompts, threads, latency_ms, cache_size):
+    client = LLMClient(StubBackend(latency_ms=latency_ms, jitter_ms=latency_ms / 4), cache_size=cache_size)
+
+    def timed(prompt):
+        start = time.perf_counter()
+        client.generate(prompt)
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        samples = sorted(pool.map(timed, prompts))
+    wall = time.perf_counter() - start
+    stats = client.stats()
+    return {
+        'backend_calls': stats['backend_calls'],
+        'hit_rate': stats['hit_rate'],
+        'coalesced': stats['coalesced'],
+        'p50_ms': samples[len(samples) // 2],
+        'p99_ms': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        'wall_s': wall,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--templates', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--latency-ms', type=float, default=80)
+    args = parser.parse_args()
+
+    prompts = make_prompts(args.requests, args.templates)
+    print(f"{'cache':>8} {'backend calls':>14} {'hit rate':>9} {'coalesced':>10} "
+          f"{'p50':>9} {'p99':>9} {'wall':>8}")
+    for label, size in (('off', 0), ('on', 512)):
+        r = run(prompts, args.threads, args.latency_ms, size)
+        print(f"{label:>8} {r['backend_calls']:>14} {r['hit_rate']:>9.1%} {r['coalesced']:>10} "
+              f"{r['p50_ms']:>7.1f}ms {r['p99_ms']:>7.1f}ms {r['wall_s']:>7.2f}s")
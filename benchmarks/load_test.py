@@ -0,0 +1,126 @@
+# benchmarks/load_test.py
+"""Load test for the /chat endpoint against a local fake LLM.
+
+Starts the Flask app on a threaded local server backed by a scratch copy of
+the database, swaps the LLM client for the offline stub backend with
+injectable latency, and drives N concurrent sessions over HTTP. The response
+cache is off by default so every turn pays the simulated model latency.
+After the summary, the server's own per-stage histograms (see metrics.py) show
+where the p99 of each level went.
+
+Usage: python -m benchmarks.load_test [--sessions 1,16,128] [--turns 4] [--latency-ms 300]
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import metrics
+from benchmarks.harness import scratch_app, serve
+from llm_client import LLMClient, StubBackend
+
+MESSAGES = [
+    "I'm craving something spicy",
+    "Anything vegetarian under $12?",
+    "How much is that one?",
+    "Maybe something more comforting",
+    "I love it, I'll take it",
+]
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return float('nan')
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def _stage_quantiles():
+    """p50/p99 per pipeline stage, in ms, estimated from the server's histograms."""
+    return {key[0]: tuple(metrics.STAGE_SECONDS.quantile(q, stage=key[0]) * 1000 for q in (0.5, 0.99))
+            for key in sorted(metrics.STAGE_SECONDS.snapshot())}
+
+
+def run_level(base_url, sessions, turns):
+    metrics.reset()
+    latencies, statuses = [], []
+    lock = threading.Lock()
+
+    def session_worker(n):
+        session_id = f"load-{sessions}-{n}"
+        for turn in range(turns):
+            start = time.perf_counter()
+            status = _post(f"{base_url}/chat", {
+                'message': MESSAGES[turn % len(MESSAGES)],
+                'session_id': session_id
+            })
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                statuses.append(status)
+                if status == 200:
+                    latencies.append(elapsed)
+
+    threads = [threading.Thread(target=session_worker, args=(n,)) for n in range(sessions)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    ok = statuses.count(200)
+    return {
+        'sessions': sessions,
+        'requests': len(statuses),
+        'ok': ok,
+        'rejected_429': statuses.count(429),
+        'other_errors': len(statuses) - ok - statuses.count(429),
+        'p50_ms': _percentile(latencies, 50),
+        'p99_ms': _percentile(latencies, 99),
+        'ok_rps': ok / wall,
+        'stages': _stage_quantiles(),
+    }
+
+
+def main(levels, turns, latency_ms, jitter_ms, cache_size=0):
+    client = LLMClient(StubBackend(latency_ms, jitter_ms), cache_size=cache_size)
+    with scratch_app(client) as app_module, serve(app_module) as base_url:
+        results = [run_level(base_url, sessions, turns) for sessions in levels]
+
+    print(f"{'sessions':>8} {'requests':>8} {'ok':>6} {'429':>6} {'errors':>6} "
+          f"{'p50':>9} {'p99':>9} {'ok req/s':>9}")
+    for r in results:
+        print(f"{r['sessions']:>8} {r['requests']:>8} {r['ok']:>6} {r['rejected_429']:>6} "
+              f"{r['other_errors']:>6} {r['p50_ms']:>7.0f}ms {r['p99_ms']:>7.0f}ms {r['ok_rps']:>9.1f}")
+
+    print("\nper-stage p50 / p99 (ms) by sessions")
+    stages = sorted({stage for r in results for stage in r['stages']})
+    print(f"{'stage':>20} " + " ".join(f"{r['sessions']:>17}" for r in results))
+    for stage in stages:
+        cells = [r['stages'].get(stage) for r in results]
+        print(f"{stage:>20} " + " ".join(f"{c[0]:>8.1f}/{c[1]:>8.1f}" if c else f"{'-':>17}" for c in cells))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', default='1,16,128')
+    parser.add_argument('--turns', type=int, default=4)
+    parser.add_argument('--latency-ms', type=float, default=300)
+    parser.add_argument('--jitter-ms', type=float, default=100)
+    parser.add_argument('--cache-size', type=int, default=0, help="LLM response cache entries")
+    args = parser.parse_args()
+    main([int(s) for s in args.sessions.split(',')], args.turns, args.latency_ms, args.jitter_ms,
+         args.cache_size)
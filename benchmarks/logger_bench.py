@@ -0,0 +1,65 @@
+# benchmarks/logger_bench.py
+"""Conversation logging throughput: one commit per turn vs the write-behind logger.
+
+Usage: python -m benchmarks.logger_bench [--turns 20000] [--threads 1,8] [--batch-size 64]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import database_setup
+import db
+from benchmarks import direct_store
+from conversation_logger import ConversationLogger
+
+
+def _drive(log, turns, threads):
+    per_thread = turns // threads
+
+    def worker(n):
+        session_id = f"bench-{n}"
+        for turn in range(per_thread):
+            log(session_id, 'user' if turn % 2 == 0 else 'bot', f"turn {turn} of a chat", turn % 100)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return per_thread * threads
+
+
+def main(turns, thread_levels, batch_size):
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for threads in thread_levels:
+            for mode in ('per-row commit', 'write-behind'):
+                db_path = os.path.join(tmp, f"{threads}-{mode.replace(' ', '_')}.db")
+                database_setup.create_database(db_path)
+                db.configure(db_path)
+                start = time.perf_counter()
+                if mode == 'per-row commit':
+                    written = _drive(direct_store.log_message, turns, threads)
+                else:
+                    logger = ConversationLogger(batch_size=batch_size, flush_interval=0.05)
+                    written = _drive(logger.log, turns, threads)
+                    logger.close()  # include the final flush in the measurement
+                elapsed = time.perf_counter() - start
+                rows.append((threads, mode, written / elapsed))
+        db.get_pool().close()
+
+    print(f"{'threads':>8} {'mode':>15} {'turns/s':>10}")
+    for threads, mode, rate in rows:
+        print(f"{threads:>8} {mode:>15} {rate:>10.0f}")
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--turns', type=int, default=20000)
+    parser.add_argument('--threads', default='1,8')
+    parser.add_argument('--batch-size', type=int, default=64)
+    args = parser.parse_args()
+    main(args.turns, [int(t) for t in args.threads.split(',')], args.batch_size)
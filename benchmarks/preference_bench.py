@@ -0,0 +1,94 @@
+# benchmarks/preference_bench.py
+"""Prompt tokens and latency of full-transcript vs incremental preference extraction.
+
+Plays a scripted conversation into a scratch database and, at selected turns,
+times the preference step both ways: re-reading the whole history and calling
+extract_preferences_from_conversation, versus loading the stored session state,
+calling update_preferences with only the newest message and saving it back.
+The stub LLM charges a fixed latency plus a per-prompt-token cost.
+
+Usage: python -m benchmarks.preference_bench [--turns 1,10,50] [--token-latency-ms 0.1]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import database_setup
+from benchmarks import direct_store
+from llm_client import LLMClient, StubBackend, estimate_tokens
+
+USER_TURNS = [
+    "Hi! I'm hungry and want something spicy",
+    "Keep it under $12 please",
+    "I'm vegetarian by the way",
+    "Do you have any burger options?",
+    "What's in that one? How spicy is it?",
+    "Hmm, maybe something more comforting instead",
+    "Is there a pizza that fits?",
+    "That sounds great, how much is it?",
+]
+BOT_REPLY = ("Great choice! Our Sunset Dragon Burger has a spicy jackfruit patty with sriracha mayo "
+             "and pickled ginger for $10.99. Would you like to hear about a milder option too?")
+
+
+class RecordingBackend:
+    """Wraps a backend and remembers the token size of the last prompt it saw."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.last_prompt_tokens = 0
+
+    def generate(self, prompt):
+        self.last_prompt_tokens = estimate_tokens(prompt)
+        return self.backend.generate(prompt)
+
+
+def main(checkpoints, latency_ms, token_latency_ms):
+    import core_logic
+    import db
+
+    backend = RecordingBackend(StubBackend(latency_ms=latency_ms, token_latency_ms=token_latency_ms))
+    core_logic.llm = LLMClient(backend, cache_size=0)
+    session_id = 'preference-bench'
+    rows = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'foodiebot.db')
+        database_setup.create_database(db_path)
+        db.configure(db_path)
+
+        for turn in range(1, max(checkpoints) + 1):
+            message = USER_TURNS[(turn - 1) % len(USER_TURNS)]
+            direct_store.log_message(session_id, 'user', message, 0)
+
+            if turn in checkpoints:
+                start = time.perf_counter()
+                history = direct_store.get_conversation_history(session_id)
+                core_logic.extract_preferences_from_conversation(history)
+                full_ms = (time.perf_counter() - start) * 1000
+                full_tokens = backend.last_prompt_tokens
+
+            start = time.perf_counter()
+            state = db.get_session_preferences(session_id) or {}
+            state = core_logic.update_preferences(state, message)
+            db.save_session_preferences(session_id, state)
+            incremental_ms = (time.perf_counter() - start) * 1000
+
+            if turn in checkpoints:
+                rows.append((turn, full_tokens, backend.last_prompt_tokens, full_ms, incremental_ms))
+            direct_store.log_message(session_id, 'bot', BOT_REPLY, 0)
+
+    print(f"{'turn':>5} {'full tokens':>12} {'incr tokens':>12} {'full ms':>9} {'incr ms':>9}")
+    for turn, full_tokens, incr_tokens, full_ms, incr_ms in rows:
+        print(f"{turn:>5} {full_tokens:>12} {incr_tokens:>12} {full_ms:>9.1f} {incr_ms:>9.1f}")
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--turns', default='1,10,50')
+    parser.add_argument('--latency-ms', type=float, default=150)
+    parser.add_argument('--token-latency-ms', type=float, default=0.1)
+    args = parser.parse_args()
+    main({int(t) for t in args.turns.split(',')}, args.latency_ms, args.token_latency_ms)
@@ -0,0 +1,150 @@
+# benchmarks/preference_rules_bench.py
+"""LLM-call rate, accuracy and latency of the rule-based preference fast path.
+
+Runs a labeled corpus of user messages through the extractor built from the
+real catalog (data/products.json). Each message is labeled either with the
+preferences it states or as needing the LLM (withdrawals, references to an
+earlier suggestion, words outside the catalog vocabulary). The LLM round trip
+is not executed; its latency is modeled with --llm-latency-ms.
+
+Usage: python -m benchmarks.preference_rules_bench [--messages 1000] [--llm-latency-ms 700]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import database_setup
+from benchmarks.synthetic import load_vocabulary
+from config import PREFERENCE_RULES_MIN_CONFIDENCE
+from preference_rules import DIETARY_TERMS, PreferenceRules
+from search_index import normalize_tag, tokenize
+
+NEEDS_LLM = None
+# Hand-written messages; None marks a message only the LLM can interpret
+HAND_LABELED = [
+    ("veg burger under $10", {'budget': 10.0, 'dietary': ['vegetarian'], 'cravings': ['burger']}),
+    ("Hi! I'm hungry and want something spicy", {'mood': ['spicy']}),
+    ("Keep it under $12 please", {'budget': 12.0}),
+    ("I'm vegetarian by the way", {'dietary': ['vegetarian']}),
+    ("Do you have any burger options?", {'cravings': ['burger']}),
+    ("gluten free pizza for game night", {'dietary': ['gluten free'], 'cravings': ['pizza'],
+                                          'mood': ['game night']}),
+    ("spicy chicken tacos, 15 bucks max", {'budget': 15.0, 'mood': ['spicy'], 'cravings': ['chicken', 'taco']}),
+    ("hello", {}),
+    ("thanks!", {}),
+    ("What's in that one? How spicy is it?", NEEDS_LLM),
+    ("Hmm, maybe something more comforting instead", NEEDS_LLM),
+    ("Is there a pizza that fits?", NEEDS_LLM),
+    ("actually no onions please", NEEDS_LLM),
+    ("not spicy anymore", NEEDS_LLM),
+    ("yes please", NEEDS_LLM),
+    ("something to impress my date", NEEDS_LLM),
+    ("what would you pair with a long day at work", NEEDS_LLM),
+    ("I'm allergic to peanuts", NEEDS_LLM),
+    ("surprise me", NEEDS_LLM),
+    ("cheaper", NEEDS_LLM),
+]
+OPENERS = ["", "I want ", "I'm craving ", "Looking for ", "Can I get ", "hey, any ", "give me "]
+BUDGETS = ["under ${}", "below {} dollars", "{} bucks max", "up to ${}", "less than {}"]
+UNCLEAR = ["something else instead", "not {mood} anymore", "is that one {mood}?", "no {craving} please",
+           "actually, rather a {craving}", "what about the other one", "I'm allergic to {craving}",
+           "something {unknown}", "a {unknown} {craving}", "{craving} but {unknown}"]
+UNKNOWN_WORDS = ["fancy", "impressive", "midnight-ish", "celebratory", "nostalgic", "filling-but-not-heavy"]
+
+
+def _labels_vocabulary(rules_vocab):
+    """Tag values and craving words of the catalog, as extraction should report them."""
+    moods = sorted({normalize_tag(t) for t in rules_vocab['mood_tags']} - {''})
+    dietary_tokens = {t for tag in rules_vocab['dietary_tags'] for t in tokenize(tag)}
+    dietary = {term: aliases for term, aliases in DIETARY_TERMS.items() if set(term.split()) <= dietary_tokens}
+    cravings = sorted({t for c in rules_vocab['category'] for t in tokenize(c)}
+                      | {'burger', 'pizza', 'taco', 'wrap', 'chicken', 'wings', 'shrimp'})
+    return moods, dietary, cravings
+
+
+def labeled_corpus(count, vocab, seed=4):
+    """Hand-written messages plus templated ones, as (message, labels or None)."""
+    rng = random.Random(seed)
+    moods, dietary, cravings = _labels_vocabulary(vocab)
+    corpus = list(HAND_LABELED)
+    while len(corpus) < count:
+        if rng.random() < 0.25:
+            template = rng.choice(UNCLEAR)
+            corpus.append((template.format(mood=rng.choice(moods), craving=rng.choice(cravings),
+                                           unknown=rng.choice(UNKNOWN_WORDS)), NEEDS_LLM))
+            continue
+        labels, parts = {}, []
+        if rng.random() < 0.5:
+            mood = rng.choice(moods)
+            labels['mood'] = [mood]
+            parts.append(mood)
+        if dietary and rng.random() < 0.4:
+            term = rng.choice(sorted(dietary))
+            labels['dietary'] = [term]
+            parts.append(rng.choice(dietary[term]))
+        craving = rng.choice(cravings)
+        labels['cravings'] = [normalize_tag(craving)]
+        parts.append(craving)
+        message = rng.choice(OPENERS) + " ".join(parts)
+        if rng.random() < 0.5:
+            budget = rng.randint(6, 20)
+            labels['budget'] = float(budget)
+            message += " " + rng.choice(BUDGETS).format(budget)
+        corpus.append((message, labels))
+    return corpus
+
+
+def _same(found, labels):
+    if found.get('budget') != labels.get('budget'):
+        return False
+    return all(set(found.get(key, [])) == set(labels.get(key, [])) for key in ('mood', 'cravings', 'dietary'))
+
+
+def main(count, llm_latency_ms, min_confidence):
+    vocab = load_vocabulary()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'foodiebot.db')
+        database_setup.create_database(db_path)
+        database_setup.populate_products(db_path)
+        conn = sqlite3.connect(db_path)
+        rules = PreferenceRules.from_connection(conn)
+        conn.close()
+
+    corpus = labeled_corpus(count, vocab)
+    fast = correct = wrongly_accepted = 0
+    seconds = 0.0
+    for message, labels in corpus:
+        start = time.perf_counter()
+        found, confidence = rules.extract(message)
+        seconds += time.perf_counter() - start
+        if confidence < min_confidence:
+            continue
+        fast += 1
+        if labels is NEEDS_LLM:
+            wrongly_accepted += 1
+        elif _same(found, labels):
+            correct += 1
+
+    clear = sum(labels is not NEEDS_LLM for _, labels in corpus)
+    llm_only_ms = llm_latency_ms
+    mixed_ms = ((len(corpus) - fast) * llm_latency_ms + seconds * 1000) / len(corpus)
+    print(f"{len(corpus)} messages ({clear} unambiguous), min confidence {min_confidence}")
+    print(f"LLM-call rate: {1 - fast / len(corpus):.1%} (was 100%)")
+    print(f"fast-path accuracy: {correct / fast if fast else 0.0:.1%} of {fast} messages "
+          f"({wrongly_accepted} that needed the LLM were answered locally)")
+    print(f"unambiguous messages handled locally: {(fast - wrongly_accepted) / clear:.1%}")
+    print(f"rule extraction: {seconds / len(corpus) * 1e6:.0f}us per message")
+    print(f"mean preference latency per turn: {llm_only_ms:.0f}ms all-LLM vs {mixed_ms:.0f}ms with fast path "
+          f"(modeled LLM latency {llm_latency_ms:.0f}ms)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--llm-latency-ms', type=float, default=700)
+    parser.add_argument('--min-confidence', type=float, default=PREFERENCE_RULES_MIN_CONFIDENCE)
+    args = parser.parse_args()
+    main(args.messages, args.llm_latency_ms, args.min_confidence)
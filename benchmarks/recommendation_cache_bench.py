@@ -0,0 +1,137 @@
+# benchmarks/recommendation_cache_bench.py
+"""Product query latency with and without the recommendation cache, on a skewed workload.
+
+Preference combinations are drawn from a pool with Zipf-distributed
+popularity (a few combinations - "spicy under $10" - are asked for far more
+often than the rest), and each draw is re-spelled with random case,
+punctuation and list order, as the LLM and the rule-based extractor produce
+them. Every draw goes through query_database_for_products against a
+synthetic catalog, first with the cache disabled and then enabled. Finally a
+popularity_score update from another connection checks that cached results
+are dropped within CATALOG_VERSION_CHECK_SECONDS.
+
+Usage: python -m benchmarks.recommendation_cache_bench [--products 100000] [--queries 20000] [--combinations 2000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import core_logic
+import database_setup
+import db
+from benchmarks.synthetic import build_catalog_db, load_vocabulary, synthetic_preferences
+from recommendation_cache import get_recommendation_cache
+
+
+def _respell(prefs, rng):
+    """The same preferences as the LLM might phrase them on another turn."""
+    def variant(term):
+        term = term.title() if rng.random() < 0.3 else term
+        return term + '!' if rng.random() < 0.1 else term
+
+    respelled = {}
+    for field, value in prefs.items():
+        if field == 'budget':
+            respelled[field] = value if rng.random() < 0.5 else str(int(value))
+        else:
+            values = [variant(v) for v in value] * (2 if rng.random() < 0.1 else 1)
+            rng.shuffle(values)
+            respelled[field] = values
+    return respelled
+
+
+def skewed_workload(count, combinations, vocab, zipf_s=1.1, seed=3):
+    rng = random.Random(seed)
+    pool = synthetic_preferences(combinations, vocab, seed=seed)
+    weights = [1 / (rank + 1) ** zipf_s for rank in range(len(pool))]
+    return [_respell(prefs, rng) for prefs in rng.choices(pool, weights, k=count)]
+
+
+def replay(queries):
+    samples = []
+    start = time.perf_counter()
+    for prefs in queries:
+        t = time.perf_counter()
+        core_logic.query_database_for_products(prefs)
+        samples.append((time.perf_counter() - t) * 1000)
+    elapsed = time.perf_counter() - start
+    samples.sort()
+    return {
+        'mean_ms': statistics.fmean(samples),
+        'p50_ms': samples[len(samples) // 2],
+        'p99_ms': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        'qps': len(queries) / elapsed,
+    }
+
+
+def check_invalidation(db_path, cache):
+    """Bumps a cached top result's popularity from another connection and waits for the cache to notice."""
+    prefs = {'mood': ['spicy']}
+    top = core_logic.query_database_for_products(prefs)[0]
+    core_logic.query_database_for_products(prefs)
+    invalidations = cache.stats()['invalidations']
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("UPDATE products SET popularity_score = popularity_score + 1 WHERE product_id = ?",
+                     (top['product_id'],))
+    conn.close()
+    start = time.perf_counter()
+    while cache.stats()['invalidations'] == invalidations and time.perf_counter() - start < 60:
+        core_logic.query_database_for_products(prefs)
+        time.sleep(0.01)
+    fresh = core_logic.query_database_for_products(prefs)
+    updated = next((p for p in fresh if p['product_id'] == top['product_id']), None)
+    return time.perf_counter() - start, updated is None or updated['popularity_score'] != top['popularity_score']
+
+
+def main(product_count, query_count, combinations):
+    vocab = load_vocabulary()
+    queries = skewed_workload(query_count, combinations, vocab)
+    cache = get_recommendation_cache()
+    capacity = cache.capacity
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'catalog.db')
+        build_catalog_db(db_path, product_count, vocab)
+        db.configure(db_path)
+        database_setup.notify_catalog_changed()
+        try:
+            cache.capacity = 0
+            uncached = replay(queries)
+            cache.capacity = capacity
+            cache.invalidate()
+            before = cache.stats()
+            cached = replay(queries)
+            after = cache.stats()
+            waited, refreshed = check_invalidation(db_path, cache)
+        finally:
+            cache.capacity = capacity
+            # The version change starts a background index rebuild; let it finish while the DB exists
+            cache.wait_for_refresh()
+            db.get_pool().close()
+
+    hits = after['hits'] - before['hits']
+    misses = after['misses'] - before['misses']
+    distinct = len({core_logic.preference_key(prefs) for prefs in queries})
+    print(f"{product_count} products, {query_count} queries over {distinct} distinct preference keys "
+          f"(cache capacity {capacity})")
+    print(f"{'cache':>6} {'mean':>9} {'p50':>9} {'p99':>9} {'queries/s':>10}")
+    for name, timing in (('off', uncached), ('on', cached)):
+        print(f"{name:>6} {timing['mean_ms']:>7.3f}ms {timing['p50_ms']:>7.3f}ms {timing['p99_ms']:>7.3f}ms "
+              f"{timing['qps']:>10.0f}")
+    print(f"\nhit rate {hits / (hits + misses):.1%}; "
+          f"hit {(after['hit_seconds'] - before['hit_seconds']) / hits * 1000:.3f}ms, "
+          f"miss {(after['miss_seconds'] - before['miss_seconds']) / misses * 1000:.3f}ms on average")
+    print(f"popularity update picked up after {waited:.2f}s: {'yes' if refreshed else 'NO'}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=20000)
+    parser.add_argument('--combinations', type=int, default=2000)
+    args = parser.parse_args()
+    main(args.products, args.queries, args.combinations)
@@ -0,0 +1,261 @@
+# benchmarks/replay.py
+"""Replays synthetic multi-turn chat sessions against the app and writes the results as JSON.
+
+Sessions are scripted from the products.json vocabulary (see
+synthetic.synthetic_sessions): an opener, follow-ups that refine or question
+the suggestion, and a decision. They are played against /chat with the stub
+LLM, whose latency is lognormal by default (median --latency-ms, spread
+--sigma). The requests go through the Flask test client or over HTTP to a
+local threaded server, with each concurrency level driving that many sessions
+at once. Every level starts from a fresh scratch database.
+
+For each level, the run records:
+- throughput, and request latency percentiles;
+- per-stage p50/p99 from the server's metrics;
+- LLM calls per turn;
+- database growth per turn;
+- process RSS.
+
+--output writes everything as JSON. --baseline compares the run with an
+earlier JSON file and exits with status 1 if a tracked number got worse by
+more than --tolerance.
+
+Usage: python -m benchmarks.replay [--concurrency 1,8,32] [--sessions 64] [--turns 6]
+       [--transport client|http] [--output run.json] [--baseline previous.json]
+"""
+import argparse
+import json
+import os
+import platform
+import queue
+import resource
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import conversation_logger
+import db
+import metrics
+from benchmarks.harness import scratch_app, serve
+from benchmarks.load_test import _percentile, _post
+from benchmarks.synthetic import load_vocabulary, synthetic_sessions
+from llm_client import LLMClient, StubBackend
+
+# (path into a level's results, True if a larger value is better) checked against --baseline.
+# Stage percentiles come from histogram buckets, too coarse to gate on; they are in the JSON to diff.
+TRACKED = [
+    (('turns_per_second',), True),
+    (('latency_ms', 'p50'), False),
+    (('latency_ms', 'p99'), False),
+    (('db', 'bytes_per_turn'), False),
+    (('memory', 'rss_after_mb'), False),
+]
+
+
+def _rss_mb():
+    """Current resident set size, or the peak where /proc isn't available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        scale = 2 ** 20 if sys.platform == 'darwin' else 2 ** 10
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def _db_bytes():
+    """Size of the database with every queued turn written and the WAL folded back in."""
+    conversation_logger.get_logger().flush()
+    with db.connection() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(db.get_pool().db_path)
+
+
+def _client_sender(app_module):
+    def send(payload):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app_module.app.test_client()
+        response = client.post('/chat', json=payload)
+        response.close()  # runs the after-request hooks, as a real server does
+        return response.status_code
+
+    local = threading.local()
+    return send
+
+
+def _http_sender(base_url):
+    return lambda payload: _post(f"{base_url}/chat", payload)
+
+
+def _stages():
+    return {stage: {'p50_ms': metrics.STAGE_SECONDS.quantile(0.5, stage=stage) * 1000,
+                    'p99_ms': metrics.STAGE_SECONDS.quantile(0.99, stage=stage) * 1000,
+                    'count': count}
+            for (stage,), (_, _, count) in sorted(metrics.STAGE_SECONDS.snapshot().items())}
+
+
+def run_level(send, llm, sessions, concurrency, level):
+    pending = queue.Queue()
+    for n, messages in enumerate(sessions):
+        pending.put((f"replay-{level}-{n}", messages))
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                session_id, messages = pending.get_nowait()
+            except queue.Empty:
+                return
+            for message in messages:
+                start = time.perf_counter()
+                status = send({'message': message, 'session_id': session_id})
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    statuses[status] = statuses.get(status, 0) + 1
+                    if status == 200:
+                        latencies.append(elapsed)
+
+    metrics.reset()
+    llm_calls = llm.stats()['backend_calls']
+    db_before, rss_before = _db_bytes(), _rss_mb()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    db_after, rss_after = _db_bytes(), _rss_mb()
+
+    requests = sum(statuses.values())
+    ok = statuses.get(200, 0)
+    return {
+        'concurrency': concurrency,
+        'sessions': len(sessions),
+        'requests': requests,
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'seconds': wall,
+        'turns_per_second': ok / wall,
+        'latency_ms': {f"p{pct}": _percentile(latencies, pct) for pct in (50, 90, 99)},
+        'stages': _stages(),
+        'llm_calls_per_turn': (llm.stats()['backend_calls'] - llm_calls) / max(requests, 1),
+        'db': {'bytes_before': db_before, 'bytes_after': db_after,
+               'bytes_per_turn': (db_after - db_before) / max(ok, 1)},
+        'memory': {'rss_before_mb': rss_before, 'rss_after_mb': rss_after,
+                   'rss_growth_mb': rss_after - rss_before},
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _lookup(level, path):
+    for key in path:
+        level = level.get(key) if isinstance(level, dict) else None
+    return level
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing each tracked number against the baseline, and whether any regressed."""
+    previous = {level['concurrency']: level for level in baseline['levels']}
+    lines, regressed = [], False
+    for level in results['levels']:
+        old = previous.get(level['concurrency'])
+        if old is None:
+            continue
+        for path, higher_is_better in TRACKED:
+            new_value, old_value = _lookup(level, path), _lookup(old, path)
+            if not isinstance(new_value, (int, float)) or not isinstance(old_value, (int, float)) or not old_value:
+                continue
+            change = (new_value - old_value) / abs(old_value)
+            worse = -change if higher_is_better else change
+            flag = worse > tolerance
+            regressed |= flag
+            lines.append(f"{level['concurrency']:>11} {'.'.join(path):>22} {old_value:>12.2f} {new_value:>12.2f} "
+                         f"{change:>+8.1%}" + ("  REGRESSION" if flag else ""))
+    return lines, regressed
+
+
+def main(args):
+    vocab = load_vocabulary()
+    sessions = synthetic_sessions(args.sessions, args.turns, vocab, seed=args.seed)
+    results = {
+        'benchmark': 'replay',
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'config': {key: getattr(args, key) for key in ('sessions', 'turns', 'transport', 'latency_ms', 'sigma',
+                                                       'llm_cache_size', 'seed')},
+        'levels': [],
+    }
+    for concurrency in args.concurrency:
+        llm = LLMClient(StubBackend(args.latency_ms, sigma=args.sigma, seed=args.seed), cache_size=args.llm_cache_size)
+        with scratch_app(llm) as app_module:
+            if args.transport == 'http':
+                with serve(app_module) as base_url:
+                    level = run_level(_http_sender(base_url), llm, sessions, concurrency, len(results['levels']))
+            else:
+                level = run_level(_client_sender(app_module), llm, sessions, concurrency, len(results['levels']))
+        results['levels'].append(level)
+
+    print(f"{args.sessions} sessions x {args.turns} turns over {args.transport}, "
+          f"stub LLM median {args.latency_ms:.0f}ms (sigma {args.sigma})")
+    print(f"{'concurrency':>11} {'turns/s':>8} {'p50':>9} {'p90':>9} {'p99':>9} {'errors':>7} "
+          f"{'LLM/turn':>9} {'DB/turn':>9} {'RSS':>8}")
+    for r in results['levels']:
+        errors = r['requests'] - int(r['statuses'].get('200', 0))
+        print(f"{r['concurrency']:>11} {r['turns_per_second']:>8.1f} {r['latency_ms']['p50']:>7.0f}ms "
+              f"{r['latency_ms']['p90']:>7.0f}ms {r['latency_ms']['p99']:>7.0f}ms {errors:>7} "
+              f"{r['llm_calls_per_turn']:>9.2f} {r['db']['bytes_per_turn']:>8.0f}B "
+              f"{r['memory']['rss_after_mb']:>6.0f}MB")
+
+    print("\nper-stage p50 / p99 (ms) by concurrency")
+    stages = sorted({stage for r in results['levels'] for stage in r['stages']})
+    print(f"{'stage':>20} " + " ".join(f"{r['concurrency']:>17}" for r in results['levels']))
+    for stage in stages:
+        cells = [r['stages'].get(stage) for r in results['levels']]
+        print(f"{stage:>20} " + " ".join(f"{c['p50_ms']:>8.1f}/{c['p99_ms']:>8.1f}" if c else f"{'-':>17}"
+                                        for c in cells))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nwrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        lines, regressed = compare(results, baseline, args.tolerance)
+        print(f"\nagainst {args.baseline} ({baseline.get('commit') or 'unknown commit'}), "
+              f"tolerance {args.tolerance:.0%}")
+        if baseline.get('config') != results['config']:
+            print(f"note: the baseline ran with different settings: {baseline.get('config')}")
+        print(f"{'concurrency':>11} {'metric':>22} {'baseline':>12} {'this run':>12} {'change':>8}")
+        print("\n".join(lines))
+        if regressed:
+            sys.exit(1)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=lambda s: [int(c) for c in s.split(',')], default=[1, 8, 32])
+    parser.add_argument('--sessions', type=int, default=64)
+    parser.add_argument('--turns', type=int, default=6)
+    parser.add_argument('--transport', choices=['client', 'http'], default='client')
+    parser.add_argument('--latency-ms', type=float, default=300, help="median stub LLM latency")
+    parser.add_argument('--sigma', type=float, default=0.5, help="lognormal spread of stub LLM latency")
+    parser.add_argument('--llm-cache-size', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=5)
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="earlier --output file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed relative regression")
+    main(parser.parse_args())
@@ -0,0 +1,162 @@
+# benchmarks/rerank_eval.py
+"""Offline evaluation of session-aware re-ranking on logged (and synthetic) chat sessions.
+
+Replays every session in conversation_history turn by turn. Preferences are
+accumulated from the user messages with the rule-based extractor (a message
+it can't read confidently leaves them unchanged, since the LLM is not called
+here), and each turn's candidates come from the same full-text and tag search
+as the app. Three recommenders are compared on every turn:
+- `logged`: the recommendation_made the app actually logged (no slate);
+- `search`: the top candidates in search order, as before re-ranking;
+- `rerank`: the Reranker given the products already recommended in the session.
+
+The metrics are:
+- `repeat`: the share of turns whose pick was already recommended in the session;
+- `distinct`: distinct picks per session;
+- `top share`: the share of all picks taken by the most-picked product, which
+  is what dominates the /analytics chart;
+- `categories`: distinct categories in the 5-product slate;
+- `similarity`: mean pairwise tag similarity within the slate;
+- `rank`: the pick's mean position in search order, the relevance given up.
+
+Since the demo database logs few sessions, --synthetic adds sessions that
+keep asking for more of the same, e.g. "something spicy" then "another
+spicy one".
+
+Usage: python -m benchmarks.rerank_eval [--db data/foodiebot.db] [--synthetic 500] [--turns 6]
+"""
+import argparse
+import itertools
+import random
+import statistics
+import time
+from collections import Counter
+
+import numpy as np
+
+import core_logic
+import database_setup
+import db
+from benchmarks.synthetic import load_vocabulary
+from config import PREFERENCE_RULES_MIN_CONFIDENCE, RERANK_CANDIDATES
+from preference_rules import get_preference_rules
+from recommendation_cache import preference_key
+from reranker import get_reranker
+
+FOLLOW_UPS = ["another {term} one", "more {term} please", "any other {term} options?", "{term} again",
+              "something else {term}"]
+
+
+def logged_sessions(conn):
+    """session_id -> [(role, content, recommendation_made)] in logged order."""
+    sessions = {}
+    rows = conn.execute("SELECT session_id, role, content, recommendation_made FROM conversation_history "
+                        "ORDER BY session_id, id")
+    for session_id, role, content, recommendation in rows:
+        sessions.setdefault(session_id, []).append((role, content, recommendation))
+    return sessions
+
+
+def synthetic_sessions(count, turns, vocab, seed=4):
+    rng = random.Random(seed)
+    terms = [t.lower() for t in vocab['mood_tags'] + vocab['category']]
+    sessions = {}
+    for n in range(count):
+        term = rng.choice(terms)
+        messages = [f"I want something {term}"] + [rng.choice(FOLLOW_UPS).format(term=term)
+                                                   for _ in range(turns - 1)]
+        sessions[f"synthetic-{n}"] = [('user', message, None) for message in messages]
+    return sessions
+
+
+def _candidates(preferences):
+    budget, mood, cravings, dietary = preference_key(preferences)
+    _, products = core_logic._structured_search(budget, list(mood), list(cravings), list(dietary), RERANK_CANDIDATES)
+    return products
+
+
+def replay(sessions, reranker):
+    rules = get_preference_rules()
+    features = reranker.features
+    results = {name: {'picks': [], 'repeats': 0, 'turns': 0, 'distinct': [], 'categories': [],
+                      'similarity': [], 'ranks': []} for name in ('logged', 'search', 'rerank')}
+    rerank_seconds = []
+
+    def record(name, pick, shown, slate=None, rank=None):
+        result = results[name]
+        result['turns'] += 1
+        result['repeats'] += pick in shown
+        result['picks'].append(pick)
+        if slate:
+            rows = features.rows(slate)
+            result['categories'].append(len(set(features.categories[rows].tolist())))
+            vectors = features.tags[rows]
+            pairs = list(itertools.combinations(range(len(slate)), 2))
+            if pairs:
+                similarity = vectors @ vectors.T
+                result['similarity'].append(statistics.fmean(float(similarity[i, j]) for i, j in pairs))
+        if rank is not None:
+            result['ranks'].append(rank)
+        shown.append(pick)
+
+    for turns in sessions.values():
+        preferences = {}
+        shown = {name: [] for name in results}
+        for role, content, recommendation in turns:
+            if role != 'user':
+                if recommendation:
+                    record('logged', recommendation, shown['logged'])
+                continue
+            updated, confidence = rules.update(preferences, content)
+            if confidence >= PREFERENCE_RULES_MIN_CONFIDENCE:
+                preferences = updated
+            candidates = _candidates(preferences)
+            if not candidates:
+                continue
+            ids = [p['product_id'] for p in candidates]
+            record('search', ids[0], shown['search'], ids[:5], 0)
+            start = time.perf_counter()
+            order = reranker.order(ids, shown['rerank'])
+            rerank_seconds.append(time.perf_counter() - start)
+            record('rerank', ids[order[0]], shown['rerank'], [ids[i] for i in order], order[0])
+        for name in results:
+            if shown[name]:
+                results[name]['distinct'].append(len(set(shown[name])))
+    return results, rerank_seconds
+
+
+def _mean(values):
+    return f"{statistics.fmean(values):.2f}" if values else "-"
+
+
+def main(db_path, synthetic, turns):
+    db.configure(db_path)
+    database_setup.notify_catalog_changed()
+    with db.connection() as conn:
+        sessions = logged_sessions(conn)
+    logged = len(sessions)
+    sessions.update(synthetic_sessions(synthetic, turns, load_vocabulary()))
+    reranker = get_reranker()
+    results, rerank_seconds = replay(sessions, reranker)
+
+    print(f"{logged} logged + {synthetic} synthetic sessions, {RERANK_CANDIDATES} candidates per turn")
+    print(f"{'':>7} {'turns':>6} {'repeat':>7} {'distinct':>9} {'top share':>10} {'categories':>11} "
+          f"{'similarity':>11} {'rank':>5}")
+    for name, result in results.items():
+        if not result['turns']:
+            continue
+        top_share = Counter(result['picks']).most_common(1)[0][1] / result['turns']
+        print(f"{name:>7} {result['turns']:>6} {result['repeats'] / result['turns']:>7.1%} "
+              f"{_mean(result['distinct']):>9} {top_share:>10.1%} {_mean(result['categories']):>11} "
+              f"{_mean(result['similarity']):>11} {_mean(result['ranks']):>5}")
+    micros = np.array(rerank_seconds) * 1e6
+    print(f"\nre-rank latency: p50 {np.percentile(micros, 50):.1f}us, p99 {np.percentile(micros, 99):.1f}us")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default=database_setup.DB_PATH)
+    parser.add_argument('--synthetic', type=int, default=500)
+    parser.add_argument('--turns', type=int, default=6)
+    args = parser.parse_args()
+    main(args.db, args.synthetic, args.turns)
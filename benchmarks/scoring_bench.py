@@ -0,0 +1,98 @@
+# benchmarks/scoring_bench.py
+"""Messages/sec of the compiled scoring engine versus the original per-factor substring scans.
+
+Usage: python -m benchmarks.scoring_bench [--messages 100000]
+"""
+import argparse
+import random
+import time
+
+import scoring
+
+LEGACY_KEYWORDS = {
+    'enthusiasm_words': ["love", "want", "need", "perfect", "amazing", "great"],
+    'price_inquiry': ["how much", "price", "cost"],
+    'order_intent': ["i'll take it", "add to cart", "order", "buy"],
+    'question_asking': ["what's in", "spice level", "calories"],
+    'hesitation': ["maybe", "not sure", "i guess"],
+    'budget_concern': ["too expensive", "that's a lot"],
+    'rejection': ["don't like", "no thanks", "not that"],
+}
+
+
+def legacy_calculate_interest_score(text, current_score):
+    """The original calculate_interest_score: one any() substring scan per factor."""
+    score_change = 0
+    text_lower = text.lower()
+    if any(k in text_lower for k in ["love", "want", "need", "perfect", "amazing", "great"]): score_change += 8
+    if any(k in text_lower for k in ["how much", "price", "cost"]): score_change += 25
+    if any(k in text_lower for k in ["i'll take it", "add to cart", "order", "buy"]): score_change += 30
+    if any(k in text_lower for k in ["what's in", "spice level", "calories"]): score_change += 10
+    if any(k in text_lower for k in ["maybe", "not sure", "i guess"]): score_change -= 10
+    if any(k in text_lower for k in ["too expensive", "that's a lot"]): score_change -= 15
+    if any(k in text_lower for k in ["don't like", "no thanks", "not that"]): score_change -= 25
+    return max(0, min(100, current_score + score_change))
+
+
+def naive_score_delta(text):
+    """The legacy any() approach extended to every declared factor."""
+    text_lower = text.lower()
+    return sum(scoring.FACTORS[factor] for factor, words in scoring.KEYWORDS.items()
+               if any(k in text_lower for k in words))
+
+
+def synthetic_messages(count, seed=1):
+    """Chat-like messages mixing filler words with keywords from every factor."""
+    rng = random.Random(seed)
+    keywords = [k for words in scoring.KEYWORDS.values() for k in words]
+    filler = ("i", "the", "a", "something", "tonight", "with", "for", "me", "and", "it", "sounds",
+              "burger", "pizza", "fries", "really", "just", "what", "about", "you", "have")
+    messages = []
+    for _ in range(count):
+        words = [rng.choice(filler) for _ in range(rng.randint(4, 20))]
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords))
+        messages.append(" ".join(words).capitalize())
+    return messages
+
+
+def check_parity(messages):
+    """The compiled matcher must agree with plain substring scans, both on the
+    original rules alone and on the full rule set."""
+    pattern, factor_map = scoring._compile(LEGACY_KEYWORDS)
+    for text in messages:
+        factors = set()
+        for match in pattern.finditer(text.lower()):
+            factors |= factor_map[match.group(1)]
+        compiled = max(0, min(100, 50 + sum(scoring.FACTORS[f] for f in factors)))
+        assert compiled == legacy_calculate_interest_score(text, 50), text
+    assert scoring.score_deltas(messages) == [naive_score_delta(m) for m in messages]
+
+
+def _rate(fn, messages):
+    start = time.perf_counter()
+    fn(messages)
+    return len(messages) / (time.perf_counter() - start)
+
+
+def main(count):
+    messages = synthetic_messages(count)
+    check_parity(messages[:10000])
+
+    rates = {
+        'legacy (7 factors)': _rate(lambda ms: [legacy_calculate_interest_score(m, 50) for m in ms], messages),
+        'naive (13 factors)': _rate(lambda ms: [naive_score_delta(m) for m in ms], messages),
+        'compiled per message': _rate(lambda ms: [scoring.calculate_interest_score(m, 50) for m in ms], messages),
+        'compiled batch': _rate(scoring.score_deltas, messages),
+    }
+    print(f"{len(messages)} messages, {len(scoring.FACTORS)} factors in the compiled engine")
+    for name, rate in rates.items():
+        print(f"{name:>22}: {rate:>12,.0f} msg/s")
+    return rates
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=100000)
+    args = parser.parse_args()
+    main(args.messages)
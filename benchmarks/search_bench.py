@@ -0,0 +1,85 @@
+# benchmarks/search_bench.py
+"""Per-query latency of the in-memory search index versus the legacy LIKE-chain SQL.
+
+Usage: python -m benchmarks.search_bench [--sizes 100,10000,1000000] [--queries 50]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from benchmarks.synthetic import build_catalog_db, load_vocabulary, synthetic_preferences
+from search_index import ProductSearchIndex
+
+
+def legacy_sql_query(db_path, preferences):
+    """The original query_database_for_products: one connection and a LIKE clause per tag."""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    query = "SELECT * FROM products WHERE 1=1"
+    params = []
+    if preferences.get("budget"):
+        query += " AND price <= ?"
+        params.append(preferences["budget"])
+    search_tags = preferences.get("mood", []) + preferences.get("cravings", []) + preferences.get("dietary", [])
+    for tag in search_tags:
+        query += " AND (mood_tags LIKE ? OR dietary_tags LIKE ? OR name LIKE ? OR description LIKE ?)"
+        param_like = f'%"{tag}"%'
+        params.extend([param_like, param_like, f'%{tag}%', f'%{tag}%'])
+    query += " ORDER BY popularity_score DESC LIMIT 5"
+    products = [dict(row) for row in conn.execute(query, params).fetchall()]
+    conn.close()
+    return products
+
+
+def _time_queries(fn, queries):
+    samples = []
+    for prefs in queries:
+        start = time.perf_counter()
+        fn(prefs)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'mean_ms': statistics.fmean(samples),
+        'p50_ms': samples[len(samples) // 2],
+        'p99_ms': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+def run(sizes, query_count):
+    vocab = load_vocabulary()
+    queries = synthetic_preferences(query_count, vocab)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            db_path = os.path.join(tmp, f"catalog_{size}.db")
+            build_catalog_db(db_path, size, vocab)
+
+            start = time.perf_counter()
+            index = ProductSearchIndex.from_db(db_path)
+            build_s = time.perf_counter() - start
+
+            sql = _time_queries(lambda p: legacy_sql_query(db_path, p), queries)
+            indexed = _time_queries(lambda p: index.search(
+                budget=p.get('budget'), mood=p.get('mood', []),
+                cravings=p.get('cravings', []), dietary=p.get('dietary', [])), queries)
+            results.append((size, build_s, sql, indexed))
+            os.remove(db_path)
+
+    print(f"{'products':>10} {'index build':>12} {'sql p50':>10} {'sql p99':>10} "
+          f"{'index p50':>10} {'index p99':>10} {'speedup':>8}")
+    for size, build_s, sql, indexed in results:
+        speedup = sql['mean_ms'] / indexed['mean_ms'] if indexed['mean_ms'] else float('inf')
+        print(f"{size:>10} {build_s:>11.2f}s {sql['p50_ms']:>8.3f}ms {sql['p99_ms']:>8.3f}ms "
+              f"{indexed['p50_ms']:>8.3f}ms {indexed['p99_ms']:>8.3f}ms {speedup:>7.1f}x")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='100,10000,1000000')
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args()
+    run([int(s) for s in args.sizes.split(',')], args.queries)
@@ -0,0 +1,126 @@
+# benchmarks/session_bench.py
+"""Per-turn DB reads and latency of loading session context: legacy queries vs the session store.
+
+Replays chat sessions turn by turn against a scratch database. At each turn
+the context a /chat turn needs (transcript and preferences, plus the score
+the client used to send) is loaded both the original way (history and
+session_preferences queries) and through SessionStore, and SELECT statements
+are counted with an SQLite trace callback. Turns are logged as the app
+would, so histories grow. A final pass sends real /chat requests with the
+store on and with it disabled (max_sessions=0: every turn rebuilt from SQLite).
+
+Usage: python -m benchmarks.session_bench [--sessions 200] [--turns 40]
+"""
+import argparse
+import statistics
+import threading
+import time
+
+import conversation_logger
+import db
+import session_store
+from benchmarks.direct_store import get_logged_history
+from benchmarks.harness import scratch_app
+from llm_client import LLMClient, StubBackend
+
+MESSAGES = ["I'm craving something spicy", "Anything vegetarian under $12?", "How much is that one?",
+            "Maybe something more comforting", "I love it, I'll take it"]
+
+
+class _ReadCounter:
+    """Counts SELECTs on every connection opened through db.connect."""
+
+    def __init__(self):
+        self.reads = 0
+        self._lock = threading.Lock()
+        self._connect = db.connect
+
+    def _trace(self, statement):
+        if statement.lstrip()[:6].upper() == 'SELECT':
+            with self._lock:
+                self.reads += 1
+
+    def install(self):
+        def connect(*args, **kwargs):
+            conn = self._connect(*args, **kwargs)
+            conn.set_trace_callback(self._trace)
+            return conn
+        db.connect = connect
+
+
+def legacy_context(session_id):
+    """What begin_turn read before the session store: full transcript and stored preferences."""
+    return get_logged_history(session_id), db.get_session_preferences(session_id)
+
+
+def _summary(samples):
+    samples = sorted(samples)
+    return statistics.fmean(samples), samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def replay(counter, sessions, turns):
+    store = session_store.get_session_store()
+    results = {'legacy': ([], []), 'store': ([], [])}
+    for turn in range(turns):
+        for n in range(sessions):
+            session_id = f"bench-{n}"
+            for name, load in (('legacy', legacy_context), ('store', store.get)):
+                reads = counter.reads
+                start = time.perf_counter()
+                load(session_id)
+                results[name][0].append(counter.reads - reads)
+                results[name][1].append((time.perf_counter() - start) * 1000)
+            # Log the turn the way the app does
+            state = store.get(session_id)
+            message = MESSAGES[turn % len(MESSAGES)]
+            conversation_logger.log_message(session_id, 'user', message, state.score)
+            store.record_turn(state, 'user', message)
+            db.save_session_preferences(session_id, {'mood': ['spicy']})
+            store.set_preferences(state, {'mood': ['spicy']})
+            conversation_logger.log_message(session_id, 'bot', "Try the Dragon Burger!", state.score + 5, 'FF001')
+            store.record_turn(state, 'bot', "Try the Dragon Burger!", state.score + 5, 'FF001')
+    return results
+
+
+def chat_reads(app_module, counter, sessions, turns, max_sessions):
+    store = session_store.get_session_store()
+    store.clear()
+    store.max_sessions = max_sessions
+    client = app_module.app.test_client()
+    reads, latencies = [], []
+    for turn in range(turns):
+        for n in range(sessions):
+            before = counter.reads
+            start = time.perf_counter()
+            client.post('/chat', json={'message': MESSAGES[turn % len(MESSAGES)], 'session_id': f"chat-{n}"})
+            latencies.append((time.perf_counter() - start) * 1000)
+            reads.append(counter.reads - before)
+    return statistics.fmean(reads), statistics.fmean(latencies)
+
+
+def main(sessions, turns):
+    counter = _ReadCounter()
+    counter.install()
+    with scratch_app(LLMClient(StubBackend(), cache_size=0)) as app_module:
+        results = replay(counter, sessions, turns)
+        conversation_logger.get_logger().flush()
+        limit = session_store.get_session_store().max_sessions
+        cached = chat_reads(app_module, counter, min(sessions, 50), 5, limit)
+        uncached = chat_reads(app_module, counter, min(sessions, 50), 5, 0)
+        session_store.get_session_store().max_sessions = limit
+
+    print(f"{sessions} sessions x {turns} turns, context load per turn")
+    print(f"{'path':>8} {'reads':>7} {'mean':>9} {'p99':>9}")
+    for name, (reads, latencies) in results.items():
+        mean, p99 = _summary(latencies)
+        print(f"{name:>8} {statistics.fmean(reads):>7.2f} {mean:>7.3f}ms {p99:>7.3f}ms")
+    print(f"\n/chat with the stub LLM: {cached[0]:.2f} reads, {cached[1]:.2f}ms per turn with the store; "
+          f"{uncached[0]:.2f} reads, {uncached[1]:.2f}ms rebuilding every turn from SQLite")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--turns', type=int, default=40)
+    args = parser.parse_args()
+    main(args.sessions, args.turns)
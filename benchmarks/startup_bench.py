@@ -0,0 +1,122 @@
+# benchmarks/startup_bench.py
+"""Import time of the API modules and time to first chat turn of a forked worker.
+
+Each target is imported in a fresh interpreter under `python -X importtime`
+(median of --runs), and the slowest modules it pulls in directly are listed.
+
+Workers are then forked from a process that has imported the app, the way a
+pre-forking server with preloading does. Each worker points the DB pool at a
+synthetic catalog and serves two /chat turns with the stub LLM. Cold
+workers build the search indexes and open connections on their first turn;
+warmed workers call warm_up() right after the fork.
+
+Usage: python -m benchmarks.startup_bench [--runs 5] [--workers 5] [--products 100000]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import build_catalog_db, load_vocabulary
+from llm_client import LLMClient, StubBackend
+
+TARGETS = {
+    'app': "import app",
+    'core_logic': "import core_logic",
+    'scoring via core_logic': "from core_logic import calculate_interest_score",
+    'scoring': "from scoring import calculate_interest_score",
+}
+
+
+def import_times(statement, runs):
+    """(median seconds spent on `statement`'s imports, [(seconds, module)] for the modules it pulls in directly)."""
+    totals, direct = [], {}
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                                capture_output=True, text=True, check=True)
+        parsed = []
+        for line in result.stderr.splitlines():
+            if line.startswith('import time:') and not line.endswith('imported package'):
+                _, cumulative, name = line.split('|')
+                parsed.append((len(name) - len(name.lstrip()), int(cumulative) / 1e6, name.strip()))
+        # A module is listed after everything it imported, so the statement's module is
+        # last and its imports run back to the previous entry at the same depth
+        top, total, _ = parsed[-1]
+        totals.append(total)
+        for depth, seconds, name in reversed(parsed[:-1]):
+            if depth == top:
+                break
+            if depth == top + 2:
+                direct.setdefault(name, []).append(seconds)
+    slowest = sorted(((statistics.median(s), name) for name, s in direct.items()), reverse=True)
+    return statistics.median(totals), slowest
+
+
+def _worker(app_module, db_path, warm, write_fd):
+    import core_logic
+    import db
+
+    db.configure(db_path)  # a forked worker must not share its parent's SQLite handles
+    result = {}
+    start = time.perf_counter()
+    if warm:
+        core_logic.warm_up()
+        result['warm_up'] = time.perf_counter() - start
+    client = app_module.app.test_client()
+    for turn in ('first_turn', 'second_turn'):
+        t = time.perf_counter()
+        client.post('/chat', json={'message': "spicy burger under $12", 'session_id': f"worker-{os.getpid()}"})
+        result[turn] = time.perf_counter() - t
+    os.write(write_fd, json.dumps(result).encode())
+
+
+def fork_worker(app_module, db_path, warm):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            _worker(app_module, db_path, warm, write_fd)
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        data = pipe.read()
+    os.waitpid(pid, 0)
+    return json.loads(data)
+
+
+def main(runs, workers, products):
+    print(f"import time, median of {runs} fresh interpreters")
+    for label, statement in TARGETS.items():
+        total, slowest = import_times(statement, runs)
+        heaviest = ", ".join(f"{name} {seconds * 1000:.0f}ms" for seconds, name in slowest[:4])
+        print(f"{label:>24}: {total * 1000:7.1f}ms" + (f"  ({heaviest})" if heaviest else ""))
+
+    import app as app_module
+    import core_logic
+
+    core_logic.llm = LLMClient(StubBackend(), cache_size=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'catalog.db')
+        build_catalog_db(db_path, products, load_vocabulary())
+        print(f"\nforked workers, median of {workers}: {products} products, stub LLM")
+        print(f"{'worker':>7} {'warm-up':>9} {'1st turn':>9} {'2nd turn':>9}")
+        for warm in (False, True):
+            results = [fork_worker(app_module, db_path, warm) for _ in range(workers)]
+            median = {key: statistics.median(r[key] for r in results) * 1000 for key in results[0]}
+            print(f"{'warm' if warm else 'cold':>7} {median.get('warm_up', 0):>7.1f}ms "
+                  f"{median['first_turn']:>7.1f}ms {median['second_turn']:>7.1f}ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=5)
+    parser.add_argument('--products', type=int, default=100000)
+    args = parser.parse_args()
+    main(args.runs, args.workers, args.products)
@@ -0,0 +1,82 @@
+# benchmarks/streaming_bench.py
+"""Time-to-first-byte and time-to-first-token of /chat versus the streaming /chat/stream.
+
+Uses the stub LLM with a fixed round-trip latency plus a per-token generation
+delay, so the buffered endpoint pays for the whole completion before sending
+anything while the streaming one can forward tokens as they appear.
+
+Usage: python -m benchmarks.streaming_bench [--requests 10] [--latency-ms 300] [--token-delay-ms 40]
+"""
+import argparse
+import http.client
+import json
+import statistics
+import time
+from urllib.parse import urlparse
+
+from benchmarks.harness import scratch_app, serve
+from llm_client import LLMClient, StubBackend
+
+
+def _request(base_url, path, payload):
+    url = urlparse(base_url)
+    conn = http.client.HTTPConnection(url.hostname, url.port, timeout=60)
+    start = time.perf_counter()
+    conn.request('POST', path, body=json.dumps(payload), headers={'Content-Type': 'application/json'})
+    return conn, conn.getresponse(), start
+
+
+def time_buffered(base_url, session_id):
+    conn, response, start = _request(base_url, '/chat', {'message': "something spicy under $12",
+                                                         'session_id': session_id})
+    response.read(1)
+    ttfb = time.perf_counter() - start
+    response.read()
+    total = time.perf_counter() - start
+    conn.close()
+    # The whole reply arrives in one body, so the first token is the last one
+    return {'ttfb': ttfb, 'product': total, 'ttft': total, 'total': total}
+
+
+def time_streaming(base_url, session_id):
+    conn, response, start = _request(base_url, '/chat/stream', {'message': "something spicy under $12",
+                                                                'session_id': session_id})
+    marks = {}
+    while True:
+        line = response.fp.readline()
+        if not line:
+            break
+        marks.setdefault('ttfb', time.perf_counter() - start)
+        if line.startswith(b'event: product'):
+            marks.setdefault('product', time.perf_counter() - start)
+        elif line.startswith(b'event: token'):
+            marks.setdefault('ttft', time.perf_counter() - start)
+        elif line.startswith(b'event: done'):
+            response.fp.readline()
+            break
+    marks['total'] = time.perf_counter() - start
+    conn.close()
+    return marks
+
+
+def main(requests, latency_ms, token_delay_ms):
+    client = LLMClient(StubBackend(latency_ms=latency_ms, token_delay_ms=token_delay_ms), cache_size=0)
+    results = {}
+    with scratch_app(client) as app_module, serve(app_module) as base_url:
+        for name, fn in (('/chat', time_buffered), ('/chat/stream', time_streaming)):
+            samples = [fn(base_url, f"stream-bench-{name}-{i}") for i in range(requests)]
+            results[name] = {k: statistics.median(s[k] for s in samples) * 1000 for k in samples[0]}
+
+    print(f"{'endpoint':>13} {'TTFB':>9} {'product':>9} {'TTFT':>9} {'total':>9}  (median ms)")
+    for name, r in results.items():
+        print(f"{name:>13} {r['ttfb']:>9.0f} {r['product']:>9.0f} {r['ttft']:>9.0f} {r['total']:>9.0f}")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=10)
+    parser.add_argument('--latency-ms', type=float, default=300)
+    parser.add_argument('--token-delay-ms', type=float, default=40)
+    args = parser.parse_args()
+    main(args.requests, args.latency_ms, args.token_delay_ms)
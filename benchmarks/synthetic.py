@@ -0,0 +1,110 @@
+# benchmarks/synthetic.py
+import json
+import os
+import random
+import sqlite3
+
+import database_setup
+
+PRODUCT_COLUMNS = database_setup.PRODUCT_COLUMNS
+
+
+def load_vocabulary(json_path=database_setup.JSON_PATH):
+    """Collects categories, tags and name/description words from products.json."""
+    with open(json_path, 'r') as f:
+        products = json.load(f)
+    vocab = {'category': set(), 'mood_tags': set(), 'dietary_tags': set(),
+             'ingredients': set(), 'allergens': set(), 'words': set()}
+    for p in products:
+        vocab['category'].add(p['category'])
+        for key in ('mood_tags', 'dietary_tags', 'ingredients', 'allergens'):
+            vocab[key].update(p.get(key) or [])
+        vocab['words'].update(w.strip('.,!') for w in (p['name'] + ' ' + p['description']).split())
+    return {k: sorted(v) for k, v in vocab.items()}
+
+
+def synthetic_products(count, vocab, seed=0):
+    """Yields `count` product rows (tuples in PRODUCT_COLUMNS order)."""
+    rng = random.Random(seed)
+    words = vocab['words']
+    for i in range(count):
+        name = " ".join(rng.sample(words, 3))
+        yield (
+            f"SP{i:07d}",
+            name,
+            rng.choice(vocab['category']),
+            " ".join(rng.sample(words, 12)),
+            json.dumps(rng.sample(vocab['ingredients'], 5)),
+            round(rng.uniform(3, 25), 2),
+            rng.randint(150, 1400),
+            f"{rng.randint(3, 9)}-{rng.randint(10, 15)} mins",
+            json.dumps(rng.sample(vocab['dietary_tags'], rng.randint(0, 3))),
+            json.dumps(rng.sample(vocab['mood_tags'], rng.randint(1, 4))),
+            json.dumps(rng.sample(vocab['allergens'], rng.randint(0, 2))),
+            rng.randint(1, 100),
+            rng.random() < 0.1,
+            rng.random() < 0.1,
+            rng.randint(0, 10),
+            name,
+        )
+
+
+def build_catalog_db(db_path, count, vocab, seed=0):
+    """Creates a fresh database at db_path holding `count` synthetic products."""
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    database_setup.create_database(db_path)
+    conn = sqlite3.connect(db_path)
+    placeholders = ", ".join("?" for _ in PRODUCT_COLUMNS)
+    conn.executemany(
+        f"INSERT INTO products ({', '.join(PRODUCT_COLUMNS)}) VALUES ({placeholders})",
+        synthetic_products(count, vocab, seed)
+    )
+    conn.commit()
+    conn.close()
+
+
+def synthetic_preferences(count, vocab, seed=1):
+    """Random preference dicts shaped like extract_preferences_from_conversation output."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        prefs = {}
+        if rng.random() < 0.6:
+            prefs['budget'] = float(rng.randint(6, 20))
+        if rng.random() < 0.7:
+            prefs['mood'] = [rng.choice(vocab['mood_tags']).lower()]
+        if rng.random() < 0.6:
+            prefs['cravings'] = [rng.choice(vocab['words']).lower()]
+        if rng.random() < 0.3:
+            prefs['dietary'] = [rng.choice(vocab['dietary_tags']).lower()]
+        queries.append(prefs)
+    return queries
+
+
+OPENERS = ["Hi! I'm in the mood for something {mood}", "I'm craving {craving}", "hey, anything {mood}?",
+           "Looking for {craving} tonight", "What's good if I'm feeling {mood}?"]
+FOLLOW_UPS = ["Anything {dietary}?", "Keep it under ${budget} please", "Something with {ingredient}?",
+              "Maybe something more {mood} instead", "Do you have {craving}?", "What else do you have?",
+              "How much is that one?", "What's in it?", "Hmm, not sure, let me think", "That sounds amazing!"]
+CLOSERS = ["I love it, I'll take it", "Perfect, add to cart", "No thanks, maybe later", "Great, I'll order that"]
+
+
+def synthetic_sessions(count, turns, vocab, seed=5):
+    """`count` scripted chats of `turns` user messages each: an opener, follow-ups that
+    refine or question the suggestion, and (usually) a closing decision."""
+    rng = random.Random(seed)
+    sessions = []
+    for _ in range(count):
+        def fill(template):
+            return template.format(mood=rng.choice(vocab['mood_tags']).lower(),
+                                   craving=rng.choice(vocab['category']).lower(),
+                                   dietary=rng.choice(vocab['dietary_tags']).lower(),
+                                   ingredient=rng.choice(vocab['ingredients']).lower(),
+                                   budget=rng.randint(6, 20))
+        messages = [fill(rng.choice(OPENERS))]
+        messages += [fill(rng.choice(FOLLOW_UPS)) for _ in range(turns - 2)]
+        if turns > 1:
+            messages.append(fill(rng.choice(CLOSERS if rng.random() < 0.8 else FOLLOW_UPS)))
+        sessions.append(messages[:turns])
+    return sessions
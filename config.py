@@ -1,9 +1,113 @@
-# config.py
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# Replace with your chosen LLM's API key
-# Using Gemini as an example
-API_KEY = os.getenv("GEMINI_API_KEY")
\ No newline at end of file
+# config.py
+import os
+
+# Settings come from the environment, plus the project's .env file if there is one
+# (python-dotenv is only imported then)
+ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
+if os.path.exists(ENV_FILE):
+    from dotenv import load_dotenv
+    load_dotenv(ENV_FILE)
+
+# Replace with your chosen LLM's API key
+# Using Gemini as an example
+API_KEY = os.getenv("GEMINI_API_KEY")
+
+# --- LLM worker pool ---
+# Maximum concurrent LLM calls, extra calls allowed to wait, and per-call timeout
+LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", "8"))
+LLM_QUEUE_DEPTH = int(os.getenv("LLM_QUEUE_DEPTH", "16"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+
+# --- LLM client ---
+# Backend is 'gemini' or 'stub' (deterministic and offline, for local runs and benchmarks)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-1.5-flash")
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "600"))
+# Stub round trip: median latency, and the spread of its lognormal distribution (0 = fixed)
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "0"))
+LLM_STUB_LATENCY_SIGMA = float(os.getenv("LLM_STUB_LATENCY_SIGMA", "0"))
+
+# --- Database ---
+DB_PATH = os.getenv("FOODIEBOT_DB", os.path.join('data', 'foodiebot.db'))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_BUSY_TIMEOUT_SECONDS = float(os.getenv("DB_BUSY_TIMEOUT_SECONDS", "5"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "128"))
+# How much popularity_score (0-100) can boost a full-text match: a product with
+# popularity 100 ranks as if its BM25 relevance were (1 + weight) times higher
+SEARCH_POPULARITY_WEIGHT = float(os.getenv("SEARCH_POPULARITY_WEIGHT", "0.5"))
+# Semantic fallback search: embedder name ('hashing' works offline), vector size,
+# and the cosine similarity a product needs to be suggested at all
+EMBEDDER = os.getenv("EMBEDDER", "hashing")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "256"))
+EMBEDDING_MIN_SCORE = float(os.getenv("EMBEDDING_MIN_SCORE", "0.1"))
+# Messages the rule-based preference extractor understands at least this well
+# (share of meaningful words recognized, 0-1) skip the LLM; above 1 disables it
+PREFERENCE_RULES_MIN_CONFIDENCE = float(os.getenv("PREFERENCE_RULES_MIN_CONFIDENCE", "0.75"))
+# Product query results cached per canonical preference tuple, and how often (in
+# seconds) each process checks the database for catalog/popularity changes
+RECOMMENDATION_CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "1024"))
+CATALOG_VERSION_CHECK_SECONDS = float(os.getenv("CATALOG_VERSION_CHECK_SECONDS", "1"))
+# Re-ranking: how many search results are considered for the 5 shown, relevance vs
+# tag diversity (1 = relevance only), how far products this session has already been
+# recommended fall, and how many of the 5 may share a category
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_RELEVANCE_WEIGHT = float(os.getenv("RERANK_RELEVANCE_WEIGHT", "0.7"))
+RERANK_SHOWN_PENALTY = float(os.getenv("RERANK_SHOWN_PENALTY", "1.0"))
+RERANK_MAX_PER_CATEGORY = int(os.getenv("RERANK_MAX_PER_CATEGORY", "2"))
+# Products upserted per transaction when loading the catalog
+CATALOG_BATCH_SIZE = int(os.getenv("CATALOG_BATCH_SIZE", "10000"))
+
+# --- Session state ---
+# Per-session score, recent turns and preferences are cached in each process
+# (least recently used sessions dropped past SESSION_MAX_SESSIONS or
+# SESSION_MAX_MEMORY_MB, idle ones after SESSION_IDLE_SECONDS) and rebuilt from
+# the database when missing. With several worker processes, use the 'file'
+# backend so they share state through SESSION_DIR (e.g. under /dev/shm).
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "local")
+SESSION_DIR = os.getenv("SESSION_DIR", os.path.join('data', 'sessions'))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_MAX_MEMORY_MB = float(os.getenv("SESSION_MAX_MEMORY_MB", "64"))
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "1800"))
+SESSION_RECENT_TURNS = int(os.getenv("SESSION_RECENT_TURNS", "20"))
+SESSION_RECENT_RECOMMENDATIONS = int(os.getenv("SESSION_RECENT_RECOMMENDATIONS", "10"))
+
+# --- Conversation logging ---
+# Turns are written behind the request in batches of up to LOG_BATCH_SIZE rows,
+# or after LOG_FLUSH_INTERVAL_SECONDS, whichever comes first
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "64"))
+LOG_FLUSH_INTERVAL_SECONDS = float(os.getenv("LOG_FLUSH_INTERVAL_SECONDS", "0.5"))
+# A batch that fails LOG_MAX_ATTEMPTS times in a row is retried one turn at a time, and
+# turns that still can't be written are logged and dropped. At most LOG_MAX_QUEUED_ROWS
+# turns wait to be written; past that, logging blocks for up to LOG_QUEUE_TIMEOUT_SECONDS
+# for room and then fails the request.
+LOG_MAX_ATTEMPTS = int(os.getenv("LOG_MAX_ATTEMPTS", "5"))
+LOG_MAX_QUEUED_ROWS = int(os.getenv("LOG_MAX_QUEUED_ROWS", "10000"))
+LOG_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LOG_QUEUE_TIMEOUT_SECONDS", "5"))
+
+# --- History compaction ---
+# Sessions idle for HISTORY_COMPACT_IDLE_SECONDS are rolled up into session_summaries
+# and their turns moved to HISTORY_ARCHIVE_DB (default: next to the live database, as
+# *_archive.db). Each app process runs this every HISTORY_COMPACT_INTERVAL_SECONDS
+# (0 = never; run `python history_compaction.py` from cron instead), up to
+# HISTORY_COMPACT_BATCH_SESSIONS sessions per transaction, then hands back up to
+# HISTORY_VACUUM_PAGES free pages to the filesystem.
+HISTORY_ARCHIVE_DB = os.getenv("HISTORY_ARCHIVE_DB")
+HISTORY_COMPACT_IDLE_SECONDS = float(os.getenv("HISTORY_COMPACT_IDLE_SECONDS", "86400"))
+HISTORY_COMPACT_INTERVAL_SECONDS = float(os.getenv("HISTORY_COMPACT_INTERVAL_SECONDS", "3600"))
+HISTORY_COMPACT_BATCH_SESSIONS = int(os.getenv("HISTORY_COMPACT_BATCH_SESSIONS", "500"))
+HISTORY_VACUUM_PAGES = int(os.getenv("HISTORY_VACUUM_PAGES", "2000"))
+
+# --- Metrics and profiling ---
+# With PROFILE_REQUESTS on, a request sent with `X-Profile: 1` (or ?profile=1) is
+# sampled every PROFILE_INTERVAL_MS and its folded stacks written to PROFILE_DIR
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "0").lower() in ("1", "true", "yes")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+# --- Catalog generation (generate_data.py) ---
+# Concurrent LLM calls, sustained calls per second (token bucket), and retry policy
+GEN_WORKERS = int(os.getenv("GEN_WORKERS", "4"))
+GEN_RATE_PER_SECOND = float(os.getenv("GEN_RATE_PER_SECOND", "1"))
+GEN_MAX_RETRIES = int(os.getenv("GEN_MAX_RETRIES", "5"))
+GEN_BACKOFF_SECONDS = float(os.getenv("GEN_BACKOFF_SECONDS", "2"))
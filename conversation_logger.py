@@ -0,0 +1,189 @@
+# conversation_logger.py
+import atexit
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import db
+from config import (LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL_SECONDS, LOG_MAX_ATTEMPTS, LOG_MAX_QUEUED_ROWS,
+                    LOG_QUEUE_TIMEOUT_SECONDS)
+from metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+LOG_DROPPED = Counter('foodiebot_conversation_turns_dropped_total',
+                      "Conversation turns that could not be written, by reason: rejected (the row itself "
+                      "kept failing) or shutdown (still queued when the final flush failed).", ['reason'])
+
+
+def _utc_timestamp():
+    # Same format as SQLite's CURRENT_TIMESTAMP, plus microseconds so turns
+    # queued within the same second keep their order
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+class ConversationLogger:
+    """Write-behind logger for conversation_history.
+
+    log() only queues the turn; a background thread writes queued turns in one
+    transaction once `batch_size` are waiting or the oldest has waited
+    `flush_interval` seconds. Queued turns stay visible to pending() until they
+    are committed, so a session always reads its own writes.
+
+    A batch that fails `max_attempts` times in a row is written one turn at a
+    time, and turns rejected on their own are logged and dropped rather than
+    holding up everything behind them. While the database itself is unavailable
+    nothing is dropped; instead, once `max_queued` turns are waiting, log()
+    blocks for up to `queue_timeout` seconds for room and then raises.
+    """
+
+    def __init__(self, batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL_SECONDS,
+                 write_rows=db.insert_messages, max_attempts=LOG_MAX_ATTEMPTS, max_queued=LOG_MAX_QUEUED_ROWS,
+                 queue_timeout=LOG_QUEUE_TIMEOUT_SECONDS):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._write_rows = write_rows
+        self._queue = deque()        # rows in arrival order
+        self._by_session = {}        # session_id -> its queued rows, oldest first
+        self._failures = 0           # consecutive failed writes of the batch at the head of the queue
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._room = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='conversation-logger', daemon=True)
+        self._thread.start()
+
+    def log(self, session_id, role, content, score, recommendation=None):
+        row = (session_id, role, content, score, recommendation, _utc_timestamp())
+        with self._lock:
+            if len(self._queue) >= self.max_queued:
+                self._wakeup.notify()
+                if not self._room.wait_for(lambda: len(self._queue) < self.max_queued or self._closed,
+                                           self.queue_timeout):
+                    raise RuntimeError(f"{len(self._queue)} conversation turns are waiting to be written")
+            if self._closed:
+                raise RuntimeError("ConversationLogger is closed")
+            self._queue.append(row)
+            self._by_session.setdefault(session_id, []).append(row)
+            if len(self._queue) >= self.batch_size:
+                self._wakeup.notify()
+
+    def pending(self, session_id):
+        """Turns of this session that are queued but not yet committed."""
+        with self._lock:
+            return list(self._by_session.get(session_id, ()))
+
+    def flush(self):
+        """Writes everything queued so far. Returns the number of rows written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = list(itertools.islice(self._queue, self.batch_size))
+                if not batch:
+                    return written
+                try:
+                    self._write_rows(batch)
+                except Exception:
+                    self._failures += 1
+                    if self._failures < self.max_attempts:
+                        raise
+                    written += self._write_one_by_one(batch)
+                else:
+                    self._dequeue(batch)
+                    written += len(batch)
+                self._failures = 0
+
+    def _write_one_by_one(self, batch):
+        """Writes the rows of a batch that keeps failing separately, dropping those rejected
+        on their own. Raises, keeping the rest queued, if the database itself is unavailable."""
+        written = 0
+        for row in batch:
+            try:
+                self._write_rows([row])
+                written += 1
+            except sqlite3.OperationalError:
+                raise  # locked, disk full, ...: not this row's fault
+            except Exception:
+                LOG_DROPPED.inc(reason='rejected')
+                logger.exception("Dropping a conversation turn of session %s (%s) after %d failed writes",
+                                 row[0], row[1], self.max_attempts)
+            self._dequeue([row])
+        return written
+
+    def _dequeue(self, rows):
+        # `rows` are the oldest queued ones, in order
+        with self._lock:
+            for row in rows:
+                self._queue.popleft()
+                session_rows = self._by_session[row[0]]
+                session_rows.pop(0)
+                if not session_rows:
+                    del self._by_session[row[0]]
+            self._room.notify_all()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._closed and len(self._queue) < self.batch_size:
+                    self._wakeup.wait(self.flush_interval)
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception:
+                # Rows stay queued and are retried on the next cycle (or by close())
+                logger.exception("Failed to flush conversation history")
+                if not closed:
+                    time.sleep(self.flush_interval)
+            if closed:
+                return
+
+    def close(self):
+        """Stops the background thread after writing every queued turn."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup.notify()
+        self._thread.join()
+        try:
+            self.flush()
+        except Exception:
+            with self._lock:
+                lost = len(self._queue)
+            LOG_DROPPED.inc(lost, reason='shutdown')
+            logger.exception("Could not write %d queued conversation turns; they are lost", lost)
+
+
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def get_logger():
+    """Returns the process-wide logger, flushed automatically at interpreter exit."""
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                _logger = ConversationLogger()
+                atexit.register(_logger.close)
+    return _logger
+
+
+def log_message(session_id, role, content, score, recommendation=None):
+    get_logger().log(session_id, role, content, score, recommendation)
+
+
+def get_interest_progression(session_id):
+    """Analytics need row ids, so write out anything this session still has queued first."""
+    if get_logger().pending(session_id):
+        get_logger().flush()
+    return db.get_interest_progression(session_id)
@@ -1,118 +1,229 @@
-# core_logic.py
-import sqlite3
-import json
-import os
-import google.generativeai as genai
-from config import API_KEY
-
-# Configure the LLM
-genai.configure(api_key=API_KEY)
-model = genai.GenerativeModel('gemini-1.5-flash')
-
-DB_PATH = os.path.join('data', 'foodiebot.db')
-
-# --- Interest Scoring Logic --- [cite: 51]
-ENGAGEMENT_FACTORS = {
-    'specific_preferences': 15, 'dietary_restrictions': 10, 'budget_mention': 5,
-    'mood_indication': 20, 'question_asking': 10, 'enthusiasm_words': 8,
-    'price_inquiry': 25, 'order_intent': 30
-}
-NEGATIVE_FACTORS = {
-    'hesitation': -10, 'budget_concern': -15,
-    'dietary_conflict': -20, 'rejection': -25, 'delay_response': -5
-}
-
-def calculate_interest_score(text, current_score):
-    """Calculates the interest score based on keywords in the user's message."""
-    score_change = 0
-    text_lower = text.lower()
-    
-    # Positive keywords
-    if any(k in text_lower for k in ["love", "want", "need", "perfect", "amazing", "great"]): score_change += ENGAGEMENT_FACTORS['enthusiasm_words']
-    if any(k in text_lower for k in ["how much", "price", "cost"]): score_change += ENGAGEMENT_FACTORS['price_inquiry']
-    if any(k in text_lower for k in ["i'll take it", "add to cart", "order", "buy"]): score_change += ENGAGEMENT_FACTORS['order_intent']
-    if any(k in text_lower for k in ["what's in", "spice level", "calories"]): score_change += ENGAGEMENT_FACTORS['question_asking']
-
-    # Negative keywords
-    if any(k in text_lower for k in ["maybe", "not sure", "i guess"]): score_change += NEGATIVE_FACTORS['hesitation']
-    if any(k in text_lower for k in ["too expensive", "that's a lot"]): score_change += NEGATIVE_FACTORS['budget_concern']
-    if any(k in text_lower for k in ["don't like", "no thanks", "not that"]): score_change += NEGATIVE_FACTORS['rejection']
-    
-    new_score = max(0, min(100, current_score + score_change))
-    return new_score
-
-# --- Conversational Intelligence & Database Integration --- [cite: 43]
-def extract_preferences_from_conversation(history):
-    """Uses LLM to extract structured data from conversation."""
-    prompt = f"""
-    Analyze the following user conversation history and extract their food preferences into a JSON object.
-    Identify: budget (as a max price float), mood (list of strings), cravings/keywords (list of strings), and dietary restrictions (list of strings).
-    If a preference is not mentioned, omit the key.
-    
-    CONVERSATION:
-    {history}
-    
-    JSON:
-    """
-    try:
-        response = model.generate_content(prompt)
-        cleaned_response = response.text.strip().replace('```json', '').replace('```', '')
-        return json.loads(cleaned_response)
-    except Exception:
-        return {} # Return empty dict if parsing fails
-
-def query_database_for_products(preferences):
-    """Searches the database for products matching the user's preferences."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row # Allows accessing columns by name
-    cursor = conn.cursor()
-    
-    query = "SELECT * FROM products WHERE 1=1"
-    params = []
-
-    if preferences.get("budget"):
-        query += " AND price <= ?"
-        params.append(preferences["budget"])
-    
-    # Build dynamic query for tags [cite: 99]
-    search_tags = preferences.get("mood", []) + preferences.get("cravings", []) + preferences.get("dietary", [])
-    for tag in search_tags:
-        query += " AND (mood_tags LIKE ? OR dietary_tags LIKE ? OR name LIKE ? OR description LIKE ?)"
-        param_like = f'%"{tag}"%' # For JSON arrays stored as strings
-        params.extend([param_like, param_like, f'%{tag}%', f'%{tag}%'])
-
-    query += " ORDER BY popularity_score DESC LIMIT 5"
-    
-    cursor.execute(query, params)
-    products = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return products
-
-def generate_bot_response(history, products):
-    """Generates a natural, friendly response using the LLM based on recommended products."""
-    product_str = "No specific products found, just chat with the user."
-    if products:
-        product_str = "Here are the top products found that match the user's request:\n"
-        for p in products:
-            product_str += f"- {p['name']}: {p['description']} (Price: ${p['price']})\n"
-
-    prompt = f"""
-    You are FoodieBot, a friendly and enthusiastic fast food expert.
-    Your goal is to help a user find the perfect meal.
-    Based on the conversation history and the products found in the database, generate a short, engaging response.
-    
-    - If there are good matches, highlight the best one (the first in the list).
-    - Ask a clarifying question to keep the conversation going.
-    - DO NOT list all the products. Just mention the top one and maybe hint that there are others.
-    - Keep your response under 50 words.
-
-    CONVERSATION HISTORY:
-    {history}
-
-    PRODUCTS FOUND:
-    {product_str}
-    
-    YOUR RESPONSE:
-    """
-    response = model.generate_content(prompt)
-    return response.text.strip()
\ No newline at end of file
+# core_logic.py
+import json
+import logging
+import threading
+import time
+import db
+from config import PREFERENCE_RULES_MIN_CONFIDENCE, RERANK_CANDIDATES
+from embeddings import get_embedding_index, semantic_search
+from llm_client import create_llm_client
+from metrics import LLM_FAILURES, PRODUCT_RESULTS, span, timed
+from preference_rules import get_preference_rules
+from recommendation_cache import get_recommendation_cache, preference_key
+from reranker import get_reranker
+from search_index import fts_search, get_search_index
+# Keyword rules are compiled once in scoring.py; re-exported here for callers
+from scoring import ENGAGEMENT_FACTORS, NEGATIVE_FACTORS, calculate_interest_score
+
+logger = logging.getLogger(__name__)
+
+# All LLM traffic goes through the shared client (cache, coalescing, counters). It is
+# created on first use, so importing this module doesn't load an LLM SDK or need a key
+llm = None
+_llm_lock = threading.Lock()
+
+def get_llm():
+    """Returns the shared LLM client, creating it on first use. Assign core_logic.llm to swap it."""
+    global llm
+    if llm is None:
+        with _llm_lock:
+            if llm is None:
+                llm = create_llm_client()
+    return llm
+
+# --- Conversational Intelligence & Database Integration --- [cite: 43]
+def _parse_json_reply(response_text):
+    cleaned_response = response_text.strip().replace('```json', '').replace('```', '')
+    return json.loads(cleaned_response)
+
+def _ask_for_json_object(operation, prompt):
+    """Sends a prompt that expects a JSON object back. On a failed call or an
+    unusable reply, logs and counts it under `operation` and returns None."""
+    try:
+        response_text = get_llm().generate(prompt)
+    except Exception:
+        LLM_FAILURES.inc(operation=operation, reason='error')
+        logger.exception("%s: LLM call failed", operation)
+        return None
+    try:
+        reply = _parse_json_reply(response_text)
+    except ValueError:
+        reply = None
+    if not isinstance(reply, dict):
+        LLM_FAILURES.inc(operation=operation, reason='unparseable')
+        logger.warning("%s: unusable LLM reply %.200r", operation, response_text)
+        return None
+    return reply
+
+@timed('extract_preferences')
+def extract_preferences_from_conversation(history):
+    """Uses LLM to extract structured data from conversation."""
+    prompt = f"""
+    Analyze the following user conversation history and extract their food preferences into a JSON object.
+    Identify: budget (as a max price float), mood (list of strings), cravings/keywords (list of strings), and dietary restrictions (list of strings).
+    If a preference is not mentioned, omit the key.
+    
+    CONVERSATION:
+    {history}
+    
+    JSON:
+    """
+    return _ask_for_json_object('extract_preferences', prompt) or {} # Empty dict if the call or parsing fails
+
+@timed('update_preferences')
+def update_preferences(preferences, user_message):
+    """Folds only the newest user message into the session's structured preferences.
+
+    Prompt size stays constant however long the conversation gets. If the model
+    call or parsing fails the previous preferences are kept unchanged.
+    """
+    prompt = f"""
+    You keep track of a user's food preferences as a JSON object with the keys:
+    budget (as a max price float), mood (list of strings), cravings/keywords (list of strings), and dietary restrictions (list of strings).
+    Update the CURRENT PREFERENCES using the NEW MESSAGE. Keep existing values unless the message changes or withdraws them.
+    If a preference is still not mentioned, omit the key. Reply with the complete updated JSON object only.
+
+    CURRENT PREFERENCES:
+    {json.dumps(preferences or {})}
+
+    NEW MESSAGE:
+    user: {user_message}
+
+    JSON:
+    """
+    updated = _ask_for_json_object('update_preferences', prompt)
+    return updated if updated is not None else dict(preferences or {})
+
+@timed('quick_preferences')
+def quick_update_preferences(preferences, user_message, min_confidence=PREFERENCE_RULES_MIN_CONFIDENCE):
+    """update_preferences without the LLM, for messages the catalog vocabulary fully explains
+    (e.g. "veg burger under $10"). Returns None when the message needs the LLM."""
+    updated, confidence = get_preference_rules().update(preferences, user_message)
+    return updated if confidence >= min_confidence else None
+
+def _structured_search(budget, mood, cravings, dietary, limit):
+    """(source, products) from full-text search of the cravings, else the tag index."""
+    # Free-text cravings are matched by FTS5 over name, description and ingredients
+    if cravings:
+        with span('fts_search'), db.connection() as conn:
+            products = fts_search(conn, cravings, mood=mood, dietary=dietary, budget=budget, limit=limit)
+        if products:
+            return 'fts', products
+
+    # Tags are matched through the inverted indexes and ranked by how many hit [cite: 99]
+    with span('tag_search'):
+        products = get_search_index().search(budget=budget, mood=mood, cravings=cravings, dietary=dietary, limit=limit)
+    return 'tags', products
+
+def _rerank(products, shown, limit):
+    with span('rerank'):
+        return get_reranker().rerank(products, shown, limit)
+
+@timed('product_query')
+def query_database_for_products(preferences, message=None, shown=(), limit=5):
+    """Finds products matching the user's preferences: full-text search when there are
+    cravings, otherwise (or when nothing matches) the in-memory tag index. If both come
+    back empty, products similar in meaning to the message and preferences are used.
+
+    The best RERANK_CANDIDATES matches are re-ranked for variety, and products in
+    `shown` (already recommended to this session) are pushed down.
+
+    Full-text and tag results depend only on the preferences and are cached by
+    their normalized form; the semantic fallback depends on the message and is not."""
+    key = preference_key(preferences)
+    budget, mood, cravings, dietary = key
+    candidates = max(limit, RERANK_CANDIDATES)
+    source, products = get_recommendation_cache().get_or_compute(
+        key, lambda: _structured_search(budget, list(mood), list(cravings), list(dietary), candidates))
+    if products:
+        PRODUCT_RESULTS.inc(source=source)
+        # Copies, so callers can't change what later turns get from the cache
+        return [dict(product) for product in _rerank(products, shown, limit)]
+
+    # e.g. "something cozy" against a catalog that says "comfort"
+    text = " ".join(str(term) for term in [message or ""] + list(mood) + list(cravings))
+    with span('semantic_search'):
+        products = semantic_search(text, budget=budget, dietary=list(dietary), limit=candidates)
+    PRODUCT_RESULTS.inc(source='semantic' if products else 'none')
+    return _rerank(products, shown, limit)
+
+def _bot_response_prompt(history, products):
+    product_str = "No specific products found, just chat with the user."
+    if products:
+        product_str = "Here are the top products found that match the user's request:\n"
+        for p in products:
+            product_str += f"- {p['name']}: {p['description']} (Price: ${p['price']})\n"
+
+    return f"""
+    You are FoodieBot, a friendly and enthusiastic fast food expert.
+    Your goal is to help a user find the perfect meal.
+    Based on the conversation history and the products found in the database, generate a short, engaging response.
+    
+    - If there are good matches, highlight the best one (the first in the list).
+    - Ask a clarifying question to keep the conversation going.
+    - DO NOT list all the products. Just mention the top one and maybe hint that there are others.
+    - Keep your response under 50 words.
+
+    CONVERSATION HISTORY:
+    {history}
+
+    PRODUCTS FOUND:
+    {product_str}
+    
+    YOUR RESPONSE:
+    """
+
+@timed('response_llm')
+def generate_bot_response(history, products):
+    """Generates a natural, friendly response using the LLM based on recommended products."""
+    try:
+        return get_llm().generate(_bot_response_prompt(history, products)).strip()
+    except Exception:
+        LLM_FAILURES.inc(operation='response', reason='error')
+        raise
+
+def stream_bot_response(history, products):
+    """Same as generate_bot_response, but yields the text in chunks as the LLM produces them."""
+    started = False
+    try:
+        for chunk in get_llm().stream(_bot_response_prompt(history, products)):
+            if not started:
+                chunk = chunk.lstrip()
+                started = bool(chunk)
+            if chunk:
+                yield chunk
+    except Exception:
+        LLM_FAILURES.inc(operation='response', reason='error')
+        raise
+
+
+# --- Warm-up --- #
+# Everything above is built on first use. These build it ahead of time instead, so
+# the first chat turns of a fresh worker don't pay for it.
+WARM_UP_STEPS = {
+    'db': lambda: db.get_pool().open_all(),
+    'preference_rules': get_preference_rules,
+    'search_index': get_search_index,
+    'reranker': get_reranker,
+    'embeddings': get_embedding_index,
+    'llm': get_llm,
+}
+
+def warm_up(components=None):
+    """Builds the named components (all of WARM_UP_STEPS by default) now.
+    Returns {component: {'seconds': ...} or {'error': ...}}."""
+    components = list(components or WARM_UP_STEPS)
+    unknown = sorted(set(components) - set(WARM_UP_STEPS))
+    if unknown:
+        raise ValueError(f"Unknown warm-up components {unknown}, expected some of {sorted(WARM_UP_STEPS)}")
+    results = {}
+    for name in components:
+        start = time.perf_counter()
+        try:
+            WARM_UP_STEPS[name]()
+        except Exception as e:
+            logger.exception("Warm-up of %s failed", name)
+            results[name] = {'error': str(e)}
+        else:
+            results[name] = {'seconds': round(time.perf_counter() - start, 4)}
+    return results
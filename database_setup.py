@@ -1,92 +1,394 @@
-# database_setup.py
-import sqlite3
-import json
-import os
-
-DB_PATH = os.path.join('data', 'foodiebot.db')
-JSON_PATH = os.path.join('data', 'products.json')
-
-def create_database():
-    """Creates the database schema for products, conversations, and analytics."""
-    os.makedirs('data', exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # Drop tables if they exist for a clean setup
-    cursor.execute("DROP TABLE IF EXISTS products")
-    cursor.execute("DROP TABLE IF EXISTS conversation_history")
-
-    # Create Products Table [cite: 154]
-    cursor.execute("""
-    CREATE TABLE products (
-        product_id TEXT PRIMARY KEY,
-        name TEXT NOT NULL,
-        category TEXT,
-        description TEXT,
-        ingredients TEXT,
-        price REAL,
-        calories INTEGER,
-        prep_time TEXT,
-        dietary_tags TEXT,
-        mood_tags TEXT,
-        allergens TEXT,
-        popularity_score INTEGER,
-        chef_special BOOLEAN,
-        limited_time BOOLEAN,
-        spice_level INTEGER,
-        image_prompt TEXT
-    )
-    """)
-
-    # Create Conversation History Table [cite: 146]
-    cursor.execute("""
-    CREATE TABLE conversation_history (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        session_id TEXT NOT NULL,
-        role TEXT NOT NULL, -- 'user' or 'bot'
-        content TEXT,
-        interest_score INTEGER,
-        recommendation_made TEXT, -- product_id of recommended item
-        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-    
-    # Create indexes for efficient querying [cite: 135]
-    cursor.execute("CREATE INDEX idx_category ON products (category)")
-    cursor.execute("CREATE INDEX idx_price ON products (price)")
-    cursor.execute("CREATE INDEX idx_popularity ON products (popularity_score)")
-
-
-    print("Database schema created successfully.")
-    conn.commit()
-    conn.close()
-
-def populate_products():
-    """Populates the products table from the generated JSON file."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    with open(JSON_PATH, 'r') as f:
-        products = json.load(f)
-
-    for product in products:
-        # Convert lists to JSON strings for storage
-        for key in ['ingredients', 'dietary_tags', 'mood_tags', 'allergens']:
-            if isinstance(product.get(key), list):
-                product[key] = json.dumps(product[key])
-        
-        cursor.execute("""
-        INSERT INTO products (
-            product_id, name, category, description, ingredients, price,
-            calories, prep_time, dietary_tags, mood_tags, allergens,
-            popularity_score, chef_special, limited_time, spice_level, image_prompt
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, tuple(product.values()))
-
-    print(f"Successfully populated the database with {len(products)} products.")
-    conn.commit()
-    conn.close()
-
-if __name__ == "__main__":
-    create_database()
-    populate_products()
\ No newline at end of file
+# database_setup.py
+import sqlite3
+import json
+import os
+import sys
+from itertools import islice
+
+import db
+from config import DB_PATH, CATALOG_BATCH_SIZE
+
+JSON_PATH = os.path.join('data', 'products.json')
+
+# Tables added after the original schema; created by create_database and by
+# migrate_database for databases that predate them
+SESSION_PREFERENCES_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS session_preferences (
+        session_id TEXT PRIMARY KEY,
+        preferences TEXT NOT NULL, -- JSON object: budget, mood, cravings, dietary
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+# Running count of recommendations per product, kept up to date as turns are
+# logged so /analytics never has to aggregate the whole history table
+RECOMMENDATION_COUNTS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS recommendation_counts (
+        product_id TEXT PRIMARY KEY,
+        count INTEGER NOT NULL DEFAULT 0
+    )
+    """
+# Catalog columns in table order; products are mapped by name, never by key order
+PRODUCT_COLUMNS = (
+    'product_id', 'name', 'category', 'description', 'ingredients', 'price',
+    'calories', 'prep_time', 'dietary_tags', 'mood_tags', 'allergens',
+    'popularity_score', 'chef_special', 'limited_time', 'spice_level', 'image_prompt'
+)
+LIST_COLUMNS = ('ingredients', 'dietary_tags', 'mood_tags', 'allergens')
+_LIST_POSITIONS = tuple(PRODUCT_COLUMNS.index(c) for c in LIST_COLUMNS)
+UPSERT_PRODUCT = f"""
+    INSERT INTO products ({', '.join(PRODUCT_COLUMNS)})
+    VALUES ({', '.join('?' for _ in PRODUCT_COLUMNS)})
+    ON CONFLICT(product_id) DO UPDATE SET
+    {', '.join(f'{c} = excluded.{c}' for c in PRODUCT_COLUMNS[1:])}
+    """
+# Full-text index over the catalog, kept in sync with products by triggers.
+# External content: the text lives only in products and is joined back by rowid.
+# A full VACUUM may renumber products' rowids, so run rebuild_products_fts() after one.
+PRODUCTS_FTS_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, description, ingredients, mood_tags, dietary_tags,
+        content='products', tokenize='porter unicode61'
+    )
+    """
+PRODUCTS_FTS_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (rowid, name, description, ingredients, mood_tags, dietary_tags)
+        VALUES (new.rowid, new.name, new.description, new.ingredients, new.mood_tags, new.dietary_tags);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, description, ingredients, mood_tags, dietary_tags)
+        VALUES ('delete', old.rowid, old.name, old.description, old.ingredients, old.mood_tags, old.dietary_tags);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, description, ingredients, mood_tags, dietary_tags)
+        VALUES ('delete', old.rowid, old.name, old.description, old.ingredients, old.mood_tags, old.dietary_tags);
+        INSERT INTO products_fts (rowid, name, description, ingredients, mood_tags, dietary_tags)
+        VALUES (new.rowid, new.name, new.description, new.ingredients, new.mood_tags, new.dietary_tags);
+    END
+    """,
+)
+# Bumped whenever search results may change: by populate_products, and by a
+# trigger on popularity_score (which other tools may update in place). Processes
+# poll it to drop cached recommendations and rebuild in-memory indexes.
+CATALOG_VERSION_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS catalog_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    """
+CATALOG_VERSION_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS products_popularity_version AFTER UPDATE OF popularity_score ON products
+    WHEN old.popularity_score IS NOT new.popularity_score BEGIN
+        UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+    END
+    """
+HISTORY_SESSION_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_history_session_ts ON conversation_history (session_id, timestamp)
+    """
+# One row per compacted session (see history_compaction.py): its raw turns have
+# moved to the archive database, and this is what analytics still need of them
+SESSION_SUMMARIES_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS session_summaries (
+        session_id TEXT PRIMARY KEY,
+        started_at DATETIME,
+        ended_at DATETIME,
+        turns INTEGER NOT NULL,
+        final_score INTEGER,
+        turn_ids BLOB NOT NULL, -- conversation_history ids, see db.pack_turn_ids
+        score_trajectory BLOB NOT NULL, -- interest score per turn, see db.pack_scores
+        recommendations TEXT NOT NULL -- JSON list of recommended product_ids, in order
+    )
+    """
+# Archived turns keep their ids, so moving a batch again is a no-op
+ARCHIVE_HISTORY_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS conversation_history (
+        id INTEGER PRIMARY KEY,
+        session_id TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT,
+        interest_score INTEGER,
+        recommendation_made TEXT,
+        timestamp DATETIME
+    )
+    """
+ARCHIVE_SESSION_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_archive_session ON conversation_history (session_id, timestamp)
+    """
+
+# Every table the app reads or writes; a database missing any predates a schema change
+REQUIRED_TABLES = ('products', 'products_fts', 'conversation_history', 'session_preferences',
+                   'recommendation_counts', 'catalog_version', 'session_summaries')
+
+def missing_tables(conn):
+    """REQUIRED_TABLES absent from the database behind `conn`; run migrate_database() to add them."""
+    present = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return [table for table in REQUIRED_TABLES if table not in present]
+
+# Callbacks run after the product catalog has been reloaded (e.g. search indexes)
+_reload_hooks = []
+
+def register_reload_hook(callback):
+    """Registers a zero-argument callable to run after populate_products commits."""
+    if callback not in _reload_hooks:
+        _reload_hooks.append(callback)
+
+def notify_catalog_changed():
+    """Runs the reload hooks; populate_products does this itself."""
+    for callback in list(_reload_hooks):
+        callback()
+
+def create_database(db_path=DB_PATH, reset=False):
+    """Creates the database schema for products, conversations, and analytics.
+
+    Existing tables and their data are kept unless `reset` is set, in which case
+    everything, including conversation history, is dropped first.
+    """
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    # Lets history compaction hand freed pages back a few at a time. Only takes effect
+    # on a new database; migrate_database converts existing ones.
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+    if reset:
+        cursor.execute("DROP TABLE IF EXISTS products_fts")
+        cursor.execute("DROP TABLE IF EXISTS products")
+        cursor.execute("DROP TABLE IF EXISTS conversation_history")
+        cursor.execute("DROP TABLE IF EXISTS session_preferences")
+        cursor.execute("DROP TABLE IF EXISTS recommendation_counts")
+        cursor.execute("DROP TABLE IF EXISTS catalog_version")
+        cursor.execute("DROP TABLE IF EXISTS session_summaries")
+
+    # Create Products Table [cite: 154]
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS products (
+        product_id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        category TEXT,
+        description TEXT,
+        ingredients TEXT,
+        price REAL,
+        calories INTEGER,
+        prep_time TEXT,
+        dietary_tags TEXT,
+        mood_tags TEXT,
+        allergens TEXT,
+        popularity_score INTEGER,
+        chef_special BOOLEAN,
+        limited_time BOOLEAN,
+        spice_level INTEGER,
+        image_prompt TEXT
+    )
+    """)
+
+    had_fts = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+    ).fetchone()
+    cursor.execute(PRODUCTS_FTS_SCHEMA)
+    for trigger in PRODUCTS_FTS_TRIGGERS:
+        cursor.execute(trigger)
+    if not had_fts:
+        # Index products already in a database that predates the full-text index; the
+        # update trigger would otherwise try to delete entries that were never added
+        cursor.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+    # Create Conversation History Table [cite: 146]
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS conversation_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        role TEXT NOT NULL, -- 'user' or 'bot'
+        content TEXT,
+        interest_score INTEGER,
+        recommendation_made TEXT, -- product_id of recommended item
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    
+    # Structured preference state carried between turns of a session
+    cursor.execute(SESSION_PREFERENCES_SCHEMA)
+    cursor.execute(RECOMMENDATION_COUNTS_SCHEMA)
+    cursor.execute(CATALOG_VERSION_SCHEMA)
+    cursor.execute("INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)")
+    cursor.execute(CATALOG_VERSION_TRIGGER)
+    cursor.execute(SESSION_SUMMARIES_SCHEMA)
+
+    # Create indexes for efficient querying [cite: 135]
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_category ON products (category)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_price ON products (price)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_popularity ON products (popularity_score)")
+    cursor.execute(HISTORY_SESSION_INDEX)
+
+
+    print("Database schema created successfully.")
+    conn.commit()
+    conn.close()
+
+def migrate_database(db_path=DB_PATH):
+    """Brings an existing database up to the current schema without touching its data."""
+    conn = sqlite3.connect(db_path)
+    had_rollup = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recommendation_counts'"
+    ).fetchone()
+    had_fts = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+    ).fetchone()
+    conn.execute(PRODUCTS_FTS_SCHEMA)
+    for trigger in PRODUCTS_FTS_TRIGGERS:
+        conn.execute(trigger)
+    if not had_fts:
+        conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+    conn.execute(SESSION_PREFERENCES_SCHEMA)
+    conn.execute(RECOMMENDATION_COUNTS_SCHEMA)
+    conn.execute(CATALOG_VERSION_SCHEMA)
+    conn.execute("INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)")
+    conn.execute(CATALOG_VERSION_TRIGGER)
+    conn.execute(HISTORY_SESSION_INDEX)
+    conn.execute(SESSION_SUMMARIES_SCHEMA)
+    if not had_rollup:
+        # Backfill once from existing history; from then on it is maintained incrementally
+        conn.execute("""
+            INSERT INTO recommendation_counts (product_id, count)
+            SELECT recommendation_made, COUNT(*) FROM conversation_history
+            WHERE recommendation_made IS NOT NULL GROUP BY recommendation_made
+        """)
+    conn.commit()
+    converted = conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2
+    if converted:
+        # Switching to incremental auto-vacuum takes one full VACUUM, which may renumber rowids
+        print("Converting to incremental auto-vacuum (one full VACUUM, may take a while)...")
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    conn.close()
+    if converted:
+        rebuild_products_fts(db_path)
+
+def create_archive_database(archive_path):
+    """Creates the archive database that compacted conversation turns move to, if needed."""
+    os.makedirs(os.path.dirname(archive_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(archive_path)
+    conn.execute(ARCHIVE_HISTORY_SCHEMA)
+    conn.execute(ARCHIVE_SESSION_INDEX)
+    conn.commit()
+    conn.close()
+
+def rebuild_products_fts(db_path=DB_PATH):
+    """Re-indexes products_fts from scratch, e.g. after a full VACUUM."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+    conn.commit()
+    conn.close()
+
+def _iter_json_array(f, chunk_size=1 << 20, max_element_size=1 << 20):
+    """Yields the elements of a top-level JSON array, reading `chunk_size` characters at a time.
+
+    An element that still doesn't parse once `max_element_size` characters of it
+    are buffered is reported as malformed there, rather than reading on to the end of the file.
+    """
+    decoder = json.JSONDecoder()
+    offset = 0  # characters of the file before buffer[0]
+    while True:
+        chunk = f.read(chunk_size)
+        buffer = chunk.lstrip()
+        offset += len(chunk) - len(buffer)
+        if buffer or not chunk:
+            break
+    if not buffer.startswith('['):
+        raise ValueError("expected a JSON array of products")
+    pos = 1
+    while True:
+        while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ','):
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        try:
+            item, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            if len(buffer) - pos > max_element_size:
+                raise ValueError(f"malformed JSON array element at character {offset + pos}: {e.msg}") from None
+            # The element runs past the buffer: read more, keeping only the unparsed tail
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise ValueError(f"truncated JSON array at character {offset + pos}: {e.msg}") from None
+            offset += pos
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield item
+
+def iter_products(json_path):
+    """Streams product dicts from a JSON array file or a JSONL file (one product per line)."""
+    with open(json_path, 'r') as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        f.seek(0)
+        if head == '[':
+            yield from _iter_json_array(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def product_row(product):
+    """Maps a product dict to a row in PRODUCT_COLUMNS order; list fields are stored as JSON."""
+    row = [product.get(column) for column in PRODUCT_COLUMNS]
+    for i in _LIST_POSITIONS:
+        if isinstance(row[i], list):
+            row[i] = json.dumps(row[i])
+    return tuple(row)
+
+def populate_products(db_path=DB_PATH, json_path=JSON_PATH, batch_size=CATALOG_BATCH_SIZE, prune=False):
+    """Upserts the products table from a JSON or JSONL catalog file.
+
+    Products are streamed from disk and written `batch_size` at a time, one
+    transaction per batch, so memory stays bounded whatever the catalog size
+    and live readers are never blocked for long. Existing products are updated
+    in place by product_id; conversation history is untouched. With `prune`,
+    products missing from the file are deleted at the end.
+    """
+    conn = db.connect(db_path)
+    if prune:
+        conn.execute("CREATE TEMP TABLE loaded_ids (product_id TEXT PRIMARY KEY)")
+
+    rows = (product_row(p) for p in iter_products(json_path))
+    total = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        with conn:
+            conn.executemany(UPSERT_PRODUCT, batch)
+            if prune:
+                conn.executemany("INSERT OR IGNORE INTO loaded_ids VALUES (?)", ((r[0],) for r in batch))
+        total += len(batch)
+
+    removed = 0
+    with conn:
+        if prune:
+            removed = conn.execute(
+                "DELETE FROM products WHERE product_id NOT IN (SELECT product_id FROM loaded_ids)"
+            ).rowcount
+        conn.execute("UPDATE catalog_version SET version = version + 1 WHERE id = 1")
+
+    print(f"Successfully populated the database with {total} products"
+          + (f" ({removed} removed)." if prune else "."))
+    conn.close()
+    notify_catalog_changed()
+    return total
+
+if __name__ == "__main__":
+    if "--migrate" in sys.argv:
+        migrate_database()
+        print("Database schema migrated successfully.")
+    else:
+        # --reset wipes everything (history included) before loading;
+        # by default the catalog is upserted into the existing database
+        # An optional path argument loads a different JSON/JSONL catalog file
+        paths = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+        create_database(reset="--reset" in sys.argv)
+        populate_products(json_path=paths[0] if paths else JSON_PATH, prune="--prune" in sys.argv)
\ No newline at end of file
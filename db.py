@@ -0,0 +1,310 @@
+# db.py
+import json
+import queue
+import sqlite3
+import struct
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from config import DB_PATH, DB_POOL_SIZE, DB_BUSY_TIMEOUT_SECONDS, DB_STATEMENT_CACHE_SIZE
+from metrics import DB_LOCKED_ERRORS, DB_POOL_WAITS, DB_POOL_WAIT_SECONDS
+
+# The schema itself is owned by database_setup.py; this module only reads and writes it.
+
+# --- Connection pool --- #
+def connect(db_path, busy_timeout=DB_BUSY_TIMEOUT_SECONDS):
+    """Opens a connection tuned for concurrent use: WAL journal, busy timeout, statement cache."""
+    conn = sqlite3.connect(
+        db_path,
+        timeout=busy_timeout,
+        check_same_thread=False,  # pooled connections move between threads, one at a time
+        cached_statements=DB_STATEMENT_CACHE_SIZE
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    # With WAL, NORMAL only syncs at checkpoints and stays corruption-safe
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(busy_timeout * 1000)}")
+    return conn
+
+
+class ConnectionPool:
+    """Thread-safe pool of long-lived SQLite connections.
+
+    Connections are opened lazily up to `size`. Because each one lives for the
+    life of the process, its prepared-statement cache keeps paying off across
+    requests instead of being thrown away on close.
+    """
+
+    def __init__(self, db_path, size=DB_POOL_SIZE, busy_timeout=DB_BUSY_TIMEOUT_SECONDS):
+        self.db_path = db_path
+        self.size = size
+        self.busy_timeout = busy_timeout
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._all = []
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                conn = connect(self.db_path, self.busy_timeout)
+                self._all.append(conn)
+                return conn
+        DB_POOL_WAITS.inc()
+        start = time.perf_counter()
+        try:
+            return self._idle.get(timeout=self.busy_timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(f"no pooled connection free after {self.busy_timeout}s")
+        finally:
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection; commits on success and rolls back on error."""
+        conn = self._acquire()
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException as e:
+            if isinstance(e, sqlite3.OperationalError) and 'locked' in str(e):
+                DB_LOCKED_ERRORS.inc()
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def open_all(self):
+        """Opens every connection now rather than on first use; returns how many are open."""
+        with self._lock:
+            while self._opened < self.size:
+                conn = connect(self.db_path, self.busy_timeout)
+                self._opened += 1
+                self._all.append(conn)
+                self._idle.put(conn)
+            return self._opened
+
+    def close(self):
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+            self._opened = 0
+            self._idle = queue.LifoQueue()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide pool for DB_PATH, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+
+def configure(db_path, size=DB_POOL_SIZE):
+    """Points the shared pool at another database (e.g. a scratch copy for benchmarks)."""
+    global _pool, DB_PATH
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        DB_PATH = db_path
+        _pool = ConnectionPool(db_path, size)
+    return _pool
+
+
+def connection():
+    return get_pool().connection()
+
+
+# --- Conversation history --- #
+SELECT_HISTORY = "SELECT role, content, timestamp FROM conversation_history WHERE session_id = ? ORDER BY timestamp ASC"
+INSERT_MESSAGE = """INSERT INTO conversation_history
+    (session_id, role, content, interest_score, recommendation_made)
+    VALUES (?, ?, ?, ?, ?)"""
+# Used by the write-behind logger, which stamps each turn when it is queued
+INSERT_MESSAGE_AT = """INSERT INTO conversation_history
+    (session_id, role, content, interest_score, recommendation_made, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)"""
+SELECT_RECENT_HISTORY = """SELECT role, content, interest_score, recommendation_made, timestamp
+    FROM conversation_history WHERE session_id = ? ORDER BY timestamp DESC, id DESC LIMIT ?"""
+SELECT_PROGRESSION = "SELECT id, interest_score FROM conversation_history WHERE session_id = ? ORDER BY timestamp ASC"
+SELECT_ALL_HISTORY = "SELECT id, session_id, role, content FROM conversation_history ORDER BY session_id, timestamp, id"
+UPDATE_INTEREST_SCORE = "UPDATE conversation_history SET interest_score = ? WHERE id = ?"
+SELECT_TOP_RECOMMENDATIONS = """SELECT p.name, SUM(r.count) as count
+    FROM recommendation_counts r
+    JOIN products p ON r.product_id = p.product_id
+    GROUP BY p.name ORDER BY count DESC LIMIT 5"""
+INCREMENT_RECOMMENDATION = """INSERT INTO recommendation_counts (product_id, count) VALUES (?, ?)
+    ON CONFLICT(product_id) DO UPDATE SET count = count + excluded.count"""
+
+
+def format_history(rows):
+    return "\n".join([f"{row['role']}: {row['content']}" for row in rows])
+
+
+def get_history_rows(session_id):
+    """Stored turns of a session (role, content, timestamp), oldest first."""
+    with connection() as conn:
+        return conn.execute(SELECT_HISTORY, (session_id,)).fetchall()
+
+
+def get_recent_history_rows(session_id, limit):
+    """The session's last `limit` stored turns, with scores and recommendations, oldest first."""
+    with connection() as conn:
+        rows = conn.execute(SELECT_RECENT_HISTORY, (session_id, limit)).fetchall()
+    return rows[::-1]
+
+
+def insert_messages(rows):
+    """Writes (session_id, role, content, score, recommendation, timestamp) rows in one
+    transaction, folding their recommendations into the rollup in the same commit."""
+    recommended = Counter(row[4] for row in rows if row[4])
+    with connection() as conn:
+        conn.executemany(INSERT_MESSAGE_AT, rows)
+        conn.executemany(INCREMENT_RECOMMENDATION, recommended.items())
+
+
+def get_interest_progression(session_id):
+    """Interest score per turn: the compacted part of the session first, then its live turns."""
+    with connection() as conn:
+        rows = [dict(row) for row in conn.execute(SELECT_PROGRESSION, (session_id,)).fetchall()]
+    # Read after the live rows, so turns compacted in between show up twice rather than not at all
+    summary = get_session_summary(session_id)
+    if summary is None:
+        return rows
+    compacted = [{'id': turn_id, 'interest_score': score}
+                 for turn_id, score in zip(summary['turn_ids'], summary['score_trajectory'])]
+    seen = set(summary['turn_ids'])
+    return compacted + [row for row in rows if row['id'] not in seen]
+
+
+def get_all_history_rows():
+    with connection() as conn:
+        return conn.execute(SELECT_ALL_HISTORY).fetchall()
+
+
+def update_interest_scores(score_ids):
+    """Writes (interest_score, id) pairs in one transaction."""
+    with connection() as conn:
+        conn.executemany(UPDATE_INTEREST_SCORE, score_ids)
+
+
+def get_products(product_ids):
+    """Products by id, in the order given; ids no longer in the catalog are skipped."""
+    if not product_ids:
+        return []
+    placeholders = ", ".join("?" for _ in product_ids)
+    with connection() as conn:
+        rows = conn.execute(f"SELECT * FROM products WHERE product_id IN ({placeholders})",
+                            list(product_ids)).fetchall()
+    by_id = {row['product_id']: dict(row) for row in rows}
+    return [by_id[pid] for pid in product_ids if pid in by_id]
+
+
+def get_catalog_version():
+    """Counter bumped whenever the catalog or a popularity_score changes.
+
+    Databases from before `--migrate` added the counter always report 0.
+    """
+    try:
+        with connection() as conn:
+            row = conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()
+    except sqlite3.OperationalError as e:
+        if 'no such table' not in str(e):
+            raise
+        return 0
+    return row['version'] if row else 0
+
+
+def get_top_recommendations():
+    with connection() as conn:
+        return [dict(row) for row in conn.execute(SELECT_TOP_RECOMMENDATIONS).fetchall()]
+
+
+# --- Session summaries --- #
+# What history compaction keeps of a session whose turns moved to the archive database.
+# Scores (0-100) pack into one byte per turn, NO_SCORE standing in for NULL.
+NO_SCORE = 255
+SELECT_SUMMARY = "SELECT * FROM session_summaries WHERE session_id = ?"
+SELECT_SUMMARY_FINAL_SCORES = "SELECT session_id, final_score FROM session_summaries WHERE final_score IS NOT NULL"
+
+
+def pack_scores(scores):
+    return bytes(NO_SCORE if score is None else max(0, min(NO_SCORE - 1, int(score))) for score in scores)
+
+
+def unpack_scores(blob):
+    return [None if byte == NO_SCORE else byte for byte in blob]
+
+
+def pack_turn_ids(turn_ids):
+    return struct.pack(f"<{len(turn_ids)}q", *turn_ids)
+
+
+def unpack_turn_ids(blob):
+    return list(struct.unpack(f"<{len(blob) // 8}q", blob))
+
+
+def get_session_summary(session_id):
+    """The session's compacted turns as a dict (scores and recommendations unpacked), or None."""
+    try:
+        with connection() as conn:
+            row = conn.execute(SELECT_SUMMARY, (session_id,)).fetchone()
+    except sqlite3.OperationalError as e:
+        if 'no such table' not in str(e):
+            raise
+        return None
+    return unpack_summary(row) if row else None
+
+
+def get_summary_final_scores():
+    """{session_id: score after its last compacted turn} for every summarized session."""
+    try:
+        with connection() as conn:
+            return dict(conn.execute(SELECT_SUMMARY_FINAL_SCORES).fetchall())
+    except sqlite3.OperationalError as e:
+        if 'no such table' not in str(e):
+            raise
+        return {}
+
+
+def unpack_summary(row):
+    """A session_summaries row as a dict, with its turn ids, scores and recommendations as lists."""
+    return dict(row, turn_ids=unpack_turn_ids(row['turn_ids']),
+                score_trajectory=unpack_scores(row['score_trajectory']),
+                recommendations=json.loads(row['recommendations']))
+
+
+# --- Session preferences --- #
+SELECT_PREFERENCES = "SELECT preferences FROM session_preferences WHERE session_id = ?"
+UPSERT_PREFERENCES = """INSERT INTO session_preferences (session_id, preferences) VALUES (?, ?)
+    ON CONFLICT(session_id) DO UPDATE SET
+        preferences = excluded.preferences, updated_at = CURRENT_TIMESTAMP"""
+
+
+def get_session_preferences(session_id):
+    """Stored preference state for the session, or None if it has none yet."""
+    with connection() as conn:
+        row = conn.execute(SELECT_PREFERENCES, (session_id,)).fetchone()
+    return json.loads(row['preferences']) if row else None
+
+
+def save_session_preferences(session_id, preferences):
+    with connection() as conn:
+        conn.execute(UPSERT_PREFERENCES, (session_id, json.dumps(preferences)))
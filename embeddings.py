@@ -0,0 +1,292 @@
+# embeddings.py
+import json
+import logging
+import os
+import sqlite3
+import threading
+import zlib
+
+import numpy as np
+
+import database_setup
+import db
+from config import EMBEDDER, EMBEDDING_DIM, EMBEDDING_MIN_SCORE
+from search_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# --- Embedders --- #
+STOP_WORDS = frozenset("""
+    a an and any anything are at be but can do eat for food get give got have hello hey hi how i im in
+    is it just like me meal my no not of ok okay on or please some something thank thanks that the
+    there this to want what with would yes you
+""".split())
+
+# Words that should land near each other even though they share no letters,
+# e.g. "cozy" and "comfort". Words are in tokenize() form (singular, lowercase).
+CONCEPTS = {
+    'comfort': ['comfort', 'cozy', 'comforting', 'homestyle', 'homemade', 'hearty', 'soothing', 'nostalgic'],
+    'spicy': ['spicy', 'spice', 'hot', 'fiery', 'heat', 'chili', 'chilli', 'jalapeno', 'sriracha', 'buffalo',
+              'habanero', 'cajun', 'kick', 'burn'],
+    'fresh': ['fresh', 'light', 'crisp', 'garden', 'green', 'salad', 'veggie', 'zesty', 'citrus', 'lime'],
+    'sweet': ['sweet', 'dessert', 'treat', 'sugar', 'chocolate', 'caramel', 'honey', 'candy', 'syrup', 'cookie'],
+    'indulgent': ['indulgent', 'decadent', 'loaded', 'rich', 'cheesy', 'bacon', 'double', 'triple', 'gooey',
+                  'guilty', 'cheat'],
+    'healthy': ['healthy', 'lean', 'protein', 'grilled', 'wholesome', 'nutritious', 'low', 'fit', 'clean'],
+    'crunchy': ['crunchy', 'crispy', 'crunch', 'fried', 'golden', 'crust', 'crackling'],
+    'refreshing': ['refreshing', 'cold', 'iced', 'chilled', 'cool', 'frozen', 'shake', 'smoothie', 'drink',
+                   'soda', 'lemonade'],
+    'adventurous': ['adventurous', 'exotic', 'fusion', 'bold', 'unique', 'new', 'different', 'wild', 'korean',
+                    'thai', 'kimchi'],
+    'breakfast': ['breakfast', 'morning', 'brunch', 'egg', 'pancake', 'waffle', 'coffee', 'bagel'],
+    'sharing': ['party', 'share', 'sharing', 'group', 'friend', 'platter', 'bucket', 'family'],
+}
+_CONCEPTS_BY_WORD = {}
+for _concept, _words in CONCEPTS.items():
+    for _word in _words:
+        _CONCEPTS_BY_WORD.setdefault(_word, []).append(_concept)
+_CONCEPT_DIMS = {concept: i for i, concept in enumerate(CONCEPTS)}
+
+
+class HashingEmbedder:
+    """Offline baseline embedder: feature hashing of words plus concept features.
+
+    Each concept in CONCEPTS has a dimension of its own, so a concept never
+    collides with anything; every non-stop-word token is hashed into one of the
+    remaining buckets. Term frequencies are dampened with a square root and each
+    vector is L2-normalized, so a dot product is a cosine. Buckets come from
+    crc32, not hash(), so vectors are stable across processes.
+    """
+
+    name = 'hashing'
+
+    def __init__(self, dim=EMBEDDING_DIM, concept_weight=2.0):
+        if dim <= 2 * len(CONCEPTS):
+            raise ValueError(f"dim must be larger than {2 * len(CONCEPTS)}")
+        self.dim = dim
+        self.concept_weight = concept_weight
+
+    def _bucket(self, token):
+        return len(CONCEPTS) + zlib.crc32(token.encode('utf-8')) % (self.dim - len(CONCEPTS))
+
+    def embed(self, texts):
+        """Returns a (len(texts), dim) float32 array of unit vectors (zero for empty texts)."""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in zip(vectors, texts):
+            for token in tokenize(text):
+                if token in STOP_WORDS:
+                    continue
+                row[self._bucket(token)] += 1.0
+                for concept in _CONCEPTS_BY_WORD.get(token, ()):
+                    row[_CONCEPT_DIMS[concept]] += self.concept_weight
+            np.sqrt(row, out=row)
+            norm = np.linalg.norm(row)
+            if norm:
+                row /= norm
+        return vectors
+
+
+EMBEDDERS = {'hashing': HashingEmbedder}
+
+
+def create_embedder(name=EMBEDDER, **kwargs):
+    """Builds an embedder named in EMBEDDERS. Any object with `name`, `dim` and
+    `embed(texts) -> unit vectors` can be used instead."""
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder '{name}', expected one of {sorted(EMBEDDERS)}")
+    return EMBEDDERS[name](**kwargs)
+
+
+def product_document(product):
+    """The text a product is embedded from: name, description, mood tags and ingredients."""
+    fields = (product['name'], product['description'], product['mood_tags'], product['ingredients'])
+    return " ".join(str(value) for value in fields if value)
+
+
+# --- Offline build --- #
+def embedding_paths(db_path):
+    """The matrix and its metadata sidecar live next to the database file."""
+    base = os.path.splitext(db_path)[0]
+    return base + '.embeddings.f32', base + '.embeddings.json'
+
+
+def build_embeddings(db_path=database_setup.DB_PATH, embedder=None, batch_size=10000):
+    """Embeds every product and writes the matrix and sidecar next to the database.
+
+    The matrix is stored dimension-major, shape (dim, products): a query only
+    touches the rows of its non-zero dimensions, and each of those rows is
+    contiguous. Both files are written to temporary names and swapped in.
+    """
+    embedder = embedder or create_embedder()
+    matrix_path, meta_path = embedding_paths(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    count = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+    if not count:
+        conn.close()
+        raise ValueError("the products table is empty; load the catalog first")
+
+    matrix = np.memmap(matrix_path + '.tmp', dtype=np.float32, mode='w+', shape=(embedder.dim, count))
+    product_ids = []
+    cursor = conn.execute(
+        "SELECT product_id, name, description, mood_tags, ingredients FROM products ORDER BY rowid")
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        start = len(product_ids)
+        matrix[:, start:start + len(rows)] = embedder.embed([product_document(r) for r in rows]).T
+        product_ids.extend(r['product_id'] for r in rows)
+    conn.close()
+    matrix.flush()
+    del matrix
+
+    with open(meta_path + '.tmp', 'w') as f:
+        json.dump({'embedder': embedder.name, 'dim': embedder.dim, 'product_ids': product_ids}, f)
+    os.replace(matrix_path + '.tmp', matrix_path)
+    os.replace(meta_path + '.tmp', meta_path)
+    _reset_embedding_index()
+    return len(product_ids)
+
+
+# --- Query time --- #
+class EmbeddingIndex:
+    """Cosine top-k over the memory-mapped product matrix.
+
+    Prices and dietary tags are read fresh from the products table when the
+    index is loaded, so budget and dietary restrictions are applied as
+    vectorized masks before ranking. Equal cosines are common with the hashing
+    embedder, so ties are broken by popularity; besides ordering them sensibly,
+    this keeps argpartition fast, as it degrades badly on heavily tied input.
+    """
+
+    def __init__(self, matrix, product_ids, embedder, catalog_rows):
+        self._matrix = matrix
+        self.product_ids = product_ids
+        self.embedder = embedder
+        column = {pid: i for i, pid in enumerate(product_ids)}
+        # Products deleted since the build keep their column but never match
+        self._prices = np.full(len(product_ids), np.inf, dtype=np.float32)
+        # Popularity first, then column order, so no two products ever tie
+        self._tiebreak = np.arange(len(product_ids), 0, -1, dtype=np.float64) * 1e-12
+        self._live = np.zeros(len(product_ids), dtype=bool)
+        dietary_columns = {}
+        for product_id, price, popularity, dietary_tags in catalog_rows:
+            i = column.get(product_id)
+            if i is None:
+                continue  # added since the build; found once embeddings are rebuilt
+            self._live[i] = True
+            self._prices[i] = price if price is not None else 0.0
+            self._tiebreak[i] += (popularity or 0) * 1e-5  # at most 1e-3, below any real difference
+            for token in set(tokenize(dietary_tags)):
+                dietary_columns.setdefault(token, []).append(i)
+        self._all_live = bool(self._live.all())
+        self._dietary_masks = {}
+        for token, columns in dietary_columns.items():
+            mask = np.zeros(len(product_ids), dtype=bool)
+            mask[columns] = True
+            self._dietary_masks[token] = mask
+
+    @classmethod
+    def load(cls, db_path, conn, embedder=None):
+        """Maps the matrix built by build_embeddings; returns None if there is none."""
+        embedder = embedder or create_embedder()
+        matrix_path, meta_path = embedding_paths(db_path)
+        if not (os.path.exists(matrix_path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if (meta['embedder'], meta['dim']) != (embedder.name, embedder.dim):
+            raise ValueError(f"{matrix_path} was built with {meta['embedder']}/{meta['dim']}; rebuild it")
+        matrix = np.memmap(matrix_path, dtype=np.float32, mode='r', shape=(meta['dim'], len(meta['product_ids'])))
+        rows = conn.execute("SELECT product_id, price, popularity_score, dietary_tags FROM products").fetchall()
+        return cls(matrix, meta['product_ids'], embedder, rows)
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def _allowed(self, budget, dietary):
+        allowed = None if self._all_live else self._live
+        if budget is not None:
+            allowed = self._prices <= budget if allowed is None else allowed & (self._prices <= budget)
+        for restriction in dietary:
+            for token in set(tokenize(restriction)):
+                mask = self._dietary_masks.get(token)
+                if mask is None:
+                    return np.zeros(len(self.product_ids), dtype=bool)
+                allowed = mask if allowed is None else allowed & mask
+        return allowed
+
+    def search(self, text, budget=None, dietary=(), limit=5, min_score=EMBEDDING_MIN_SCORE):
+        """Returns up to `limit` (product_id, cosine) pairs scoring above `min_score`."""
+        if not text or not text.strip():
+            return []
+        query = self.embedder.embed([text])[0]
+        # Nothing but stop words or punctuation: a zero vector is similar to nothing
+        norm = np.linalg.norm(query)
+        if not norm or not np.isfinite(norm):
+            return []
+        dims = np.flatnonzero(query)
+        scores = query[dims] @ self._matrix[dims]
+        ranking = scores + self._tiebreak
+        allowed = self._allowed(budget, dietary)
+        candidates = None if allowed is None else np.flatnonzero(allowed)
+        if candidates is not None:
+            ranking = ranking[candidates]
+        k = min(limit, len(ranking))
+        if not k:
+            return []
+        top = np.argpartition(ranking, -k)[-k:]
+        top = top[np.argsort(-ranking[top])]
+        if candidates is not None:
+            top = candidates[top]
+        return [(self.product_ids[i], float(scores[i])) for i in top if scores[i] > min_score]
+
+
+# --- Shared instance --- #
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def get_embedding_index():
+    """Returns the process-wide index, or None if embeddings have not been built or can't be used.
+
+    A failed load (e.g. files built with another embedder) is logged once and
+    not retried until the next reload, so the semantic fallback is just skipped.
+    """
+    global _index, _index_loaded
+    if not _index_loaded:
+        with _index_lock:
+            if not _index_loaded:
+                try:
+                    with db.connection() as conn:
+                        _index = EmbeddingIndex.load(db.get_pool().db_path, conn)
+                except (OSError, ValueError, KeyError):
+                    logger.exception("Product embeddings can't be used; semantic fallback disabled")
+                    _index = None
+                _index_loaded = True
+    return _index
+
+
+def _reset_embedding_index():
+    # Picked up again, with fresh prices and dietary tags, on next use
+    global _index, _index_loaded
+    with _index_lock:
+        _index, _index_loaded = None, False
+
+
+def semantic_search(text, budget=None, dietary=(), limit=5):
+    """Products most similar to free text, as product dicts, best first."""
+    index = get_embedding_index()
+    if index is None or not text or not text.strip():
+        return []
+    return db.get_products([pid for pid, _ in index.search(text, budget, dietary, limit)])
+
+
+database_setup.register_reload_hook(_reset_embedding_index)
+
+
+if __name__ == "__main__":
+    count = build_embeddings()
+    print(f"Embedded {count} products to {embedding_paths(database_setup.DB_PATH)[0]}")
@@ -1,81 +1,239 @@
-# generate_data.py   
-import os
-import json
-import time
-import google.generativeai as genai
-from config import API_KEY
-
-# Configure the generative AI model
-genai.configure(api_key=API_KEY)
-model = genai.GenerativeModel('gemini-1.5-flash')
-
-PRODUCT_CATEGORIES = [
-    "Burgers (classic, fusion, vegetarian)", "Pizza (traditional, gourmet, personal)",
-    "Fried Chicken (wings, tenders, sandwiches)", "Tacos & Wraps (mexican, fusion, healthy)",
-    "Sides & Appetizers (fries, onion rings, etc.)", "Beverages (sodas, shakes, specialty drinks)",
-    "Desserts (ice cream, cookies, pastries)", "Salads & Healthy Options",
-    "Breakfast Items (all-day breakfast)", "Limited Time Specials"   
-]
-
-def generate_products():
-    """Generates 100 fast food products using the LLM API and saves them to a JSON file."""
-    all_products = []
-    
-    # Generate 10 products for each category
-    for category in PRODUCT_CATEGORIES:
-        print(f"Generating 10 products for category: {category}...")
-        for i in range(10):
-            # Construct a detailed prompt
-            prompt = f"""
-            Generate a JSON object for a single, unique fast food product for the category '{category}'.
-            The product name must be creative and sound appealing.
-            The description should be enticing and short (20 words max).
-            Ensure the structure exactly matches this format, including all fields:
-            {{
-              "product_id": "string",
-              "name": "string",
-              "category": "{category.split(' ')[0]}",
-              "description": "string",
-              "ingredients": ["string", "string", ...],
-              "price": float (e.g., 12.99),
-              "calories": integer,
-              "prep_time": "string (e.g., 8-10 mins)",
-              "dietary_tags": ["string", "string", ...],
-              "mood_tags": ["string", "string", ...],
-              "allergens": ["string", "string", ...],
-              "popularity_score": integer (1-100),
-              "chef_special": boolean,
-              "limited_time": boolean,
-              "spice_level": integer (0-10),
-              "image_prompt": "string (a descriptive prompt for an image generator)"
-            }}
-            Do NOT include the markdown "```json" wrapper in your response.
-            """
-            
-            try:
-                response = model.generate_content(prompt)
-                # Clean up the response to extract only the JSON part
-                cleaned_response = response.text.strip().replace('```json', '').replace('```', '')
-                product_data = json.loads(cleaned_response)
-                
-                # Assign a unique ID
-                product_data['product_id'] = f"FF{len(all_products) + 1:03d}"
-                all_products.append(product_data)
-                print(f"  -> Generated: {product_data['name']}")
-                time.sleep(2) # To avoid hitting API rate limits
-            except (json.JSONDecodeError, Exception) as e:
-                print(f"An error occurred: {e}. Retrying...")
-                i -= 1 # Retry the current iteration
-                time.sleep(5)
-
-    # Save to file
-    output_path = os.path.join('data', 'products.json')
-    os.makedirs('data', exist_ok=True)
-    with open(output_path, 'w') as f:
-        json.dump(all_products, f, indent=2)
-        
-    print(f"\nSuccessfully generated {len(all_products)} products and saved to {output_path}")
-
-if __name__ == "__main__":
-
-    generate_products()
+# generate_data.py
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config import GEN_WORKERS, GEN_RATE_PER_SECOND, GEN_MAX_RETRIES, GEN_BACKOFF_SECONDS
+from llm_client import create_llm_client
+from task_pool import TokenBucket
+
+PRODUCT_CATEGORIES = [
+    "Burgers (classic, fusion, vegetarian)", "Pizza (traditional, gourmet, personal)",
+    "Fried Chicken (wings, tenders, sandwiches)", "Tacos & Wraps (mexican, fusion, healthy)",
+    "Sides & Appetizers (fries, onion rings, etc.)", "Beverages (sodas, shakes, specialty drinks)",
+    "Desserts (ice cream, cookies, pastries)", "Salads & Healthy Options",
+    "Breakfast Items (all-day breakfast)", "Limited Time Specials"
+]
+OUTPUT_PATH = os.path.join('data', 'products.json')
+CHECKPOINT_PATH = os.path.join('data', 'products.jsonl')
+REQUIRED_FIELDS = ('name', 'category', 'description', 'price')
+
+
+def build_prompt(category, number, per_category):
+    return f"""
+            Generate a JSON object for a single, unique fast food product for the category '{category}'.
+            This is product {number} of {per_category} in this category, so make it distinct from the others.
+            The product name must be creative and sound appealing.
+            The description should be enticing and short (20 words max).
+            Ensure the structure exactly matches this format, including all fields:
+            {{
+              "product_id": "string",
+              "name": "string",
+              "category": "{category.split(' ')[0]}",
+              "description": "string",
+              "ingredients": ["string", "string", ...],
+              "price": float (e.g., 12.99),
+              "calories": integer,
+              "prep_time": "string (e.g., 8-10 mins)",
+              "dietary_tags": ["string", "string", ...],
+              "mood_tags": ["string", "string", ...],
+              "allergens": ["string", "string", ...],
+              "popularity_score": integer (1-100),
+              "chef_special": boolean,
+              "limited_time": boolean,
+              "spice_level": integer (0-10),
+              "image_prompt": "string (a descriptive prompt for an image generator)"
+            }}
+            Do NOT include the markdown "```json" wrapper in your response.
+            """
+
+
+def parse_product(response_text):
+    """Parses a model reply into a product dict, raising ValueError if it is unusable."""
+    # Clean up the response to extract only the JSON part
+    cleaned_response = response_text.strip().replace('```json', '').replace('```', '')
+    product_data = json.loads(cleaned_response)
+    if not isinstance(product_data, dict):
+        raise ValueError("reply is not a JSON object")
+    missing = [f for f in REQUIRED_FIELDS if f not in product_data]
+    if missing:
+        raise ValueError(f"reply is missing {', '.join(missing)}")
+    return product_data
+
+
+def product_ids(per_category):
+    """Stable (product_id, category, number) slots, so a rerun knows what is already done."""
+    total = per_category * len(PRODUCT_CATEGORIES)
+    width = max(3, len(str(total)))
+    slots = []
+    for c, category in enumerate(PRODUCT_CATEGORIES):
+        for i in range(per_category):
+            slots.append((f"FF{c * per_category + i + 1:0{width}d}", category, i + 1))
+    return slots
+
+
+def checkpoint_meta_path(path):
+    """The sidecar recording the --per-category a checkpoint's product ids were numbered for."""
+    return os.path.splitext(path)[0] + '.checkpoint.json'
+
+
+def check_checkpoint(path, per_category):
+    """Records `per_category` for a new checkpoint, or raises ValueError if an
+    existing one was numbered for a different catalog size.
+
+    Product ids depend on it, so resuming with another value would give
+    already generated products the ids of different slots.
+    """
+    meta_path = checkpoint_meta_path(path)
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            recorded = json.load(f)['per_category']
+        if recorded != per_category:
+            raise ValueError(f"{path} was generated with --per-category {recorded}; "
+                             f"rerun with that, or with --fresh to start over")
+        return
+    if load_checkpoint(path):
+        raise ValueError(f"{path} has no record of its --per-category; rerun with --fresh to start over")
+    with open(meta_path, 'w') as f:
+        json.dump({'per_category': per_category}, f)
+
+
+def load_checkpoint(path):
+    """Products already written to the JSONL checkpoint, by product_id.
+
+    A line cut short by a crash mid-write, or anything else that isn't a
+    product with an id, is ignored and its slot regenerated.
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                product = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(product, dict) or not isinstance(product.get('product_id'), str):
+                continue
+            done[product['product_id']] = product
+    return done
+
+
+class ProductGenerator:
+    """Generates catalog slots concurrently, appending each product to a checkpoint.
+
+    At most `workers` calls are in flight and a token bucket spaces them to
+    `rate` per second. A failed call or unparseable reply is retried up to
+    `max_retries` times with exponential backoff and jitter; a slot that still
+    fails is left out of the checkpoint, so the next run retries it.
+    """
+
+    def __init__(self, client, workers=GEN_WORKERS, rate=GEN_RATE_PER_SECOND,
+                 max_retries=GEN_MAX_RETRIES, backoff_seconds=GEN_BACKOFF_SECONDS,
+                 checkpoint_path=CHECKPOINT_PATH):
+        self.client = client
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.checkpoint_path = checkpoint_path
+        self._bucket = TokenBucket(rate, capacity=max(1, workers))
+        self._write_lock = threading.Lock()
+
+    def _generate_one(self, product_id, category, number, per_category):
+        prompt = build_prompt(category, number, per_category)
+        for attempt in range(self.max_retries + 1):
+            self._bucket.acquire()
+            try:
+                # Every call should yield a new product, so the response cache is bypassed
+                product_data = parse_product(self.client.generate(prompt, use_cache=False))
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_seconds * 2 ** attempt
+                delay += random.uniform(0, delay / 2)
+                print(f"  !! {product_id}: {e}. Retrying in {delay:.1f}s...")
+                time.sleep(delay)
+        product_data['product_id'] = product_id
+        return product_data
+
+    def _checkpoint(self, product_data):
+        line = json.dumps(product_data) + "\n"
+        with self._write_lock, open(self.checkpoint_path, 'a') as f:
+            f.write(line)
+
+    def run(self, per_category=10):
+        """Generates every slot missing from the checkpoint. Returns (products, failed_ids)."""
+        os.makedirs(os.path.dirname(self.checkpoint_path) or '.', exist_ok=True)
+        check_checkpoint(self.checkpoint_path, per_category)
+        done = load_checkpoint(self.checkpoint_path)
+        slots = product_ids(per_category)
+        todo = [slot for slot in slots if slot[0] not in done]
+        print(f"{len(done)} of {len(slots)} products already generated, {len(todo)} to go "
+              f"({self.workers} workers)...")
+
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='generate') as pool:
+            futures = {pool.submit(self._generate_one, *slot, per_category): slot[0] for slot in todo}
+            for future in as_completed(futures):
+                product_id = futures[future]
+                try:
+                    product_data = future.result()
+                except Exception as e:
+                    print(f"  !! {product_id}: giving up after {self.max_retries + 1} attempts ({e})")
+                    failed.append(product_id)
+                    continue
+                self._checkpoint(product_data)
+                done[product_id] = product_data
+                print(f"  -> Generated {product_id}: {product_data['name']}")
+
+        products = [done[product_id] for product_id, _, _ in slots if product_id in done]
+        return products, sorted(failed)
+
+
+def generate_products(per_category=10, output_path=OUTPUT_PATH, client=None, **generator_kwargs):
+    """Generates fast food products using the LLM API and saves them to a JSON file.
+
+    Progress is checkpointed, so an interrupted run picks up where it stopped.
+    """
+    generator = ProductGenerator(client or create_llm_client(), **generator_kwargs)
+    all_products, failed = generator.run(per_category)
+
+    # Save to file
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(all_products, f, indent=2)
+
+    print(f"\nSuccessfully generated {len(all_products)} products and saved to {output_path}")
+    if failed:
+        print(f"{len(failed)} products failed ({', '.join(failed[:10])}{'...' if len(failed) > 10 else ''}); "
+              f"rerun to retry them.")
+    return all_products
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the product catalog with the LLM.")
+    parser.add_argument('--per-category', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=GEN_WORKERS)
+    parser.add_argument('--rate', type=float, default=GEN_RATE_PER_SECOND,
+                        help="LLM calls per second (0 for unlimited)")
+    parser.add_argument('--backend', default=None, help="LLM backend, e.g. 'stub' for an offline run")
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH)
+    parser.add_argument('--output', default=OUTPUT_PATH)
+    parser.add_argument('--fresh', action='store_true', help="discard the checkpoint and start over")
+    args = parser.parse_args()
+
+    if args.fresh:
+        for path in (args.checkpoint, checkpoint_meta_path(args.checkpoint)):
+            if os.path.exists(path):
+                os.remove(path)
+    client = create_llm_client(args.backend) if args.backend else create_llm_client()
+    try:
+        generate_products(args.per_category, args.output, client,
+                          workers=args.workers, rate=args.rate, checkpoint_path=args.checkpoint)
+    except ValueError as e:
+        parser.error(str(e))
@@ -0,0 +1,194 @@
+# history_compaction.py
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import database_setup
+import db
+from config import (HISTORY_ARCHIVE_DB, HISTORY_COMPACT_IDLE_SECONDS, HISTORY_COMPACT_INTERVAL_SECONDS,
+                    HISTORY_COMPACT_BATCH_SESSIONS, HISTORY_VACUUM_PAGES)
+from metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+HISTORY_COMPACTED = Counter('foodiebot_history_compacted_total',
+                            "Conversation history moved to the archive, in sessions and turns.", ['unit'])
+
+SELECT_IDLE_SESSIONS = """SELECT session_id FROM conversation_history
+    GROUP BY session_id HAVING MAX(timestamp) < ? LIMIT ?"""
+ARCHIVE_BATCH = """INSERT OR IGNORE INTO archive.conversation_history
+    SELECT id, session_id, role, content, interest_score, recommendation_made, timestamp
+    FROM main.conversation_history WHERE session_id IN (SELECT session_id FROM temp.compact_batch)"""
+# Only turns already safe in the archive are summarized and deleted
+SELECT_ARCHIVED = """SELECT h.id, h.session_id, h.interest_score, h.recommendation_made, h.timestamp
+    FROM main.conversation_history h
+    WHERE h.session_id IN (SELECT session_id FROM temp.compact_batch)
+      AND EXISTS (SELECT 1 FROM archive.conversation_history a WHERE a.id = h.id)
+    ORDER BY h.session_id, h.timestamp, h.id"""
+DELETE_ARCHIVED = """DELETE FROM main.conversation_history WHERE id IN (
+    SELECT id FROM archive.conversation_history WHERE session_id IN (SELECT session_id FROM temp.compact_batch))"""
+UPSERT_SUMMARY = """INSERT OR REPLACE INTO main.session_summaries
+    (session_id, started_at, ended_at, turns, final_score, turn_ids, score_trajectory, recommendations)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+def default_archive_path(db_path):
+    """HISTORY_ARCHIVE_DB, or `<live database>_archive.db` next to the live database."""
+    return HISTORY_ARCHIVE_DB or os.path.splitext(db_path)[0] + '_archive.db'
+
+
+def _merge_summary(previous, session_id, rows):
+    """UPSERT_SUMMARY parameters for `previous` (a db.get_session_summary dict or None)
+    extended with the session's newly archived rows, oldest first."""
+    turn_ids = previous['turn_ids'] if previous else []
+    scores = previous['score_trajectory'] if previous else []
+    recommendations = previous['recommendations'] if previous else []
+    final_score = previous['final_score'] if previous else None
+    for row in rows:
+        turn_ids.append(row['id'])
+        scores.append(row['interest_score'])
+        if row['recommendation_made']:
+            recommendations.append(row['recommendation_made'])
+        if row['interest_score'] is not None:
+            final_score = row['interest_score']
+    started_at = previous['started_at'] if previous else rows[0]['timestamp']
+    return (session_id, started_at, rows[-1]['timestamp'], len(turn_ids), final_score,
+            db.pack_turn_ids(turn_ids), db.pack_scores(scores), json.dumps(recommendations))
+
+
+class HistoryCompactor:
+    """Moves the turns of idle sessions out of the live conversation_history.
+
+    A session with no turn in the last `idle_seconds` is rolled up into one
+    session_summaries row (final score, packed score trajectory and turn ids,
+    recommended product ids) and its raw turns are moved to the archive
+    database. SQLite only commits attached databases atomically with a rollback
+    journal, so each batch is copied to the archive and committed first, and only
+    then summarized and deleted from the live database in a second transaction.
+    Turns are copied with their ids and a turn is only deleted once it is in the
+    archive, so a run interrupted between the two simply finishes the batch next
+    time. Freed pages are then returned to the filesystem, `vacuum_pages` at a
+    time, with incremental vacuum.
+    """
+
+    def __init__(self, db_path=None, archive_path=None, idle_seconds=HISTORY_COMPACT_IDLE_SECONDS,
+                 batch_sessions=HISTORY_COMPACT_BATCH_SESSIONS, vacuum_pages=HISTORY_VACUUM_PAGES):
+        self.db_path = db_path
+        self.archive_path = archive_path
+        self.idle_seconds = idle_seconds
+        self.batch_sessions = batch_sessions
+        self.vacuum_pages = vacuum_pages
+        self._lock = threading.Lock()
+
+    def _paths(self):
+        # Resolved per run, so a pool pointed elsewhere with db.configure() is followed
+        db_path = self.db_path or db.get_pool().db_path
+        return db_path, self.archive_path or default_archive_path(db_path)
+
+    def compact(self, now=None):
+        """Compacts every session idle as of `now` (a UTC datetime; default: the current time).
+
+        Returns counts of the sessions and turns moved, pages vacuumed, and seconds taken.
+        """
+        now = now or datetime.now(timezone.utc)
+        cutoff = (now - timedelta(seconds=self.idle_seconds)).strftime('%Y-%m-%d %H:%M:%S.%f')
+        stats = {'sessions': 0, 'turns': 0, 'pages_vacuumed': 0}
+        start = time.perf_counter()
+        db_path, archive_path = self._paths()
+        with self._lock:
+            conn = db.connect(db_path)
+            try:
+                attached = False
+                while True:
+                    sessions = [row[0] for row in
+                                conn.execute(SELECT_IDLE_SESSIONS, (cutoff, self.batch_sessions)).fetchall()]
+                    if not sessions:
+                        break
+                    if not attached:
+                        # Only now, so a database with nothing to compact gets no archive file
+                        database_setup.create_archive_database(archive_path)
+                        conn.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+                        conn.execute("CREATE TEMP TABLE IF NOT EXISTS compact_batch (session_id TEXT PRIMARY KEY)")
+                        attached = True
+                    moved = self._compact_batch(conn, sessions)
+                    stats['sessions'] += len(sessions)
+                    stats['turns'] += moved
+                    HISTORY_COMPACTED.inc(len(sessions), unit='sessions')
+                    HISTORY_COMPACTED.inc(moved, unit='turns')
+                if stats['turns'] and self.vacuum_pages:
+                    before = conn.execute("PRAGMA main.freelist_count").fetchone()[0]
+                    conn.execute(f"PRAGMA main.incremental_vacuum({int(self.vacuum_pages)})").fetchall()
+                    stats['pages_vacuumed'] = before - conn.execute("PRAGMA main.freelist_count").fetchone()[0]
+            finally:
+                conn.close()
+        stats['seconds'] = time.perf_counter() - start
+        return stats
+
+    def _compact_batch(self, conn, sessions):
+        conn.execute("DELETE FROM temp.compact_batch")
+        conn.executemany("INSERT INTO temp.compact_batch (session_id) VALUES (?)", ((s,) for s in sessions))
+        conn.execute(ARCHIVE_BATCH)
+        conn.commit()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            by_session = {}
+            for row in conn.execute(SELECT_ARCHIVED).fetchall():
+                by_session.setdefault(row['session_id'], []).append(row)
+            for session_id, rows in by_session.items():
+                previous = conn.execute(db.SELECT_SUMMARY, (session_id,)).fetchone()
+                conn.execute(UPSERT_SUMMARY, _merge_summary(previous and db.unpack_summary(previous),
+                                                            session_id, rows))
+            conn.execute(DELETE_ARCHIVED)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return sum(len(rows) for rows in by_session.values())
+
+
+_compactor = HistoryCompactor()
+_background = None
+_background_lock = threading.Lock()
+
+
+def get_compactor():
+    return _compactor
+
+
+def _run_periodically(interval):
+    while True:
+        try:
+            stats = _compactor.compact()
+            if stats['sessions']:
+                logger.info("Compacted %(sessions)d sessions (%(turns)d turns) in %(seconds).2fs", stats)
+        except Exception:
+            logger.exception("History compaction failed")
+        time.sleep(interval)
+
+
+def start_background_compaction(interval=HISTORY_COMPACT_INTERVAL_SECONDS):
+    """Starts this process's compaction thread (once); a no-op when `interval` is 0."""
+    global _background
+    if _background is not None or interval <= 0:
+        return
+    with _background_lock:
+        if _background is None:
+            _background = threading.Thread(target=_run_periodically, args=(interval,),
+                                           name='history-compaction', daemon=True)
+            _background.start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move idle sessions' turns to the archive database.")
+    parser.add_argument('--idle-seconds', type=float, default=HISTORY_COMPACT_IDLE_SECONDS)
+    parser.add_argument('--archive', default=None, help="archive database (default: next to the live one)")
+    args = parser.parse_args()
+
+    stats = HistoryCompactor(archive_path=args.archive, idle_seconds=args.idle_seconds).compact()
+    print(f"Compacted {stats['sessions']} sessions ({stats['turns']} turns) in {stats['seconds']:.2f}s, "
+          f"{stats['pages_vacuumed']} pages returned to the filesystem.")
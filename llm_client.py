@@ -0,0 +1,299 @@
+# llm_client.py
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from config import (
+    API_KEY, LLM_BACKEND, LLM_MODEL, LLM_CACHE_SIZE, LLM_CACHE_TTL_SECONDS,
+    LLM_STUB_LATENCY_MS, LLM_STUB_LATENCY_SIGMA
+)
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) for budgeting and benchmarks."""
+    return (len(text) + 3) // 4
+
+
+# --- Backends --- #
+class GeminiBackend:
+    """Google Gemini via google-generativeai."""
+
+    def __init__(self, model_name=LLM_MODEL, api_key=API_KEY):
+        # Imported here: the SDK takes most of a second to import, and only this backend needs it
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self._model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt):
+        return self._model.generate_content(prompt).text
+
+    def stream(self, prompt):
+        for chunk in self._model.generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+
+class StubBackend:
+    """Deterministic offline backend, so the app can run and be benchmarked without a network.
+
+    Replies are a pure function of the prompt: preference prompts (full or
+    incremental) get a keyword extraction, product prompts get a synthetic product
+    and everything else gets a short recommendation built from the first product
+    listed in the prompt. `latency_ms`/`jitter_ms` simulate model round-trip time,
+    `token_latency_ms` adds a cost per prompt token, like real prefill, and
+    `token_delay_ms` is the time to generate each output word. With `sigma` > 0
+    the round trip is lognormal with median `latency_ms`, so a few calls take
+    several times longer than the rest, as hosted models do.
+    """
+
+    MOODS = ['spicy', 'comfort', 'adventurous', 'savory', 'sweet', 'fresh', 'refreshing',
+             'hearty', 'indulgent', 'romantic', 'fun', 'bold', 'relaxing', 'healthy']
+    DIETARY = ['vegetarian', 'vegan', 'gluten-free', 'high protein', 'dairy-free']
+    CRAVINGS = ['burger', 'pizza', 'taco', 'wrap', 'chicken', 'wings', 'fries', 'salad',
+                'shake', 'dessert', 'breakfast', 'sandwich', 'cheese', 'bbq']
+    _BUDGET_RE = re.compile(r"(?:\$\s*|under\s+|below\s+|less than\s+)(\d+(?:\.\d+)?)")
+
+    def __init__(self, latency_ms=LLM_STUB_LATENCY_MS, jitter_ms=0.0, token_latency_ms=0.0,
+                 token_delay_ms=0.0, seed=0, sigma=LLM_STUB_LATENCY_SIGMA):
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.jitter_ms = jitter_ms
+        self.token_latency_ms = token_latency_ms
+        self.token_delay_ms = token_delay_ms
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _sleep(self, prompt):
+        if not (self.latency_ms or self.jitter_ms or self.token_latency_ms):
+            return
+        with self._lock:
+            delay = self.latency_ms * (self._rng.lognormvariate(0, self.sigma) if self.sigma else 1)
+            delay += self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+        delay += self.token_latency_ms * estimate_tokens(prompt)
+        time.sleep(max(0.0, delay) / 1000)
+
+    def generate(self, prompt):
+        self._sleep(prompt)
+        text = self._respond(prompt)
+        if self.token_delay_ms:
+            time.sleep(self.token_delay_ms * len(text.split()) / 1000)
+        return text
+
+    def stream(self, prompt):
+        self._sleep(prompt)
+        words = self._respond(prompt).split(' ')
+        for i, word in enumerate(words):
+            if self.token_delay_ms:
+                time.sleep(self.token_delay_ms / 1000)
+            yield word if i == 0 else ' ' + word
+
+    def _respond(self, prompt):
+        if 'CURRENT PREFERENCES:' in prompt:
+            return json.dumps(self._updated_preferences(prompt))
+        if 'extract their food preferences' in prompt:
+            return json.dumps(self._preferences(prompt))
+        if 'Generate a JSON object for a single' in prompt:
+            return json.dumps(self._product(prompt))
+        return self._reply(prompt)
+
+    def _preferences(self, prompt):
+        conversation = prompt.split('CONVERSATION:', 1)[-1].lower().splitlines()
+        return self._extract("\n".join(line for line in conversation if line.strip().startswith('user:')))
+
+    def _updated_preferences(self, prompt):
+        current, message = prompt.split('CURRENT PREFERENCES:', 1)[1].split('NEW MESSAGE:', 1)
+        prefs = json.loads(current)
+        for key, value in self._extract(message.lower()).items():
+            if isinstance(value, list):
+                prefs[key] = list(dict.fromkeys(prefs.get(key, []) + value))
+            else:
+                prefs[key] = value
+        return prefs
+
+    def _extract(self, text):
+        prefs = {}
+        budgets = self._BUDGET_RE.findall(text)
+        if budgets:
+            prefs['budget'] = float(budgets[-1])
+        for key, vocab in (('mood', self.MOODS), ('cravings', self.CRAVINGS), ('dietary', self.DIETARY)):
+            found = [word for word in vocab if word in text]
+            if found:
+                prefs[key] = found
+        return prefs
+
+    def _product(self, prompt):
+        rng = random.Random(hashlib.sha256(prompt.encode()).hexdigest())
+        category = re.search(r'"category": "([^"]+)"', prompt)
+        category = category.group(1) if category else 'Specials'
+        name = f"{rng.choice(['Blazing', 'Golden', 'Smoky', 'Crispy', 'Midnight'])} {category} Special"
+        return {
+            "product_id": "", "name": name, "category": category,
+            "description": f"A house favourite from our {category.lower()} menu.",
+            "ingredients": rng.sample(['Cheese', 'Lettuce', 'Tomato', 'Onion', 'Pickles', 'Sauce'], 3),
+            "price": round(rng.uniform(4, 16), 2), "calories": rng.randint(200, 1200),
+            "prep_time": "5-8 mins", "dietary_tags": rng.sample(['Vegetarian', 'High Protein', 'Gluten-Free'], 1),
+            "mood_tags": rng.sample(['Comfort Food', 'Spicy', 'Adventurous', 'Fresh'], 2),
+            "allergens": ['Gluten'], "popularity_score": rng.randint(1, 100),
+            "chef_special": rng.random() < 0.2, "limited_time": rng.random() < 0.1,
+            "spice_level": rng.randint(0, 10), "image_prompt": f"A photo of the {name}"
+        }
+
+    def _reply(self, prompt):
+        match = re.search(r"^\s*- (.+?): .*\(Price: \$([\d.]+)\)", prompt, re.MULTILINE)
+        if match:
+            return f"You have to try the {match.group(1)} for ${match.group(2)}! Want to hear about a few others?"
+        return "I'd love to help! What are you in the mood for today?"
+
+
+BACKENDS = {'gemini': GeminiBackend, 'stub': StubBackend}
+
+
+# --- Client --- #
+def normalize_prompt(prompt):
+    """Collapses whitespace so formatting-only differences share a cache entry."""
+    return " ".join(prompt.split())
+
+
+class LLMClient:
+    """Front door for all LLM calls: LRU+TTL response cache, coalescing of identical
+    in-flight prompts, and hit/miss/latency counters."""
+
+    def __init__(self, backend, cache_size=LLM_CACHE_SIZE, ttl_seconds=LLM_CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.cache_size = cache_size
+        self.ttl_seconds = ttl_seconds
+        self._cache = OrderedDict()  # key -> (expires_at, text)
+        self._inflight = {}          # key -> Future
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0,
+                       'backend_calls': 0, 'backend_seconds': 0.0, 'backend_max_seconds': 0.0}
+
+    @staticmethod
+    def cache_key(prompt):
+        return hashlib.sha256(normalize_prompt(prompt).encode('utf-8')).hexdigest()
+
+    def _call_backend(self, prompt):
+        start = time.perf_counter()
+        try:
+            return self.backend.generate(prompt)
+        except Exception:
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._stats['backend_calls'] += 1
+                self._stats['backend_seconds'] += elapsed
+                self._stats['backend_max_seconds'] = max(self._stats['backend_max_seconds'], elapsed)
+
+    def generate(self, prompt, use_cache=True):
+        """Returns the model's text for `prompt`.
+
+        With use_cache=False the call always reaches the backend, for prompts that
+        are expected to produce a different answer each time (e.g. data generation).
+        """
+        if not use_cache or not self.cache_size:
+            return self._call_backend(prompt)
+
+        key = self.cache_key(prompt)
+        leader = False
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[1]
+            waiting = self._inflight.get(key)
+            if waiting is not None:
+                self._stats['coalesced'] += 1
+            else:
+                self._stats['misses'] += 1
+                waiting = self._inflight[key] = Future()
+                leader = True
+        if not leader:
+            return waiting.result()
+
+        try:
+            text = self._call_backend(prompt)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            waiting.set_exception(e)
+            raise
+        self._store(key, text)
+        with self._lock:
+            del self._inflight[key]
+        waiting.set_result(text)
+        return text
+
+    def stream(self, prompt, use_cache=True):
+        """Yields the model's text for `prompt` in chunks as they are generated.
+
+        A cached reply is yielded as a single chunk; a streamed reply is cached once
+        it has completed. Streams are not coalesced, since each caller wants its
+        own tokens as early as possible.
+        """
+        key = self.cache_key(prompt)
+        if use_cache and self.cache_size:
+            cached = None
+            with self._lock:
+                entry = self._cache.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    self._cache.move_to_end(key)
+                    self._stats['hits'] += 1
+                    cached = entry[1]
+                else:
+                    self._stats['misses'] += 1
+            # Yielded outside the lock: the consumer may pause here, or never resume
+            if cached is not None:
+                yield cached
+                return
+
+        start = time.perf_counter()
+        chunks = []
+        try:
+            for chunk in self.backend.stream(prompt):
+                chunks.append(chunk)
+                yield chunk
+        except Exception:
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._stats['backend_calls'] += 1
+                self._stats['backend_seconds'] += elapsed
+                self._stats['backend_max_seconds'] = max(self._stats['backend_max_seconds'], elapsed)
+
+        if use_cache and self.cache_size:
+            self._store(key, "".join(chunks))
+
+    def _store(self, key, text):
+        with self._lock:
+            self._cache[key] = (time.monotonic() + self.ttl_seconds, text)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, cache_entries=len(self._cache))
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_rate'] = (stats['hits'] + stats['coalesced']) / lookups if lookups else 0.0
+        calls = stats['backend_calls']
+        stats['backend_avg_seconds'] = stats['backend_seconds'] / calls if calls else 0.0
+        return stats
+
+
+def create_llm_client(backend=LLM_BACKEND, **backend_kwargs):
+    """Builds an LLMClient for a backend named in BACKENDS ('gemini' or 'stub')."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{backend}', expected one of {sorted(BACKENDS)}")
+    return LLMClient(BACKENDS[backend](**backend_kwargs))
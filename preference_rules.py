@@ -0,0 +1,171 @@
+# preference_rules.py
+import re
+import threading
+
+import database_setup
+import db
+from metrics import PREFERENCE_PATHS
+from search_index import load_tags, normalize_tag, tokenize
+
+# --- Vocabulary --- #
+# Budget phrasings; the amount is read as a maximum price
+BUDGET_RE = re.compile(
+    r"(?:under|below|less than|max(?:imum)?|up to|no more than|at most|within|budget(?: of| is)?|cheaper than|<)"
+    r"\s*\$?\s*(\d+(?:\.\d{1,2})?)"
+    r"|\$\s*(\d+(?:\.\d{1,2})?)"
+    r"|(\d+(?:\.\d{1,2})?)\s*(?:dollars|dollar|bucks|usd)\b",
+    re.IGNORECASE
+)
+# Dietary restrictions and how users say them, by canonical term. A term is only
+# recognized if the catalog's dietary tags actually use all of its words.
+DIETARY_TERMS = {
+    'vegetarian': ['vegetarian', 'veg', 'veggie', 'meatless', 'meat free'],
+    'vegan': ['vegan', 'plant based'],
+    'gluten free': ['gluten free', 'gf', 'celiac', 'coeliac'],
+    'dairy free': ['dairy free', 'lactose free', 'lactose intolerant'],
+    'nut free': ['nut free'],
+    'high protein': ['high protein', 'protein'],
+    'low carb': ['low carb'],
+    'keto': ['keto'],
+    'halal': ['halal'],
+    'kosher': ['kosher'],
+    'pescatarian': ['pescatarian'],
+}
+# Words that carry no preference of their own
+FILLER_WORDS = frozenset(tokenize("""
+    a am an and any anything are at be can could do eat eating food for get give go got have hello hey hi
+    how hungry i im in is just kind like looking m me meal my of on or order please really some something
+    sort thank thanks the there to today too very want wanna we what whatever with would you
+    bite craving feel feeling mood option price cost budget max maximum around about keep by way hmm um oh it
+    dollar buck usd
+"""))
+# Words that only make sense against the conversation so far: withdrawals,
+# corrections and references to an earlier suggestion. Any of them sends the
+# message to the LLM.
+CONTEXT_WORDS = frozenset(tokenize("""
+    no not t without never nothing none dont don didn doesn isn instead anymore except but actually rather
+    allergic allergy hate avoid skip remove change changed cancel forget less more that this one those
+    them same other another else yes yeah yep sure ok okay maybe
+"""))
+
+
+class PreferenceRules:
+    """Local preference extraction for messages that need no interpretation.
+
+    A message is matched against the catalog's own vocabulary: budget
+    phrasings, dietary terms present in dietary_tags, mood tags, and words
+    from product names, categories and ingredients (cravings). Confidence is
+    the share of the message's meaningful words that were recognized; it is 0
+    when the message withdraws or refers back to something, since only the
+    LLM sees the conversation.
+    """
+
+    def __init__(self, dietary_tags, mood_tags, craving_words):
+        dietary_tokens = set(t for tag in dietary_tags for t in tokenize(tag))
+        phrases = {}
+        # Later kinds win, so a word that is both a tag and a product word is read as the tag
+        for word in craving_words:
+            token = normalize_tag(word)
+            if token and token not in FILLER_WORDS and token not in CONTEXT_WORDS and not token.isdigit():
+                phrases[(token,)] = ('cravings', token)
+        for tag in mood_tags:
+            phrase = normalize_tag(tag)
+            if phrase:
+                phrases[tuple(phrase.split())] = ('mood', phrase)
+        for term, aliases in DIETARY_TERMS.items():
+            if set(term.split()) <= dietary_tokens:
+                for alias in aliases:
+                    phrases[tuple(tokenize(alias))] = ('dietary', term)
+        self._phrases = phrases
+        self._longest = max((len(p) for p in phrases), default=1)
+
+    @classmethod
+    def from_connection(cls, conn):
+        dietary_tags, mood_tags, craving_words = set(), set(), set()
+        for name, category, ingredients, dietary, mood in conn.execute(
+                "SELECT name, category, ingredients, dietary_tags, mood_tags FROM products"):
+            dietary_tags.update(load_tags(dietary))
+            mood_tags.update(load_tags(mood))
+            for text in [name, category] + load_tags(ingredients):
+                craving_words.update(tokenize(text))
+        return cls(dietary_tags, mood_tags, craving_words)
+
+    def extract(self, message):
+        """Returns (preferences found in the message, confidence in [0, 1])."""
+        found = {}
+        text = message or ""
+        match = BUDGET_RE.search(text)
+        if match:
+            found['budget'] = float(next(g for g in match.groups() if g))
+            text = text[:match.start()] + " " + text[match.end():]
+
+        tokens = tokenize(text)
+        if any(t in CONTEXT_WORDS for t in tokens):
+            return found, 0.0
+        content = [t for t in tokens if t not in FILLER_WORDS]
+        if not content:
+            # Nothing but filler ("hi, I'm hungry") changes nothing; an empty message is unclear
+            return found, 1.0 if tokens or found else 0.0
+
+        recognized = i = 0
+        while i < len(tokens):
+            for size in range(min(self._longest, len(tokens) - i), 0, -1):
+                hit = self._phrases.get(tuple(tokens[i:i + size]))
+                if hit:
+                    kind, value = hit
+                    if value not in found.setdefault(kind, []):
+                        found[kind].append(value)
+                    recognized += sum(t not in FILLER_WORDS for t in tokens[i:i + size])
+                    i += size
+                    break
+            else:
+                i += 1
+        return found, min(1.0, recognized / len(content))
+
+    def update(self, preferences, message):
+        """Folds the message into `preferences` the way update_preferences asks the LLM to:
+        a new budget replaces the old one and new terms are added. Returns (updated, confidence)."""
+        found, confidence = self.extract(message)
+        updated = dict(preferences or {})
+        if 'budget' in found:
+            updated['budget'] = found['budget']
+        for key in ('mood', 'cravings', 'dietary'):
+            if key not in found:
+                continue
+            current = updated.get(key) or []
+            current = list(current) if isinstance(current, list) else [current]
+            seen = set(normalize_tag(v) for v in current)
+            updated[key] = current + [v for v in found[key] if v not in seen]
+        return updated, confidence
+
+
+# --- Path counters --- #
+def record_path(path):
+    """Counts one turn's preference path: 'rules', 'llm' or 'transcript'."""
+    PREFERENCE_PATHS.inc(path=path)
+
+
+# --- Shared instance --- #
+_rules = None
+_rules_lock = threading.Lock()
+
+
+def get_preference_rules():
+    """Returns the process-wide rules, reading the catalog vocabulary on first use."""
+    global _rules
+    if _rules is None:
+        with _rules_lock:
+            if _rules is None:
+                with db.connection() as conn:
+                    _rules = PreferenceRules.from_connection(conn)
+    return _rules
+
+
+def _reset_preference_rules():
+    # The vocabulary follows the catalog; reread on next use
+    global _rules
+    with _rules_lock:
+        _rules = None
+
+
+database_setup.register_reload_hook(_reset_preference_rules)
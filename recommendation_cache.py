@@ -0,0 +1,160 @@
+# recommendation_cache.py
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import database_setup
+import db
+from config import RECOMMENDATION_CACHE_SIZE, CATALOG_VERSION_CHECK_SECONDS
+from metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATION_CACHE_LOOKUPS = Counter('foodiebot_recommendation_cache_total',
+                                       "Product query cache lookups by result: hit or miss.", ['result'])
+
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _canonical_terms(value):
+    # Case, punctuation and spacing never change what the searches match (they
+    # tokenize the same way), so "Gluten-Free" and "gluten free" share a key
+    if not value:
+        return ()
+    values = value if isinstance(value, list) else [value]
+    terms = (" ".join(_WORD_RE.findall(str(v).lower())) for v in values)
+    return tuple(sorted(set(filter(None, terms))))
+
+
+def preference_key(preferences):
+    """(budget, mood, cravings, dietary) with the budget rounded to cents and every
+    list canonicalized, de-duplicated and sorted, so equivalent preferences share a key.
+    Searching with the key's own values gives the same results as the originals."""
+    budget = preferences.get("budget")
+    try:
+        budget = round(float(budget), 2) if budget else None
+    except (TypeError, ValueError):
+        budget = None
+    return (budget, _canonical_terms(preferences.get("mood")),
+            _canonical_terms(preferences.get("cravings")), _canonical_terms(preferences.get("dietary")))
+
+
+class RecommendationCache:
+    """LRU of product query results by preference_key().
+
+    Cleared whenever the catalog is reloaded in this process (reload hook) and
+    when the catalog_version counter in the database moves, which it does on
+    every catalog load and popularity_score change, by any process. The counter
+    is polled at most every `version_check_seconds`, so another process's
+    change shows up here within that long.
+    """
+
+    def __init__(self, capacity=RECOMMENDATION_CACHE_SIZE, version_check_seconds=CATALOG_VERSION_CHECK_SECONDS,
+                 read_version=db.get_catalog_version):
+        self.capacity = capacity
+        self.version_check_seconds = version_check_seconds
+        self._read_version = read_version
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._version = None
+        self._next_check = 0.0
+        self._generation = 0  # bumped by invalidate(), so results computed across one are not stored
+        self._refresher = None
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0,
+                       'hit_seconds': 0.0, 'miss_seconds': 0.0}
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now < self._next_check or not self._check_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = now + self.version_check_seconds
+            previous, self._version = self._version, self._read_version()
+            changed = previous is not None and self._version != previous
+        except Exception:
+            logger.exception("Could not read the catalog version")
+            return
+        finally:
+            self._check_lock.release()
+        if changed:
+            # Changed by another process, so this one's indexes are stale too. Rebuilding
+            # them takes seconds on a large catalog: not on this request's time. Hooks
+            # run in registration order, which clears the cache after the indexes.
+            self._refresher = threading.Thread(target=self._refresh, name='catalog-refresh', daemon=True)
+            self._refresher.start()
+
+    def _refresh(self):
+        try:
+            database_setup.notify_catalog_changed()
+        except Exception:
+            logger.exception("Failed to refresh after a catalog change")
+            self.invalidate()
+
+    def wait_for_refresh(self, timeout=None):
+        """Blocks until a refresh started by a catalog version change (if any) has finished."""
+        refresher = self._refresher
+        if refresher is not None:
+            refresher.join(timeout)
+
+    def _on_catalog_reload(self):
+        self.invalidate()
+        # The version this process just loaded, so the next check doesn't reload it again
+        try:
+            self._version = self._read_version()
+        except Exception:
+            self._version = None
+
+    def get_or_compute(self, key, compute):
+        """The cached value for `key`, or compute() stored under it."""
+        start = time.perf_counter()
+        if self.capacity:
+            self._check_version()
+            with self._lock:
+                generation = self._generation
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    value = self._entries[key]
+                    self._stats['hits'] += 1
+                    self._stats['hit_seconds'] += time.perf_counter() - start
+                    RECOMMENDATION_CACHE_LOOKUPS.inc(result='hit')
+                    return value
+        value = compute()
+        with self._lock:
+            # Unless the catalog changed meanwhile: then `value` may come from the old one
+            if self.capacity and self._generation == generation:
+                self._entries[key] = value
+                while len(self._entries) > self.capacity:
+                    self._entries.popitem(last=False)
+            self._stats['misses'] += 1
+            self._stats['miss_seconds'] += time.perf_counter() - start
+        RECOMMENDATION_CACHE_LOOKUPS.inc(result='miss')
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['hit_avg_seconds'] = stats['hit_seconds'] / stats['hits'] if stats['hits'] else 0.0
+        stats['miss_avg_seconds'] = stats['miss_seconds'] / stats['misses'] if stats['misses'] else 0.0
+        return stats
+
+
+_cache = RecommendationCache()
+
+
+def get_recommendation_cache():
+    return _cache
+
+
+database_setup.register_reload_hook(_cache._on_catalog_reload)
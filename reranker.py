@@ -0,0 +1,140 @@
+# reranker.py
+import threading
+
+import numpy as np
+
+import database_setup
+import db
+from config import RERANK_RELEVANCE_WEIGHT, RERANK_SHOWN_PENALTY, RERANK_MAX_PER_CATEGORY
+from search_index import load_tags, normalize_tag
+
+
+class ProductFeatures:
+    """Per-product features for re-ranking, computed once per catalog load.
+
+    Row i of `tags` is product i's mood and dietary tags as an L2-normalized
+    indicator vector, so a dot product of two rows is their tag cosine
+    similarity. `categories` holds category codes. Products the matrix has not
+    seen (added since it was built) get a last, all-zero row and a category of
+    their own.
+    """
+
+    def __init__(self, product_ids, categories, tag_lists):
+        self._rows = {pid: i for i, pid in enumerate(product_ids)}
+        self.unknown_row = len(product_ids)
+        codes = {}
+        self.categories = np.array([codes.setdefault(c or '', len(codes)) for c in categories] + [-1],
+                                   dtype=np.int32)
+        self.category_count = len(codes)
+
+        vocabulary = {}
+        tag_ids = [sorted({vocabulary.setdefault(tag, len(vocabulary)) for tag in tags}) for tags in tag_lists]
+        self.tags = np.zeros((len(product_ids) + 1, max(len(vocabulary), 1)), dtype=np.float32)
+        for i, ids in enumerate(tag_ids):
+            if ids:
+                self.tags[i, ids] = 1 / np.sqrt(len(ids))
+
+    @classmethod
+    def from_connection(cls, conn):
+        product_ids, categories, tag_lists = [], [], []
+        for row in conn.execute("SELECT product_id, category, mood_tags, dietary_tags FROM products"):
+            product_ids.append(row[0])
+            categories.append(row[1])
+            tag_lists.append({normalize_tag(t) for t in load_tags(row[2]) + load_tags(row[3])} - {''})
+        return cls(product_ids, categories, tag_lists)
+
+    def rows(self, product_ids):
+        return np.array([self._rows.get(pid, self.unknown_row) for pid in product_ids], dtype=np.intp)
+
+
+class Reranker:
+    """Picks the products to show from a relevance-ranked candidate list.
+
+    Greedy maximal marginal relevance: each pick maximizes
+
+        relevance_weight * relevance - (1 - relevance_weight) * max tag similarity
+        to the products already picked - shown_penalty if this session was
+        already recommended it
+
+    where relevance falls linearly with the candidate's search rank. No more
+    than `max_per_category` picks share a category unless nothing else is left.
+    """
+
+    def __init__(self, features, relevance_weight=RERANK_RELEVANCE_WEIGHT, shown_penalty=RERANK_SHOWN_PENALTY,
+                 max_per_category=RERANK_MAX_PER_CATEGORY):
+        self.features = features
+        self.relevance_weight = relevance_weight
+        self.shown_penalty = shown_penalty
+        self.max_per_category = max_per_category
+
+    def order(self, product_ids, shown=(), limit=5):
+        """Positions in `product_ids` (best first by search rank) of the products to show, in order."""
+        n = len(product_ids)
+        if n == 0:
+            return []
+        features = self.features
+        rows = features.rows(product_ids)
+        vectors = features.tags[rows]
+        similarity = vectors @ vectors.T
+        categories = features.categories[rows]
+
+        base = self.relevance_weight * (1 - np.arange(n, dtype=np.float32) / n)
+        if shown:
+            shown = set(shown)
+            base -= self.shown_penalty * np.fromiter((pid in shown for pid in product_ids), dtype=bool, count=n)
+        diversity_weight = 1 - self.relevance_weight
+        max_similarity = np.zeros(n, dtype=np.float32)
+        available = np.ones(n, dtype=bool)
+        per_category = np.zeros(features.category_count + 1, dtype=np.int32)
+
+        picks = []
+        for _ in range(min(limit, n)):
+            scores = base - diversity_weight * max_similarity
+            # Unknown products (-1) index the last slot, which is never counted
+            allowed = available & (per_category[categories] < self.max_per_category)
+            if not allowed.any():
+                allowed = available
+            scores[~allowed] = -np.inf
+            pick = int(scores.argmax())
+            picks.append(pick)
+            available[pick] = False
+            np.maximum(max_similarity, similarity[pick], out=max_similarity)
+            if categories[pick] != -1:
+                per_category[categories[pick]] += 1
+        return picks
+
+    def rerank(self, products, shown=(), limit=5):
+        """The `limit` products to show, from product dicts ranked by relevance.
+        `shown` holds the ids this session has already been recommended."""
+        return [products[i] for i in self.order([p['product_id'] for p in products], shown, limit)]
+
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker():
+    """Returns the process-wide reranker, computing product features on first use."""
+    global _reranker
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                _reranker = _build_reranker()
+    return _reranker
+
+
+def _build_reranker():
+    with db.connection() as conn:
+        return Reranker(ProductFeatures.from_connection(conn))
+
+
+def _on_catalog_reload():
+    # Only rebuild if this process has actually loaded the features
+    global _reranker
+    if _reranker is not None:
+        fresh = _build_reranker()
+        with _reranker_lock:
+            _reranker = fresh
+
+
+database_setup.register_reload_hook(_on_catalog_reload)
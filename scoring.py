@@ -0,0 +1,154 @@
+# scoring.py
+import re
+
+# --- Interest Scoring Rules --- [cite: 51]
+ENGAGEMENT_FACTORS = {
+    'specific_preferences': 15, 'dietary_restrictions': 10, 'budget_mention': 5,
+    'mood_indication': 20, 'question_asking': 10, 'enthusiasm_words': 8,
+    'price_inquiry': 25, 'order_intent': 30
+}
+NEGATIVE_FACTORS = {
+    'hesitation': -10, 'budget_concern': -15,
+    'dietary_conflict': -20, 'rejection': -25, 'delay_response': -5
+}
+FACTORS = {**ENGAGEMENT_FACTORS, **NEGATIVE_FACTORS}
+
+# Lowercase substrings that trigger each factor. A factor counts once per message
+# however many of its keywords appear.
+KEYWORDS = {
+    'specific_preferences': ["i prefer", "i'd like", "i would like", "looking for", "craving", "with extra", "without"],
+    'dietary_restrictions': ["vegetarian", "vegan", "gluten", "dairy-free", "dairy free", "lactose", "halal",
+                             "kosher", "keto", "allergic", "allergy", "nut-free"],
+    'budget_mention': ["budget", "under $", "below $", "less than $", "cheap", "affordable", "bucks", "dollars"],
+    'mood_indication': ["i'm feeling", "i feel", "in the mood", "craving something", "comfort food", "adventurous",
+                        "hungry", "starving"],
+    'question_asking': ["what's in", "spice level", "calories"],
+    'enthusiasm_words': ["love", "want", "need", "perfect", "amazing", "great"],
+    'price_inquiry': ["how much", "price", "cost"],
+    'order_intent': ["i'll take it", "add to cart", "order", "buy"],
+    'hesitation': ["maybe", "not sure", "i guess"],
+    'budget_concern': ["too expensive", "that's a lot"],
+    'dietary_conflict': ["allergic to", "can't eat", "cannot eat", "not vegan", "not vegetarian", "has meat"],
+    'rejection': ["don't like", "no thanks", "not that"],
+    'delay_response': ["hmm", "let me think", "give me a minute", "one sec", "later"],
+}
+
+SCORE_MIN, SCORE_MAX = 0, 100
+
+
+def _trie_regex(words):
+    """Alternation of `words` factored into a trie, e.g. "ab|ac" -> "a(?:b|c)".
+
+    re tries alternatives one by one, so a flat list of ~80 keywords costs ~80
+    attempts per character; branching on one character at a time cuts that to a
+    few. Optional tails are greedy, so the longest keyword at a position wins.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' not in node:
+            return body
+        return (body if body.startswith('(?:') else '(?:' + body + ')') + '?'
+
+    return build(trie)
+
+
+def _compile(keywords):
+    """Builds one regex over every keyword plus a keyword -> factors map.
+
+    The pattern is a zero-width lookahead, so finditer() tries every start
+    position and overlapping keywords are all seen. Only the longest keyword
+    starting at a position is reported, so its map entry also carries the
+    factors of every shorter keyword that is a prefix of it (e.g. "allergic to"
+    also counts as "allergic").
+    """
+    by_keyword = {}
+    for factor, words in keywords.items():
+        for word in words:
+            by_keyword.setdefault(word, set()).add(factor)
+    factor_map = {
+        word: frozenset(f for other, factors in by_keyword.items() if word.startswith(other) for f in factors)
+        for word in by_keyword
+    }
+    return re.compile(f"(?=({_trie_regex(by_keyword)}))"), factor_map
+
+
+_PATTERN, _FACTOR_MAP = _compile(KEYWORDS)
+
+
+def _factors(lowered):
+    factors = set()
+    for keyword in _PATTERN.findall(lowered):
+        factors |= _FACTOR_MAP[keyword]
+    return factors
+
+
+def score_delta(text):
+    """Total score change for one message."""
+    return sum(FACTORS[f] for f in _factors(text.lower()))
+
+
+def clamp(score):
+    return max(SCORE_MIN, min(SCORE_MAX, score))
+
+
+def calculate_interest_score(text, current_score):
+    """Calculates the interest score based on keywords in the user's message."""
+    return clamp(current_score + score_delta(text))
+
+
+def score_deltas(texts):
+    """Score changes for many messages in one call, e.g. for offline re-scoring."""
+    factors, findall, factor_map = FACTORS, _PATTERN.findall, _FACTOR_MAP
+    deltas = []
+    for text in texts:
+        keywords = findall(text.lower())
+        if not keywords:
+            deltas.append(0)
+            continue
+        deltas.append(sum(factors[f] for f in frozenset().union(*map(factor_map.__getitem__, keywords))))
+    return deltas
+
+
+def rescore_history(rows, initial_score=0, initial_scores=None):
+    """Recomputes stored interest scores for conversation_history rows.
+
+    `rows` are (session_id, role, content) tuples ordered by session then time.
+    A session starts at its score in `initial_scores` if it has one (e.g. the
+    final score of its compacted turns), else at `initial_score`. Returns one
+    score per row following the app's convention: a user turn stores the score
+    before it was applied, the bot reply the score after it.
+    """
+    initial_scores = initial_scores or {}
+    rows = list(rows)
+    deltas = iter(score_deltas([content or "" for _, role, content in rows if role == 'user']))
+    scores = []
+    session, score = object(), initial_score
+    for session_id, role, _ in rows:
+        if session_id != session:
+            session, score = session_id, initial_scores.get(session_id, initial_score)
+        scores.append(score)
+        if role == 'user':
+            score = clamp(score + next(deltas))
+    return scores
+
+
+if __name__ == "__main__":
+    # Offline re-scoring of the stored history, e.g. after changing the rules
+    import db
+
+    history = db.get_all_history_rows()
+    # A compacted session's earlier turns are gone from the table; continue from its summary
+    scores = rescore_history([(row['session_id'], row['role'], row['content']) for row in history],
+                             initial_scores=db.get_summary_final_scores())
+    db.update_interest_scores(zip(scores, (row['id'] for row in history)))
+    print(f"Re-scored {len(history)} conversation turns.")
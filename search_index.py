@@ -0,0 +1,265 @@
+# search_index.py
+import bisect
+import heapq
+import itertools
+import json
+import re
+import sqlite3
+import threading
+from collections import Counter
+
+import database_setup
+import db
+from config import SEARCH_POPULARITY_WEIGHT
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _stem(word):
+    """Very light plural folding so 'burgers' and 'burger' share a posting."""
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Lowercases and splits text into stemmed word tokens."""
+    if not text:
+        return []
+    return [_stem(w) for w in _WORD_RE.findall(str(text).lower())]
+
+
+def normalize_tag(tag):
+    """Canonical form of a tag, e.g. 'Gluten-Free' -> 'gluten free'."""
+    return " ".join(tokenize(tag))
+
+
+def load_tags(value):
+    """A tags column as a list: JSON arrays are decoded, a plain string is one tag."""
+    if not value:
+        return []
+    if isinstance(value, list):
+        return value
+    try:
+        tags = json.loads(value)
+    except (TypeError, ValueError):
+        return [value]
+    return tags if isinstance(tags, list) else [tags]
+
+
+class ProductSearchIndex:
+    """In-memory product catalog with inverted tag/keyword indexes.
+
+    Products are numbered in descending popularity order, so a smaller id always
+    means a more popular product and ties rank without a lookup. Every posting
+    list is kept sorted by price, which turns the budget filter into a bisect
+    and a slice. Dietary restrictions are hard filters answered by set
+    intersection; mood/craving terms are scored by how many of their tokens
+    (plus exact tag hits) a product matches, so partial matches still rank
+    instead of being dropped by an all-or-nothing AND.
+    """
+
+    def __init__(self, columns, rows):
+        self.columns = tuple(columns)
+        col = {name: i for i, name in enumerate(self.columns)}
+        price_col, pop_col = col['price'], col['popularity_score']
+
+        self._rows = sorted(rows, key=lambda row: -(row[pop_col] or 0))
+        self._prices = [row[price_col] if row[price_col] is not None else 0.0 for row in self._rows]
+        self._price_order = sorted(range(len(self._rows)), key=self._prices.__getitem__)
+        self._sorted_prices = [self._prices[i] for i in self._price_order]
+
+        tag_ids = {}      # normalized mood/dietary tag -> ids
+        keyword_ids = {}  # token from name/description/tags -> ids
+        dietary_ids = {}  # token from dietary tags -> ids
+        for pid, row in enumerate(self._rows):
+            mood_tags = load_tags(row[col['mood_tags']])
+            dietary_tags = load_tags(row[col['dietary_tags']])
+            keywords = set(tokenize(row[col['name']])) | set(tokenize(row[col['description']]))
+            for tag in set(normalize_tag(t) for t in mood_tags + dietary_tags):
+                tag_ids.setdefault(tag, []).append(pid)
+                keywords.update(tag.split())
+            for token in set(t for tag in dietary_tags for t in tokenize(tag)):
+                dietary_ids.setdefault(token, []).append(pid)
+            for token in keywords:
+                keyword_ids.setdefault(token, []).append(pid)
+
+        self._tag_index = {k: self._posting(v) for k, v in tag_ids.items()}
+        self._keyword_index = {k: self._posting(v) for k, v in keyword_ids.items()}
+        self._dietary_index = {k: self._posting(v) for k, v in dietary_ids.items()}
+
+    def _posting(self, ids):
+        """A posting is (ids sorted by price, their prices) for bisecting on budget."""
+        ids.sort(key=self._prices.__getitem__)
+        return ids, [self._prices[i] for i in ids]
+
+    @classmethod
+    def from_connection(cls, conn):
+        """Loads the whole products table in a single pass."""
+        cursor = conn.execute("SELECT * FROM products")
+        columns = [d[0] for d in cursor.description]
+        return cls(columns, [tuple(row) for row in cursor.fetchall()])
+
+    @classmethod
+    def from_db(cls, db_path):
+        conn = sqlite3.connect(db_path)
+        try:
+            return cls.from_connection(conn)
+        finally:
+            conn.close()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _product(self, pid):
+        return dict(zip(self.columns, self._rows[pid]))
+
+    @staticmethod
+    def _within_budget(posting, budget):
+        ids, prices = posting
+        if budget is None:
+            return ids
+        return ids[:bisect.bisect_right(prices, budget)]
+
+    def _dietary_filter(self, dietary, budget):
+        """Ids within budget satisfying every dietary restriction, or None if unrestricted."""
+        allowed = None
+        for restriction in dietary:
+            for token in set(tokenize(restriction)):
+                posting = self._dietary_index.get(token)
+                ids = self._within_budget(posting, budget) if posting else ()
+                allowed = set(ids) if allowed is None else allowed.intersection(ids)
+                if not allowed:
+                    return set()
+        return allowed
+
+    def _score_terms(self, terms, budget, allowed):
+        """Counts token and exact-tag hits per id across all mood/craving terms."""
+        counts = Counter()
+        for term in terms:
+            phrase = normalize_tag(term)
+            if not phrase:
+                continue
+            postings = [self._keyword_index.get(t) for t in set(phrase.split())]
+            postings.append(self._tag_index.get(phrase))
+            for posting in postings:
+                if posting is None:
+                    continue
+                ids = self._within_budget(posting, budget)
+                counts.update(ids if allowed is None else allowed.intersection(ids))
+        return counts
+
+    @staticmethod
+    def _top_ranked(counts, limit):
+        """Highest counts first, ties broken by popularity (i.e. smallest id)."""
+        if not counts:
+            return []
+        threshold = heapq.nlargest(limit, counts.values())[-1]
+        above = sorted((pid for pid, c in counts.items() if c > threshold),
+                       key=lambda pid: (-counts[pid], pid))
+        tied = heapq.nsmallest(limit - len(above), (pid for pid, c in counts.items() if c == threshold))
+        return above + tied
+
+    def _most_popular(self, budget, allowed, limit):
+        """Top products by popularity when there is nothing to score on."""
+        if allowed is not None:
+            return heapq.nsmallest(limit, allowed)
+        if budget is None:
+            return list(range(min(limit, len(self._rows))))
+        cut = bisect.bisect_right(self._sorted_prices, budget)
+        # A selective budget is cheaper to scan through the price-sorted prefix
+        # than by walking the products in popularity order.
+        if cut * limit < len(self._rows):
+            return heapq.nsmallest(limit, self._price_order[:cut])
+        prices = self._prices
+        return list(itertools.islice((pid for pid in range(len(prices)) if prices[pid] <= budget), limit))
+
+    def search(self, budget=None, mood=(), cravings=(), dietary=(), limit=5):
+        """Returns up to `limit` product dicts ranked by relevance, then popularity."""
+        allowed = self._dietary_filter(dietary, budget)
+        if allowed is not None and not allowed:
+            return []
+
+        terms = list(mood) + list(cravings)
+        if terms:
+            ranked = self._top_ranked(self._score_terms(terms, budget, allowed), limit)
+        else:
+            ranked = self._most_popular(budget, allowed, limit)
+        return [self._product(pid) for pid in ranked]
+
+
+# --- Full-text search --- #
+# BM25 weight of each products_fts column: name, description, ingredients, mood_tags, dietary_tags
+FTS_COLUMN_WEIGHTS = (10.0, 3.0, 4.0, 2.0, 1.0)
+FTS_QUERY = f"""
+    SELECT products.* FROM products_fts JOIN products ON products.rowid = products_fts.rowid
+    WHERE products_fts MATCH ? AND (? IS NULL OR products.price <= ?)
+    ORDER BY bm25(products_fts, {', '.join(map(str, FTS_COLUMN_WEIGHTS))})
+             * (1.0 + ? * COALESCE(products.popularity_score, 0) / 100.0)
+    LIMIT ?
+    """
+
+
+def _fts_tokens(terms):
+    # Quoting every token keeps user text from being read as FTS5 query syntax
+    return list(dict.fromkeys(f'"{t}"' for term in terms for t in _WORD_RE.findall(str(term).lower())))
+
+
+def fts_match_expression(terms, dietary=()):
+    """FTS5 query: any of the terms, and every dietary token within dietary_tags."""
+    tokens = _fts_tokens(terms)
+    if not tokens:
+        return None
+    expression = f"({' OR '.join(tokens)})"
+    for token in _fts_tokens(dietary):
+        expression += f" AND dietary_tags : {token}"
+    return expression
+
+
+def fts_search(conn, cravings, mood=(), dietary=(), budget=None, limit=5,
+               popularity_weight=SEARCH_POPULARITY_WEIGHT):
+    """Full-text search of cravings (and mood) over products_fts.
+
+    Results are ranked by BM25 across name, description, ingredients and tags,
+    boosted by popularity_score. Budget and dietary restrictions are hard filters.
+    """
+    expression = fts_match_expression(list(cravings) + list(mood), dietary)
+    if expression is None:
+        return []
+    rows = conn.execute(FTS_QUERY, (expression, budget, budget, popularity_weight, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+
+# --- Shared instance --- #
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """Returns the process-wide index, loading the catalog on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                with db.connection() as conn:
+                    _index = ProductSearchIndex.from_connection(conn)
+    return _index
+
+
+def refresh_search_index():
+    """Rebuilds the index from the database and swaps it in atomically."""
+    global _index
+    with db.connection() as conn:
+        fresh = ProductSearchIndex.from_connection(conn)
+    with _index_lock:
+        _index = fresh
+    return fresh
+
+
+def _on_catalog_reload():
+    # Only rebuild if this process has actually loaded the catalog
+    if _index is not None:
+        refresh_search_index()
+
+
+database_setup.register_reload_hook(_on_catalog_reload)
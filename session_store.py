@@ -0,0 +1,300 @@
+# session_store.py
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import db
+from config import (SESSION_BACKEND, SESSION_DIR, SESSION_MAX_SESSIONS, SESSION_IDLE_SECONDS,
+                    SESSION_MAX_MEMORY_MB, SESSION_RECENT_TURNS, SESSION_RECENT_RECOMMENDATIONS)
+from conversation_logger import get_logger
+from metrics import Counter
+
+SESSION_LOOKUPS = Counter('foodiebot_session_lookups_total',
+                          "Session state lookups by outcome: hit, backend (loaded from the shared backend), "
+                          "recovered (rebuilt from SQLite) or new.", ['result'])
+SESSION_EVICTIONS = Counter('foodiebot_session_evictions_total',
+                            "Sessions dropped from the in-process cache, by reason.", ['reason'])
+
+# Rough per-session bookkeeping cost on top of its serialized state, for the memory cap
+_ENTRY_OVERHEAD_BYTES = 512
+
+
+class SessionState:
+    """Everything a chat turn needs about its session, held server-side.
+
+    The interest score here is authoritative; clients no longer send it.
+    Only the most recent turns and recommendations are kept; the full
+    transcript stays in conversation_history (or, once compacted, the archive).
+    """
+
+    __slots__ = ('session_id', 'score', 'turns', 'recommendations', 'preferences')
+
+    def __init__(self, session_id, score=0, turns=(), recommendations=(), preferences=None):
+        self.session_id = session_id
+        self.score = score
+        self.turns = [tuple(turn) for turn in turns][-SESSION_RECENT_TURNS:]  # (role, content)
+        self.recommendations = list(recommendations)[-SESSION_RECENT_RECOMMENDATIONS:]  # product ids
+        self.preferences = preferences  # None until the session's preferences were first saved
+
+    def history(self):
+        """Recent turns formatted like db.format_history, for prompts."""
+        return "\n".join(f"{role}: {content}" for role, content in self.turns)
+
+    def to_dict(self):
+        return {'session_id': self.session_id, 'score': self.score, 'turns': self.turns,
+                'recommendations': self.recommendations, 'preferences': self.preferences}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['session_id'], data.get('score', 0), data.get('turns', ()),
+                   data.get('recommendations', ()), data.get('preferences'))
+
+
+# --- Backends --- #
+class LocalBackend:
+    """Keeps state in this process only; after a restart sessions are rebuilt from SQLite."""
+
+    shared = False
+
+    def version(self, session_id):
+        return None
+
+    def load(self, session_id):
+        return None
+
+    def save(self, session_id, data):
+        return None
+
+    def prune(self, idle_seconds):
+        return 0
+
+
+class FileBackend:
+    """One JSON file per session under `directory`, shared by every worker process.
+
+    Writes go to a temporary file and are swapped in with os.replace, so a
+    reader never sees half a session. Each file carries a hash of the state it
+    holds as its version: a worker whose cached copy has a different version
+    reloads it. Files untouched for longer than the session idle time are
+    deleted by prune(); such a session is rebuilt from SQLite if it comes back.
+    Point the directory at a tmpfs such as /dev/shm to keep it in shared memory.
+    """
+
+    shared = True
+
+    def __init__(self, directory=SESSION_DIR):
+        self.directory = directory
+
+    def _path(self, session_id):
+        digest = hashlib.sha1(session_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + '.json')
+
+    def _read(self, session_id):
+        try:
+            with open(self._path(session_id)) as f:
+                stored = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        # Files from before versions were stored count as missing and are rebuilt from SQLite
+        return stored if isinstance(stored, dict) and 'version' in stored else None
+
+    def version(self, session_id):
+        stored = self._read(session_id)
+        return stored['version'] if stored else None
+
+    def load(self, session_id):
+        """(version, data) or None if no worker has saved this session."""
+        stored = self._read(session_id)
+        return (stored['version'], stored['state']) if stored else None
+
+    def save(self, session_id, data):
+        version = hashlib.sha1(data.encode('utf-8')).hexdigest()
+        path = self._path(session_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(f'{{"version": "{version}", "state": {data}}}')
+        os.replace(tmp, path)
+        return version
+
+    def prune(self, idle_seconds):
+        """Deletes session files not written for `idle_seconds`; returns how many."""
+        cutoff = time.time() - idle_seconds
+        removed = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.stat(path).st_mtime < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass  # rewritten or pruned by another worker meanwhile
+        return removed
+
+
+BACKENDS = {'local': LocalBackend, 'file': FileBackend}
+
+
+def create_backend(name=SESSION_BACKEND):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown session backend '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+# --- Recovery --- #
+def recover_session(session_id):
+    """Rebuilds a session's state from SQLite (plus turns still queued for writing),
+    or returns None for a session that has never been seen.
+
+    For a session that history compaction has summarized, the score and earlier
+    recommendations come from its summary; its archived transcript is not reloaded.
+    """
+    queued = get_logger().pending(session_id)
+    rows = db.get_recent_history_rows(session_id, SESSION_RECENT_TURNS)
+    preferences = db.get_session_preferences(session_id)
+    summary = db.get_session_summary(session_id)
+    if not rows and not queued and preferences is None and summary is None:
+        return None
+    stored = {row['timestamp'] for row in rows}
+    turns = [(row['role'], row['content'], row['interest_score'], row['recommendation_made']) for row in rows]
+    turns += [(role, content, score, recommendation)
+              for _, role, content, score, recommendation, timestamp in queued if timestamp not in stored]
+    initial_score = summary['final_score'] if summary and summary['final_score'] is not None else 0
+    score = next((turn[2] for turn in reversed(turns) if turn[2] is not None), initial_score)
+    recommendations = (summary['recommendations'] if summary else []) + [turn[3] for turn in turns if turn[3]]
+    return SessionState(session_id, score, [(role, content) for role, content, _, _ in turns],
+                        recommendations, preferences)
+
+
+# --- Store --- #
+class SessionStore:
+    """Bounded LRU of SessionState in front of a backend, with SQLite as the last resort.
+
+    Sessions idle for more than `idle_seconds` are dropped, as are the least
+    recently used ones once there are more than `max_sessions` of them or their
+    estimated size passes `max_bytes`. A dropped session is transparently
+    reloaded from the backend, or rebuilt from conversation_history, on its
+    next turn.
+    """
+
+    def __init__(self, backend=None, max_sessions=SESSION_MAX_SESSIONS, idle_seconds=SESSION_IDLE_SECONDS,
+                 max_bytes=int(SESSION_MAX_MEMORY_MB * 1024 * 1024), recover=recover_session):
+        self.backend = backend or LocalBackend()
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self._recover = recover
+        self._sessions = OrderedDict()  # session_id -> [state, version, size, last_used]
+        self._bytes = 0
+        self._next_prune = time.monotonic() + idle_seconds / 2
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """The session's current state (a new, empty one for an unknown session)."""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._sessions.get(session_id)
+            prune = self.backend.shared and now >= self._next_prune
+            if prune:
+                self._next_prune = now + self.idle_seconds / 2
+        if prune:
+            # The backend outlives this process's cache; clear out its idle sessions too, off the request
+            threading.Thread(target=self.backend.prune, args=(self.idle_seconds,),
+                             name='session-prune', daemon=True).start()
+        if entry is not None:
+            if not self.backend.shared or self.backend.version(session_id) == entry[1]:
+                with self._lock:
+                    if session_id in self._sessions:
+                        self._sessions.move_to_end(session_id)
+                        entry[3] = now
+                SESSION_LOOKUPS.inc(result='hit')
+                return entry[0]
+
+        # Not cached here, or another worker has changed it since
+        loaded = self.backend.load(session_id)
+        if loaded is not None:
+            version, data = loaded
+            state, result = SessionState.from_dict(data), 'backend'
+        else:
+            version, state = None, self._recover(session_id)
+            result = 'recovered' if state is not None else 'new'
+            if state is None:
+                state = SessionState(session_id)
+        SESSION_LOOKUPS.inc(result=result)
+        self._put(state, version, now)
+        return state
+
+    def save(self, state):
+        """Stores a modified state (after record_turn/set_preferences) in the cache and the backend."""
+        data = json.dumps(state.to_dict())
+        version = self.backend.save(state.session_id, data)
+        self._put(state, version, time.monotonic(), len(data))
+
+    def record_turn(self, state, role, content, score=None, recommendation=None):
+        """Appends a turn to the session (and a new score/recommendation, if given) and saves it."""
+        state.turns.append((role, content))
+        del state.turns[:-SESSION_RECENT_TURNS]
+        if score is not None:
+            state.score = score
+        if recommendation:
+            state.recommendations.append(recommendation)
+            del state.recommendations[:-SESSION_RECENT_RECOMMENDATIONS]
+        self.save(state)
+
+    def set_preferences(self, state, preferences):
+        state.preferences = preferences
+        self.save(state)
+
+    def _put(self, state, version, now, size=None):
+        if size is None:
+            size = len(json.dumps(state.to_dict()))
+        size += _ENTRY_OVERHEAD_BYTES
+        with self._lock:
+            old = self._sessions.pop(state.session_id, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._sessions[state.session_id] = [state, version, size, now]
+            self._bytes += size
+            while self._sessions and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+                self._drop_oldest('capacity')
+
+    def _evict_idle(self, now):
+        # Access order is also last-use order, so idle sessions are all at the front
+        while self._sessions:
+            entry = next(iter(self._sessions.values()))
+            if now - entry[3] <= self.idle_seconds:
+                break
+            self._drop_oldest('idle')
+
+    def _drop_oldest(self, reason):
+        _, entry = self._sessions.popitem(last=False)
+        self._bytes -= entry[2]
+        SESSION_EVICTIONS.inc(reason=reason)
+
+    def stats(self):
+        with self._lock:
+            return {'sessions': len(self._sessions), 'bytes': self._bytes}
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+            self._bytes = 0
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Returns the process-wide store, using the SESSION_BACKEND backend."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SessionStore(create_backend())
+    return _store
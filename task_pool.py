@@ -0,0 +1,78 @@
+# task_pool.py
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class PoolSaturated(Exception):
+    """Raised when a BoundedExecutor has no worker or queue slot left."""
+
+
+class BoundedExecutor:
+    """Thread pool that rejects work instead of queueing it without limit.
+
+    At most `max_workers` tasks run at once and at most `queue_depth` more may
+    wait. A slot is held until the task actually finishes, so a call that
+    outlives its caller's timeout still counts against capacity; this is what
+    turns a slow upstream into backpressure rather than an unbounded backlog.
+    """
+
+    def __init__(self, max_workers, queue_depth=0, thread_name_prefix='pool'):
+        self.max_workers = max_workers
+        self.capacity = max_workers + queue_depth
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix=thread_name_prefix)
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedules fn and returns its Future, or raises PoolSaturated."""
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturated(f"all {self.capacity} slots are busy")
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn, *args, timeout=None, **kwargs):
+        """Submits fn and waits up to `timeout` seconds for its result."""
+        return self.submit(fn, *args, **kwargs).result(timeout=timeout)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+def completed_future(result):
+    """A Future that already holds `result`, for work done without the pool."""
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class TokenBucket:
+    """Rate limiter: allows `rate` acquisitions per second on average, with
+    bursts of up to `capacity`. A rate of 0 or None means unlimited."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, then takes it."""
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
@@ -0,0 +1,68 @@
+# tests/test_conversation_logger.py
+import sqlite3
+
+import pytest
+
+from conversation_logger import ConversationLogger
+
+
+class _Writer:
+    """Stands in for db.insert_messages; rows whose content is in `bad` make the whole batch fail."""
+
+    def __init__(self, bad=(), error=ValueError):
+        self.bad = set(bad)
+        self.error = error
+        self.rows = []
+
+    def __call__(self, rows):
+        if any(row[2] in self.bad for row in rows):
+            raise self.error("cannot write row")
+        self.rows.extend(rows)
+
+
+def _logger(writer, **kwargs):
+    # A long interval keeps the background thread out of the way; the tests flush by hand
+    return ConversationLogger(batch_size=10, flush_interval=60, write_rows=writer, max_attempts=3, **kwargs)
+
+
+def test_row_that_never_writes_is_dropped_after_max_attempts():
+    writer = _Writer(bad={'poison'})
+    log = _logger(writer)
+    for content in ('a', 'poison', 'b'):
+        log.log('s1', 'user', content, 0)
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            log.flush()
+    assert log.flush() == 2
+    assert [row[2] for row in writer.rows] == ['a', 'b']
+    assert log.pending('s1') == []
+    log.close()
+
+
+def test_unavailable_database_drops_nothing():
+    writer = _Writer(bad={'a'}, error=sqlite3.OperationalError)
+    log = _logger(writer)
+    log.log('s1', 'user', 'a', 0)
+    for _ in range(5):
+        with pytest.raises(sqlite3.OperationalError):
+            log.flush()
+    assert len(log.pending('s1')) == 1
+    writer.bad.clear()
+    assert log.flush() == 1
+    log.close()
+
+
+def test_full_queue_applies_backpressure():
+    log = _logger(_Writer(bad={'a'}, error=sqlite3.OperationalError), max_queued=2, queue_timeout=0.05)
+    log.log('s1', 'user', 'a', 0)
+    log.log('s1', 'user', 'b', 0)
+    with pytest.raises(RuntimeError):
+        log.log('s1', 'user', 'c', 0)
+
+
+def test_close_reports_turns_it_could_not_write(caplog):
+    log = _logger(_Writer(bad={'a'}, error=sqlite3.OperationalError))
+    log.log('s1', 'user', 'a', 0)
+    log.close()
+    assert "Could not write 1 queued conversation turns" in caplog.text
@@ -0,0 +1,71 @@
+# tests/test_database_setup.py
+import io
+import json
+import sqlite3
+
+import pytest
+
+import database_setup
+import db
+
+# The products table as created before the full-text index existed
+LEGACY_PRODUCTS = """
+    CREATE TABLE products (
+        product_id TEXT PRIMARY KEY, name TEXT NOT NULL, category TEXT, description TEXT,
+        ingredients TEXT, price REAL, calories INTEGER, prep_time TEXT, dietary_tags TEXT,
+        mood_tags TEXT, allergens TEXT, popularity_score INTEGER, chef_special BOOLEAN,
+        limited_time BOOLEAN, spice_level INTEGER, image_prompt TEXT
+    )
+    """
+
+
+def _product(product_id, name):
+    return {'product_id': product_id, 'name': name, 'category': 'Burgers', 'description': f"A {name.lower()}",
+            'ingredients': ['bun'], 'price': 9.5, 'dietary_tags': [], 'mood_tags': ['comfort'],
+            'allergens': [], 'popularity_score': 50}
+
+
+def test_setup_reruns_on_database_from_before_fts(tmp_path):
+    db_path = str(tmp_path / 'foodiebot.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute(LEGACY_PRODUCTS)
+    conn.execute("INSERT INTO products (product_id, name, description) VALUES ('P1', 'Smash Burger', 'old')")
+    conn.commit()
+    conn.close()
+    catalog = tmp_path / 'products.jsonl'
+    catalog.write_text("\n".join(json.dumps(p) for p in (_product('P1', 'Smash Burger'),
+                                                          _product('P2', 'Veggie Burger'))))
+
+    db.configure(db_path)
+    try:
+        for _ in range(2):
+            database_setup.create_database(db_path)
+            assert database_setup.populate_products(db_path, str(catalog)) == 2
+    finally:
+        db.get_pool().close()
+
+    conn = sqlite3.connect(db_path)
+    matches = conn.execute("SELECT rowid FROM products_fts WHERE products_fts MATCH 'burger'").fetchall()
+    conn.execute("INSERT INTO products_fts (products_fts) VALUES ('integrity-check')")
+    conn.close()
+    assert len(matches) == 2
+
+
+def test_json_array_elements_span_chunks():
+    products = [_product(f"P{i}", f"Burger {i}") for i in range(50)]
+    f = io.StringIO("  \n" + json.dumps(products, indent=2))
+    assert list(database_setup._iter_json_array(f, chunk_size=16, max_element_size=1024)) == products
+
+
+def test_malformed_json_array_element_fails_without_reading_to_the_end():
+    good = ",".join(json.dumps(_product(f"P{i}", f"Burger {i}")) for i in range(2000))
+    f = io.StringIO('[{"product_id": "P0", "name": oops}, ' + good + "]")
+    with pytest.raises(ValueError, match='malformed JSON array element at character 1'):
+        list(database_setup._iter_json_array(f, chunk_size=64, max_element_size=256))
+    assert f.tell() < 1024
+
+
+def test_truncated_json_array_is_reported():
+    f = io.StringIO('[{"product_id": "P0"}, {"product_id": "P1", "na')
+    with pytest.raises(ValueError, match='truncated JSON array at character 23'):
+        list(database_setup._iter_json_array(f, chunk_size=8))
@@ -0,0 +1,75 @@
+# tests/test_embeddings.py
+import json
+import logging
+
+import numpy as np
+import pytest
+
+import database_setup
+import db
+import embeddings
+from embeddings import EmbeddingIndex, HashingEmbedder
+
+PRODUCTS = [
+    ('FF001', "Cozy Mac Bowl homestyle cheesy comfort", 9.0, 50, 'vegetarian'),
+    ('FF002', "Fiery Chicken Wings spicy buffalo", 12.0, 80, ''),
+    ('FF003', "Iced Lemonade refreshing cold drink", 4.0, 30, 'vegan, vegetarian'),
+]
+
+
+def _index(embedder=None):
+    embedder = embedder or HashingEmbedder(dim=64)
+    matrix = HashingEmbedder(dim=64).embed([doc for _, doc, _, _, _ in PRODUCTS]).T.copy()
+    rows = [(pid, price, popularity, dietary) for pid, _, price, popularity, dietary in PRODUCTS]
+    return EmbeddingIndex(matrix, [p[0] for p in PRODUCTS], embedder, rows)
+
+
+@pytest.mark.parametrize('text', ['', '   ', None, 'the and something please', '!!! ???'])
+def test_query_without_content_words_finds_nothing(text):
+    index = _index()
+    assert index.search(text) == []
+    assert index.search(text, budget=5.0, dietary=['vegan']) == []
+
+
+def test_zero_or_invalid_query_vector_finds_nothing():
+    class ConstantEmbedder(HashingEmbedder):
+        def __init__(self, value):
+            super().__init__(dim=64)
+            self.value = value
+
+        def embed(self, texts):
+            return np.full((len(texts), self.dim), self.value, dtype=np.float32)
+
+    assert _index(ConstantEmbedder(0.0)).search('cozy') == []
+    assert _index(ConstantEmbedder(np.nan)).search('cozy') == []
+
+
+def test_search_still_matches_and_filters():
+    index = _index()
+    assert index.search('something cozy')[0][0] == 'FF001'
+    assert [pid for pid, _ in index.search('a cold drink', dietary=['vegan'])] == ['FF003']
+    assert index.search('something cozy', budget=5.0) == []
+
+
+def test_unusable_embeddings_disable_the_fallback_once(tmp_path, caplog):
+    db_path = str(tmp_path / 'foodiebot.db')
+    catalog = tmp_path / 'products.jsonl'
+    catalog.write_text("\n".join(json.dumps({'product_id': pid, 'name': doc.split()[0], 'description': doc,
+                                              'price': price, 'dietary_tags': [dietary]})
+                                  for pid, doc, price, _, dietary in PRODUCTS))
+    database_setup.create_database(db_path)
+    database_setup.populate_products(db_path, str(catalog))
+    # Built with another dimension than the configured embedder
+    embeddings.build_embeddings(db_path, HashingEmbedder(dim=embeddings.EMBEDDING_DIM + 16))
+
+    db.configure(db_path)
+    embeddings._reset_embedding_index()
+    try:
+        with caplog.at_level(logging.ERROR, logger='embeddings'):
+            for _ in range(3):
+                assert embeddings.get_embedding_index() is None
+                assert embeddings.semantic_search('something cozy') == []
+    finally:
+        embeddings._reset_embedding_index()
+        db.get_pool().close()
+    assert len([r for r in caplog.records if r.name == 'embeddings']) == 1
@@ -0,0 +1,49 @@
+# tests/test_generate_data.py
+import json
+
+import pytest
+
+from generate_data import ProductGenerator, PRODUCT_CATEGORIES, load_checkpoint
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt, use_cache=True):
+        self.calls += 1
+        return json.dumps({'name': f"Product {self.calls}", 'category': 'Burgers',
+                           'description': "Tasty", 'price': 9.99})
+
+
+def _generator(client, tmp_path):
+    return ProductGenerator(client, workers=2, rate=0, checkpoint_path=str(tmp_path / 'products.jsonl'))
+
+
+def test_resume_with_same_per_category_skips_done_slots(tmp_path):
+    _generator(FakeClient(), tmp_path).run(per_category=2)
+    client = FakeClient()
+    products, failed = _generator(client, tmp_path).run(per_category=2)
+    assert client.calls == 0 and not failed
+    assert len(products) == 2 * len(PRODUCT_CATEGORIES)
+
+
+def test_resume_with_other_per_category_is_refused(tmp_path):
+    _generator(FakeClient(), tmp_path).run(per_category=2)
+    client = FakeClient()
+    with pytest.raises(ValueError, match='--per-category 2'):
+        _generator(client, tmp_path).run(per_category=3)
+    assert client.calls == 0
+
+
+def test_checkpoint_without_record_is_refused(tmp_path):
+    (tmp_path / 'products.jsonl').write_text(json.dumps({'product_id': 'FF001', 'name': 'Old'}) + "\n")
+    with pytest.raises(ValueError, match='--fresh'):
+        _generator(FakeClient(), tmp_path).run(per_category=2)
+
+
+def test_checkpoint_lines_that_are_not_products_are_skipped(tmp_path):
+    path = tmp_path / 'products.jsonl'
+    path.write_text("\n".join([json.dumps({'product_id': 'FF001', 'name': 'Kept'}), '[1, 2]', '"FF002"', 'null',
+                               json.dumps({'name': 'No id'}), json.dumps({'product_id': 3}), '{"product_id": "FF0']))
+    assert list(load_checkpoint(str(path))) == ['FF001']
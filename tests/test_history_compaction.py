@@ -0,0 +1,81 @@
+# tests/test_history_compaction.py
+import sqlite3
+from datetime import datetime, timezone
+
+import database_setup
+import db
+import history_compaction
+from history_compaction import HistoryCompactor
+
+NOW = datetime(2026, 1, 2, 12, 0, tzinfo=timezone.utc)
+OLD, RECENT = '2026-01-01 10:00:00.000000', '2026-01-02 11:59:00.000000'
+
+
+def _setup(tmp_path):
+    db_path, archive_path = str(tmp_path / 'foodiebot.db'), str(tmp_path / 'archive.db')
+    database_setup.create_database(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.executemany(db.INSERT_MESSAGE_AT, [
+        ('idle', 'user', "spicy please", 10, None, OLD),
+        ('idle', 'bot', "Try the Dragon Burger", 25, 'FF001', OLD.replace('10:00', '10:01')),
+        ('live', 'user', "hi", 0, None, RECENT),
+    ])
+    conn.commit()
+    conn.close()
+    return db_path, archive_path, HistoryCompactor(db_path, archive_path, idle_seconds=3600, vacuum_pages=0)
+
+
+def _history(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT id, session_id, content FROM conversation_history ORDER BY id").fetchall()
+    conn.close()
+    return rows
+
+
+def test_idle_sessions_move_to_the_archive_with_a_summary(tmp_path):
+    db_path, archive_path, compactor = _setup(tmp_path)
+    before = _history(db_path)
+
+    stats = compactor.compact(now=NOW)
+
+    assert (stats['sessions'], stats['turns']) == (1, 2)
+    assert _history(archive_path) == [row for row in before if row[1] == 'idle']
+    assert _history(db_path) == [row for row in before if row[1] == 'live']
+    db.configure(db_path)
+    try:
+        summary = db.get_session_summary('idle')
+    finally:
+        db.get_pool().close()
+    assert summary['turns'] == 2 and summary['final_score'] == 25
+    assert summary['turn_ids'] == [row[0] for row in before if row[1] == 'idle']
+    assert summary['score_trajectory'] == [10, 25] and summary['recommendations'] == ['FF001']
+    # Nothing left to do on a second run
+    assert compactor.compact(now=NOW)['sessions'] == 0
+
+
+def test_only_archived_turns_are_deleted(tmp_path, monkeypatch):
+    db_path, archive_path, compactor = _setup(tmp_path)
+    real_connect = db.connect
+
+    class LateTurnConnection:
+        """The idle session comes back to life right after its batch was copied to the archive."""
+
+        def __init__(self, conn):
+            self._conn = conn
+            self._late = [('idle', 'user', "one more thing", 30, None, RECENT)]
+
+        def execute(self, sql, *args):
+            result = self._conn.execute(sql, *args)
+            if sql == history_compaction.ARCHIVE_BATCH and self._late:
+                self._conn.execute(db.INSERT_MESSAGE_AT, self._late.pop())
+            return result
+
+        def __getattr__(self, name):
+            return getattr(self._conn, name)
+
+    monkeypatch.setattr(db, 'connect', lambda path: LateTurnConnection(real_connect(path)))
+    stats = compactor.compact(now=NOW)
+
+    assert stats['turns'] == 2
+    assert [content for _, session, content in _history(db_path) if session == 'idle'] == ["one more thing"]
+    assert len(_history(archive_path)) == 2
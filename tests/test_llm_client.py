@@ -0,0 +1,21 @@
+# tests/test_llm_client.py
+import threading
+
+from llm_client import LLMClient, StubBackend
+
+
+def test_stats_while_cache_hit_stream_is_suspended():
+    client = LLMClient(StubBackend())
+    prompt = "Recommend something spicy"
+    client.generate(prompt)
+
+    stream = client.stream(prompt)
+    assert next(stream)  # the cached reply; the generator is now paused at its yield
+
+    results = []
+    caller = threading.Thread(target=lambda: results.append((client.stats(), client.generate(prompt))), daemon=True)
+    caller.start()
+    caller.join(timeout=2)
+    assert not caller.is_alive(), "stats()/generate() blocked by a suspended stream"
+    assert results[0][0]['hits'] == 1
+    stream.close()
@@ -0,0 +1,51 @@
+# tests/test_preference_rules.py
+import pytest
+
+from preference_rules import PreferenceRules
+
+RULES = PreferenceRules(
+    dietary_tags=['Vegetarian', 'Vegan', 'Gluten-Free'],
+    mood_tags=['spicy', 'comfort food'],
+    craving_words=['burger', 'pizza', 'fries', 'cheese'],
+)
+
+
+def test_fully_recognized_message_is_confident():
+    found, confidence = RULES.extract("veg burger under $10")
+    assert found == {'budget': 10.0, 'dietary': ['vegetarian'], 'cravings': ['burger']}
+    assert confidence == 1.0
+
+
+def test_multi_word_tags_and_aliases_are_matched():
+    found, confidence = RULES.extract("some comfort food, plant based and gluten free please")
+    assert found == {'mood': ['comfort food'], 'dietary': ['vegan', 'gluten free']}
+    assert confidence == 1.0
+
+
+@pytest.mark.parametrize('message', ["no cheese please", "actually something else",
+                                     "I'm allergic to nuts", "maybe pizza"])
+def test_withdrawals_and_references_go_to_the_llm(message):
+    assert RULES.extract(message)[1] == 0.0
+
+
+def test_unknown_words_lower_confidence():
+    found, confidence = RULES.extract("spicy burger with kimchi")
+    assert found == {'mood': ['spicy'], 'cravings': ['burger']}
+    assert confidence == pytest.approx(2 / 3)
+
+
+def test_dietary_terms_missing_from_the_catalog_are_not_recognized():
+    found, confidence = RULES.extract("halal pizza")
+    assert found == {'cravings': ['pizza']} and confidence == 0.5
+
+
+def test_filler_only_and_empty_messages():
+    assert RULES.extract("hi, I'm hungry") == ({}, 1.0)
+    assert RULES.extract("") == ({}, 0.0)
+    assert RULES.extract("$12") == ({'budget': 12.0}, 1.0)
+
+
+def test_update_replaces_budget_and_adds_new_terms():
+    updated, confidence = RULES.update({'budget': 20.0, 'cravings': ['pizza']}, "burger under 8 bucks")
+    assert updated == {'budget': 8.0, 'cravings': ['pizza', 'burger']}
+    assert confidence == 1.0
@@ -0,0 +1,14 @@
+# tests/test_recommendation_cache.py
+from recommendation_cache import RecommendationCache
+
+
+def test_result_computed_across_an_invalidation_is_not_stored():
+    cache = RecommendationCache(capacity=8, read_version=lambda: 1)
+
+    def compute_while_catalog_changes():
+        cache.invalidate()  # e.g. a catalog_version bump noticed while this query ran
+        return ['stale']
+
+    assert cache.get_or_compute('key', compute_while_catalog_changes) == ['stale']
+    assert cache.get_or_compute('key', lambda: ['fresh']) == ['fresh']
+    assert cache.get_or_compute('key', lambda: ['unused']) == ['fresh']
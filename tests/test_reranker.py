@@ -0,0 +1,47 @@
+# tests/test_reranker.py
+from reranker import ProductFeatures, Reranker
+
+# Four burgers ranked first by search, then a pizza and a drink
+PRODUCTS = [
+    ('B1', 'Burgers', {'spicy'}), ('B2', 'Burgers', {'spicy'}), ('B3', 'Burgers', {'comfort'}),
+    ('B4', 'Burgers', {'cheesy'}), ('P1', 'Pizza', {'cheesy'}), ('D1', 'Beverages', {'refreshing'}),
+]
+FEATURES = ProductFeatures(*map(list, zip(*PRODUCTS)))
+IDS = [pid for pid, _, _ in PRODUCTS]
+
+
+def _picked(reranker, ids=IDS, shown=(), limit=5):
+    return [ids[i] for i in reranker.order(ids, shown, limit)]
+
+
+def test_pure_relevance_keeps_search_order():
+    reranker = Reranker(FEATURES, relevance_weight=1.0, max_per_category=10)
+    assert _picked(reranker) == IDS[:5]
+
+
+def test_category_cap_makes_room_for_other_categories():
+    picked = _picked(Reranker(FEATURES, relevance_weight=1.0, max_per_category=2), limit=4)
+    assert picked == ['B1', 'B2', 'P1', 'D1']
+
+
+def test_category_cap_gives_way_when_nothing_else_is_left():
+    picked = _picked(Reranker(FEATURES, relevance_weight=1.0, max_per_category=1), ids=IDS[:4], limit=3)
+    assert picked == ['B1', 'B2', 'B3']
+
+
+def test_already_shown_products_are_pushed_down():
+    reranker = Reranker(FEATURES, relevance_weight=1.0, shown_penalty=1.0, max_per_category=10)
+    assert _picked(reranker, shown=['B1'], limit=6)[-1] == 'B1'
+    assert _picked(reranker, shown=['B1'], limit=2) == ['B2', 'B3']
+
+
+def test_similar_tags_are_spread_out():
+    # With diversity weighted in, B2 (same tags as B1) drops below B3
+    picked = _picked(Reranker(FEATURES, relevance_weight=0.5, max_per_category=10), limit=3)
+    assert picked[:2] == ['B1', 'B3'] and 'B2' not in picked
+
+
+def test_unknown_products_are_ranked_without_features():
+    ids = ['NEW', 'B1']
+    assert _picked(Reranker(FEATURES, max_per_category=1), ids=ids) == ['NEW', 'B1']
+    assert Reranker(FEATURES).order([]) == []
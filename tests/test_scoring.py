@@ -0,0 +1,57 @@
+# tests/test_scoring.py
+import pytest
+
+from scoring import FACTORS, KEYWORDS, calculate_interest_score, rescore_history, score_delta, score_deltas
+
+MESSAGES = [
+    "", "hello there", "I love it, perfect", "love love love", "I'm allergic to nuts",
+    "How much is the vegan burger? I'll take it", "hmm, maybe later, not sure",
+    "I'm feeling adventurous and craving something spicy under $10", "that's a lot, too expensive",
+    "ORDER NOW", "no thanks, I don't like that", "what's in it? spice level? calories?",
+]
+
+
+def _naive_delta(text):
+    lowered = text.lower()
+    return sum(FACTORS[f] for f, words in KEYWORDS.items() if any(w in lowered for w in words))
+
+
+@pytest.mark.parametrize('text', MESSAGES)
+def test_compiled_matcher_agrees_with_substring_search(text):
+    assert score_delta(text) == _naive_delta(text)
+
+
+def test_each_factor_counts_once_per_message():
+    assert score_delta("love love love") == FACTORS['enthusiasm_words']
+    assert score_delta("love, amazing, great") == FACTORS['enthusiasm_words']
+
+
+def test_overlapping_keywords_all_count():
+    # "allergic to" is a dietary conflict and also contains "allergic"
+    assert score_delta("I'm allergic to nuts") == FACTORS['dietary_conflict'] + FACTORS['dietary_restrictions']
+
+
+def test_score_is_clamped():
+    assert calculate_interest_score("I'll take it, how much?", 90) == 100
+    assert calculate_interest_score("no thanks, too expensive", 10) == 0
+
+
+def test_batch_deltas_match_single_deltas():
+    assert score_deltas(MESSAGES) == [score_delta(text) for text in MESSAGES]
+
+
+def test_rescore_stores_score_before_user_turn_and_after_for_bot():
+    rows = [('s1', 'user', "I love it"), ('s1', 'bot', "Great!"), ('s1', 'user', "how much?"),
+            ('s2', 'user', "hmm")]
+    love = FACTORS['enthusiasm_words']
+    assert rescore_history(rows) == [0, love, love, 0]
+    assert rescore_history(rows, initial_score=50) == [50, 50 + love, 50 + love, 50]
+
+
+def test_rescore_continues_compacted_sessions_from_their_summary():
+    rows = [('s1', 'user', "I love it, perfect"), ('s1', 'bot', "Great!"),
+            ('s2', 'user', "I love it, perfect"), ('s2', 'bot', "Great!")]
+    fresh = rescore_history(rows)
+    seeded = rescore_history(rows, initial_scores={'s2': 40})
+    assert seeded[:2] == fresh[:2] == [0, fresh[1]]
+    assert seeded[2] == 40 and seeded[3] == 40 + fresh[1]
@@ -0,0 +1,55 @@
+# tests/test_search_index.py
+import json
+
+from search_index import ProductSearchIndex
+
+COLUMNS = ('product_id', 'name', 'description', 'price', 'popularity_score', 'mood_tags', 'dietary_tags')
+
+
+def _row(product_id, name, price, popularity, mood=(), dietary=()):
+    return (product_id, name, f"A {name.lower()}", price, popularity, json.dumps(list(mood)), json.dumps(list(dietary)))
+
+
+INDEX = ProductSearchIndex(COLUMNS, [
+    _row('P1', "Spicy Burger", 12.0, 90, mood=['spicy']),
+    _row('P2', "Veggie Burger", 9.0, 40, mood=['comfort'], dietary=['Vegetarian']),
+    _row('P3', "Vegan Spicy Wrap", 7.5, 60, mood=['spicy', 'healthy'], dietary=['Vegan', 'Vegetarian']),
+    _row('P4', "Gluten-Free Salad", 10.0, 20, mood=['fresh'], dietary=['Gluten-Free', 'Vegetarian']),
+    _row('P5', "Cheap Fries", 3.0, 70, mood=['comfort']),
+])
+
+
+def _ids(products):
+    return [p['product_id'] for p in products]
+
+
+def test_budget_is_inclusive_and_excludes_pricier_products():
+    assert _ids(INDEX.search(budget=9.0, limit=10)) == ['P5', 'P3', 'P2']
+    assert _ids(INDEX.search(budget=2.0)) == []
+
+
+def test_dietary_restrictions_must_all_hold():
+    assert _ids(INDEX.search(dietary=['vegetarian'], limit=10)) == ['P3', 'P2', 'P4']
+    assert _ids(INDEX.search(dietary=['vegetarian', 'gluten free'])) == ['P4']
+    assert _ids(INDEX.search(dietary=['vegetarian'], budget=8.0)) == ['P3']
+    assert INDEX.search(dietary=['halal']) == []
+
+
+def test_more_matching_terms_rank_first_then_popularity():
+    # P3 matches 'spicy' and 'healthy'; P1 only 'spicy' but is more popular
+    assert _ids(INDEX.search(mood=['spicy', 'healthy'])) == ['P3', 'P1']
+    # Equal matches are ordered by popularity
+    assert _ids(INDEX.search(mood=['comfort'])) == ['P5', 'P2']
+    assert _ids(INDEX.search(mood=['spicy'], limit=1)) == ['P1']
+
+
+def test_terms_respect_budget_and_dietary_filters():
+    assert _ids(INDEX.search(mood=['spicy'], budget=10.0)) == ['P3']
+    assert _ids(INDEX.search(cravings=['burger'], dietary=['vegetarian'])) == ['P2']
+
+
+def test_no_terms_returns_most_popular_within_budget():
+    assert _ids(INDEX.search(limit=3)) == ['P1', 'P5', 'P3']
+    assert _ids(INDEX.search(budget=10.0, limit=2)) == ['P5', 'P3']
+    # A selective budget takes the price-sorted path; same answer
+    assert _ids(INDEX.search(budget=7.5, limit=1)) == ['P5']
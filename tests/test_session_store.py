@@ -0,0 +1,30 @@
+# tests/test_session_store.py
+import os
+import time
+
+from session_store import FileBackend, SessionStore
+
+
+def _store(directory):
+    return SessionStore(FileBackend(str(directory)), recover=lambda session_id: None)
+
+
+def test_file_backend_sees_back_to_back_saves_from_another_worker(tmp_path):
+    a, b = _store(tmp_path), _store(tmp_path)
+    state = a.get('s1')
+    b.get('s1')
+    for score in range(1, 6):  # well within any filesystem's timestamp granularity
+        a.record_turn(state, 'bot', f"turn {score}", score=score)
+        assert b.get('s1').score == score
+
+
+def test_file_backend_prunes_idle_sessions(tmp_path):
+    backend = FileBackend(str(tmp_path))
+    backend.save('old', '{"session_id": "old"}')
+    backend.save('new', '{"session_id": "new"}')
+    old_path = backend._path('old')
+    os.utime(old_path, (time.time() - 3600, time.time() - 3600))
+
+    assert backend.prune(1800) == 1
+    assert backend.load('old') is None
+    assert backend.load('new') is not None
@@ -1,133 +1,158 @@
-# ui.py
-import streamlit as st
-import requests
-import uuid
-import pandas as pd
-
-# --- Page Configuration ---
-st.set_page_config(
-    page_title="FoodieBot 🍔",
-    page_icon="🤖",
-    layout="wide"
-)
-
-# --- API Endpoint ---
-BACKEND_URL = "http://127.0.0.1:5001"
-
-# --- Session State Initialization ---
-if 'session_id' not in st.session_state:
-    st.session_state.session_id = str(uuid.uuid4())
-    st.session_state.messages = []
-    st.session_state.interest_score = 0
-    st.session_state.initial_greeting = True
-
-# --- UI Components ---
-st.title("FoodieBot AI 🍕")
-st.markdown("Your personal AI agent for fast food cravings!")
-
-# --- Main Layout ---
-col1, col2 = st.columns([2, 1])
-
-with col1:
-    # --- Chat Interface --- [cite: 143]
-    st.header("Chat with FoodieBot")
-
-    if st.session_state.initial_greeting:
-        greeting = "Welcome to FoodieBot! What's your food mood today? 😋"
-        st.session_state.messages.append({"role": "assistant", "content": greeting})
-        st.session_state.initial_greeting = False
-
-    # Display chat messages from history
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
-            if "product" in message and message["product"]:
-                p = message["product"]
-                with st.container(border=True):
-                    st.subheader(p['name'])
-                    st.caption(f"Category: {p['category']} | Price: ${p['price']:.2f}")
-                    st.write(p['description'])
-                    st.progress(p['popularity_score'], text=f"Popularity: {p['popularity_score']}%")
-
-
-    # React to user input
-    if prompt := st.chat_input("I'm looking for something spicy..."):
-        # Display user message
-        st.chat_message("user").markdown(prompt)
-        st.session_state.messages.append({"role": "user", "content": prompt})
-
-        # Call backend API
-        with st.spinner("FoodieBot is thinking..."):
-            response = requests.post(
-                f"{BACKEND_URL}/chat",
-                json={
-                    "message": prompt,
-                    "session_id": st.session_state.session_id,
-                    "interest_score": st.session_state.interest_score
-                }
-            )
-        
-        if response.status_code == 200:
-            data = response.json()
-            st.session_state.interest_score = data['interest_score']
-            bot_response = data['bot_response']
-            product = data['recommended_product']
-            
-            # Display bot response
-            with st.chat_message("assistant"):
-                st.markdown(bot_response)
-                # Display recommended product card [cite: 145]
-                if product:
-                    with st.container(border=True):
-                        st.subheader(product['name'])
-                        st.caption(f"Category: {product['category']} | Price: ${product['price']:.2f}")
-                        st.write(product['description'])
-                        st.progress(product['popularity_score'], text=f"Popularity: {product['popularity_score']}%")
-
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": bot_response,
-                "product": product
-            })
-        else:
-            st.error("Sorry, something went wrong. Please try again.")
-        
-        # Rerun to update the analytics pane immediately
-        st.rerun()
-
-with col2:
-    # --- Real-time Analytics Dashboard --- [cite: 105]
-    st.header("Live Analytics")
-
-    # Display Interest Score [cite: 144]
-    st.metric(label="User Interest Score", value=f"{st.session_state.interest_score}%")
-    st.progress(st.session_state.interest_score)
-    
-    st.markdown("---")
-    
-    # Fetch and display analytics data
-    analytics_response = requests.get(
-        f"{BACKEND_URL}/analytics",
-        params={"session_id": st.session_state.session_id}
-    )
-
-    if analytics_response.status_code == 200:
-        analytics_data = analytics_response.json()
-
-        # Interest Score Progression Graph [cite: 109]
-        st.subheader("Interest Score Over Time")
-        interest_df = pd.DataFrame(analytics_data['interest_progression'])
-        if not interest_df.empty:
-            interest_df.set_index('id', inplace=True)
-            st.line_chart(interest_df)
-        else:
-            st.write("No conversation data yet to plot.")
-
-        # Top Recommended Products [cite: 115]
-        st.subheader("Most Recommended Products")
-        recs_df = pd.DataFrame(analytics_data['top_recommendations'])
-        if not recs_df.empty:
-            st.bar_chart(recs_df.set_index('name'))
-        else:
-            st.write("No recommendations have been made yet.")
+# ui.py
+import streamlit as st
+import requests
+import json
+import uuid
+import pandas as pd
+
+# --- Page Configuration ---
+st.set_page_config(
+    page_title="FoodieBot 🍔",
+    page_icon="🤖",
+    layout="wide"
+)
+
+# --- API Endpoint ---
+BACKEND_URL = "http://127.0.0.1:5001"
+
+# --- Helpers ---
+def render_product_card(p, container=st):
+    with container.container(border=True):
+        st.subheader(p['name'])
+        st.caption(f"Category: {p['category']} | Price: ${p['price']:.2f}")
+        st.write(p['description'])
+        st.progress(p['popularity_score'], text=f"Popularity: {p['popularity_score']}%")
+
+def stream_events(response):
+    """Parses a Server-Sent Events response into (event, data) pairs as they arrive."""
+    event, data = None, None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data = json.loads(line[len("data:"):].strip())
+        elif not line and event:
+            yield event, data
+            event, data = None, None
+
+# --- Session State Initialization ---
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = str(uuid.uuid4())
+    st.session_state.messages = []
+    st.session_state.interest_score = 0
+    st.session_state.initial_greeting = True
+
+# --- UI Components ---
+st.title("FoodieBot AI 🍕")
+st.markdown("Your personal AI agent for fast food cravings!")
+
+# --- Main Layout ---
+col1, col2 = st.columns([2, 1])
+
+with col1:
+    # --- Chat Interface --- [cite: 143]
+    st.header("Chat with FoodieBot")
+
+    if st.session_state.initial_greeting:
+        greeting = "Welcome to FoodieBot! What's your food mood today? 😋"
+        st.session_state.messages.append({"role": "assistant", "content": greeting})
+        st.session_state.initial_greeting = False
+
+    # Display chat messages from history
+    for message in st.session_state.messages:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+            if "product" in message and message["product"]:
+                render_product_card(message["product"])
+
+
+    # React to user input
+    if prompt := st.chat_input("I'm looking for something spicy..."):
+        # Display user message
+        st.chat_message("user").markdown(prompt)
+        st.session_state.messages.append({"role": "user", "content": prompt})
+
+        # Call backend API and render the reply as it streams in
+        with st.chat_message("assistant"):
+            text_placeholder = st.empty()
+            card_placeholder = st.empty()
+            text_placeholder.markdown("FoodieBot is thinking...")
+            response = requests.post(
+                f"{BACKEND_URL}/chat/stream",
+                json={
+                    "message": prompt,
+                    "session_id": st.session_state.session_id
+                },
+                stream=True
+            )
+
+            bot_response, product, completed = "", None, False
+            if response.status_code == 200:
+                for event, payload in stream_events(response):
+                    if event == "product":
+                        # Display recommended product card [cite: 145]
+                        product = payload['recommended_product']
+                        if product:
+                            render_product_card(product, card_placeholder)
+                    elif event == "token":
+                        bot_response += payload['text']
+                        text_placeholder.markdown(bot_response + "▌")
+                    elif event == "done":
+                        bot_response = payload['bot_response']
+                        st.session_state.interest_score = payload['interest_score']
+                        completed = True
+                    elif event == "error":
+                        break
+
+            if completed:
+                text_placeholder.markdown(bot_response)
+            else:
+                text_placeholder.empty()
+                st.error("Sorry, something went wrong. Please try again.")
+
+        if completed:
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": bot_response,
+                "product": product
+            })
+
+        # Rerun to update the analytics pane immediately
+        st.rerun()
+
+with col2:
+    # --- Real-time Analytics Dashboard --- [cite: 105]
+    st.header("Live Analytics")
+
+    # Display Interest Score [cite: 144]
+    st.metric(label="User Interest Score", value=f"{st.session_state.interest_score}%")
+    st.progress(st.session_state.interest_score)
+    
+    st.markdown("---")
+    
+    # Fetch and display analytics data
+    analytics_response = requests.get(
+        f"{BACKEND_URL}/analytics",
+        params={"session_id": st.session_state.session_id}
+    )
+
+    if analytics_response.status_code == 200:
+        analytics_data = analytics_response.json()
+
+        # Interest Score Progression Graph [cite: 109]
+        st.subheader("Interest Score Over Time")
+        interest_df = pd.DataFrame(analytics_data['interest_progression'])
+        if not interest_df.empty:
+            interest_df.set_index('id', inplace=True)
+            st.line_chart(interest_df)
+        else:
+            st.write("No conversation data yet to plot.")
+
+        # Top Recommended Products [cite: 115]
+        st.subheader("Most Recommended Products")
+        recs_df = pd.DataFrame(analytics_data['top_recommendations'])
+        if not recs_df.empty:
+            st.bar_chart(recs_df.set_index('name'))
+        else:
+            st.write("No recommendations have been made yet.")
             
\ No newline at end of file